@@ -1,12 +1,26 @@
-from flask import Flask, render_template, jsonify, request
+from flask import (Flask, Response, abort, jsonify, redirect, render_template, request,
+                   send_file, url_for)
 from flask_cors import CORS
 import os
 import random
-import requests
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from urllib.parse import urlencode, urljoin
 from dotenv import load_dotenv
-from datamuse import Datamuse
-import giphy_client
-from giphy_client.rest import ApiException
+from assets import AssetManifest
+from breaker import BreakerRegistry
+from media import MediaError, MediaStore
+from cache import SampledResultCache, TTLCache
+from metrics import CONTENT_TYPE, REGISTRY, HttpMetrics, instrument_flask
+from mathgen import OP_SYMBOLS, generate_math_batch, grade_rules
+from players import PlayerStore
+from prefetch import PrefetchPool
+from shared import SharedStore
+from upstream import UpstreamClient, host_of
+from word_index import WordIndexStore
 
 # ─── Load environment variables ────────────────────────────────────────────────
 load_dotenv()  # expects .env in project root
@@ -17,41 +31,202 @@ WORDS_API_HOST  = "wordsapiv1.p.rapidapi.com"
 NASA_API_KEY    = os.getenv("NASA_API_KEY", "")
 
 GIPHY_API_KEY   = os.getenv("GIPHY_API_KEY", "")
+DEFAULT_GIPHY_QUERIES = ["funny dog"]
+GIPHY_QUERIES   = [q.strip() for q in os.getenv("GIPHY_QUERIES", "").split(",")
+                   if q.strip()] or DEFAULT_GIPHY_QUERIES
+GIPHY_REFRESH_INTERVAL = float(os.getenv("GIPHY_REFRESH_INTERVAL", "3600"))
 
 OXFORD_APP_ID   = os.getenv("APP_ID", "")
 OXFORD_APP_KEY  = os.getenv("APP_KEYS", "")
 
+# Upstream base URLs (overridable to point at local stubs for load tests)
+WORDS_API_URL    = os.getenv("WORDS_API_URL", f"https://{WORDS_API_HOST}")
+OXFORD_API_URL   = os.getenv("OXFORD_API_URL", "https://od-api-sandbox.oxforddictionaries.com")
+DATAMUSE_API_URL = os.getenv("DATAMUSE_API_URL", "https://api.datamuse.com")
+NASA_API_URL     = os.getenv("NASA_API_URL", "https://api.nasa.gov")
+NASA_IMAGES_URL  = os.getenv("NASA_IMAGES_URL", "https://images-api.nasa.gov")
+GIPHY_API_URL    = os.getenv("GIPHY_API_URL", "https://api.giphy.com/v1")
+
+WORD_POOL_SIZE      = int(os.getenv("WORD_POOL_SIZE", "20"))
+WORD_POOL_LOW_WATER = int(os.getenv("WORD_POOL_LOW_WATER", str(WORD_POOL_SIZE // 2)))
+WORD_INDEX_PATH     = os.getenv("WORD_INDEX_PATH", "")   # local word index (see word_index.py)
+WORD_DUMP_PATH      = os.getenv("WORD_DUMP_PATH", "")    # JSON-lines dump it is built from
+WORD_PROBLEM_DEADLINE = float(os.getenv("WORD_PROBLEM_DEADLINE", "4"))
+PLAYER_STORE_SIZE     = int(os.getenv("PLAYER_STORE_SIZE", "10000"))
+PLAYER_IDLE_TTL       = float(os.getenv("PLAYER_IDLE_TTL", "3600"))
+MATH_BATCH_MAX        = int(os.getenv("MATH_BATCH_MAX", "200"))
+WORD_BATCH_MAX        = int(os.getenv("WORD_BATCH_MAX", "20"))
+UPSTREAM_RETRIES      = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_TOTAL_TIMEOUT = float(os.getenv("UPSTREAM_TOTAL_TIMEOUT", "8"))
+BREAKER_FAILURE_RATE  = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+CACHE_DIR        = os.getenv("CACHE_DIR", "")   # set to persist caches across restarts
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")  # SQLite file shared by all workers
+METRICS_DIR      = os.getenv("METRICS_DIR", "")  # merge /metrics across workers (see metrics.py)
+NASA_CACHE_SIZE  = int(os.getenv("NASA_CACHE_SIZE", "64"))
+NASA_SEARCH_TTL  = float(os.getenv("NASA_SEARCH_TTL", str(6 * 3600)))
+
+MEDIA_PROXY      = os.getenv("MEDIA_PROXY", "1") == "1"   # serve NASA/Giphy images from /media
+MEDIA_CACHE_DIR  = os.getenv("MEDIA_CACHE_DIR") or os.path.join(
+    CACHE_DIR or tempfile.gettempdir(), "learning_game_media")
+MEDIA_CACHE_MB   = int(os.getenv("MEDIA_CACHE_MB", "256"))
+MEDIA_HOSTS      = [h.strip() for h in os.getenv(   # exact hosts; "*.example.com" admits subdomains
+    "MEDIA_HOSTS",
+    "apod.nasa.gov,images-assets.nasa.gov,media.giphy.com,media0.giphy.com,media1.giphy.com,"
+    "media2.giphy.com,media3.giphy.com,media4.giphy.com,i.giphy.com",
+).split(",") if h.strip()]
+
+if CACHE_DIR:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
 # ─── Flask setup ──────────────────────────────────────────────────────────────
 app = Flask(__name__)
 CORS(app)
 
+# ─── Metrics (exported on /metrics) ───────────────────────────────────────────
+if METRICS_DIR:
+    REGISTRY.enable_multiprocess(METRICS_DIR)
+http_metrics = HttpMetrics()          # per-route latency + in-flight, both serving modes
+instrument_flask(app, http_metrics)
+upstream_seconds = REGISTRY.histogram(
+    "learning_game_upstream_request_seconds",
+    "Upstream call latency including retries, by upstream host.",
+    ("upstream", "outcome"),
+)
+word_problem_steps = REGISTRY.counter(
+    "learning_game_word_problem_steps_total",
+    "Word problem pipeline branches taken (2a-2g).",
+    ("step",),
+)
+content_source = REGISTRY.counter(
+    "learning_game_content_source_total",
+    "Where served content came from, per endpoint family.",
+    ("kind", "source"),
+)
+
+def observe_upstream(name, ok, latency):
+    upstream_seconds.labels(name, "ok" if ok else "error").observe(latency)
+
 # ─── Initialize external clients ───────────────────────────────────────────────
-dm = Datamuse()                      # Datamuse for antonyms
-giphy_api = giphy_client.DefaultApi()  # Giphy Python SDK
+# The SDK client is imported and built on first use, so a worker that only
+# serves math or pages never loads it (see bench/profile_startup.py).
+@lru_cache(maxsize=None)
+def giphy_api():                     # Giphy Python SDK
+    import giphy_client
+    return giphy_client.DefaultApi(giphy_client.ApiClient(host=GIPHY_API_URL))
+
+breakers = BreakerRegistry(          # fail fast to static data when an upstream is down
+    failure_rate=BREAKER_FAILURE_RATE,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+    on_record=observe_upstream,
+)
+UPSTREAM_TIMEOUTS = {
+    WORDS_API_URL: 3,
+    OXFORD_API_URL: 3,
+    DATAMUSE_API_URL: 2,
+    NASA_API_URL: 5,
+    NASA_IMAGES_URL: 5,
+}
+upstream = UpstreamClient(            # pooled keep-alive HTTP for the APIs below
+    timeouts=UPSTREAM_TIMEOUTS,
+    retries=UPSTREAM_RETRIES,
+    total_timeout=UPSTREAM_TOTAL_TIMEOUT,
+    breakers=breakers,
+)
+upstream_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="upstream")
+shared_store = (SharedStore(SHARED_CACHE_PATH)  # one cache/pool for all workers on the host
+                if SHARED_CACHE_PATH else None)
+
+# ─── Request parameters ───────────────────────────────────────────────────────
+class InvalidArgument(ValueError):
+    """A malformed request parameter; answered with a 400 in both serving modes."""
+
+@app.errorhandler(InvalidArgument)
+def invalid_argument(e):
+    return jsonify({"error": str(e)}), 400
+
+def int_arg(args, name, default=None, minimum=None):
+    value = args.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise InvalidArgument(f"{name} must be an integer") from None
+    if minimum is not None and value < minimum:
+        raise InvalidArgument(f"{name} must be at least {minimum}")
+    return value
+
+# ─── 0) PLAYERS / ADAPTIVE DIFFICULTY ─────────────────────────────────────────
+players = PlayerStore(max_players=PLAYER_STORE_SIZE, idle_ttl=PLAYER_IDLE_TTL)
+
+def valid_player_id(player_id):
+    return isinstance(player_id, str) and 0 < len(player_id) <= 64
+
+def resolve_difficulty(args, subject):
+    """Explicit ?difficulty=, else the player's adaptive level, else None (grade rules)."""
+    difficulty = int_arg(args, "difficulty")
+    if difficulty is not None:
+        return difficulty
+    player_id = args.get("player")
+    if valid_player_id(player_id):
+        return players.level(player_id, subject)
+    return None
+
+@app.route("/api/answer", methods=["POST"])
+def api_answer():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "expected a JSON object"}), 400
+    player_id, subject = data.get("player"), data.get("subject")
+    if not valid_player_id(player_id) or subject not in ("math", "reading"):
+        return jsonify({"error": "player and subject are required"}), 400
+    correct = data.get("correct")
+    if not isinstance(correct, bool):
+        return jsonify({"error": "correct must be true or false"}), 400
+    try:
+        response_ms = float(data.get("response_ms") or 0)
+    except (TypeError, ValueError):
+        response_ms = None
+    if response_ms is None or not 0 <= response_ms < float("inf"):
+        return jsonify({"error": "response_ms must be a non-negative number"}), 400
+    result = players.record_answer(player_id, subject, correct, response_ms)
+    return jsonify(result)
+
 
 # ─── 1) MATH PROBLEMS (in-process) ────────────────────────────────────────────
-def generate_math_problem(grade: int):
-    if grade == 1:
-        a, b = random.randint(1, 10), random.randint(1, 10)
-        op = random.choice(["+", "-"])
+def generate_math_problem(grade: int, difficulty=None):
+    ops, add_sub_max, mul_max = grade_rules(grade, difficulty)
+    op = random.choice([OP_SYMBOLS[o] for o in ops])
+    if op == "*":
+        a, b = random.randint(1, mul_max), random.randint(1, mul_max)
+    else:
+        a, b = random.randint(1, add_sub_max), random.randint(1, add_sub_max)
         if op == "-" and a < b:
             a, b = b, a
-        answer = a + b if op == "+" else a - b
-    else:
-        op = random.choice(["+", "-", "*"])
-        if op == "*":
-            a, b = random.randint(1, 10), random.randint(1, 10)
-        else:
-            a, b = random.randint(1, 20), random.randint(1, 20)
-            if op == "-" and a < b:
-                a, b = b, a
-        answer = a + b if op == "+" else a - b if op == "-" else a * b
+    answer = a + b if op == "+" else a - b if op == "-" else a * b
     return {"problem": f"{a} {op} {b}", "answer": answer}
 
+def generate_math_problems(grade: int, n: int, seed=None, difficulty=None):
+    return generate_math_batch(grade, n, seed, difficulty).to_dicts()
+
+def batch_size(n, limit):
+    return max(1, min(int_arg({"n": n}, "n", 1), limit))
+
 @app.route("/api/math_problem")
 def api_math_problem():
-    grade = int(request.args.get("grade", 1))
-    return jsonify(generate_math_problem(grade))
+    grade = int_arg(request.args, "grade", 1)
+    difficulty = resolve_difficulty(request.args, "math")
+    return jsonify(generate_math_problem(grade, difficulty))
+
+@app.route("/api/math_problems")
+def api_math_problems():
+    grade = int_arg(request.args, "grade", 1)
+    n = batch_size(request.args.get("n", 20), MATH_BATCH_MAX)
+    seed = int_arg(request.args, "seed", minimum=0)
+    difficulty = resolve_difficulty(request.args, "math")
+    return jsonify(generate_math_problems(grade, n, seed, difficulty))
 
 
 # ─── 2) READING (WordsAPI → Datamuse → Oxford → static) ───────────────────────
@@ -62,81 +237,198 @@ STATIC_WORDS = [
     {"word":"tree", "definition":"a tall plant with a trunk and branches"}
 ]
 
-@app.route("/api/word_problem")
-def api_word_problem():
+def build_static_word_problem():
+    pick = random.choice(STATIC_WORDS)
+    wrongs = [w["word"] for w in STATIC_WORDS if w["word"] != pick["word"]]
+    options = random.sample(wrongs, 3) + [pick["word"]]
+    random.shuffle(options)
+    return {"definition": pick["definition"], "options": options, "answer": pick["word"]}
+
+# Request/parse pieces shared by the sync pipeline below and the async one
+# in asgi.py; only the transport differs between the two.
+RANDOM_WORD_URL = f"{WORDS_API_URL}/words/?random=true"
+WORDS_API_HEADERS = {
+    "X-RapidAPI-Key": WORDS_API_KEY,
+    "X-RapidAPI-Host": WORDS_API_HOST
+}
+OXFORD_HEADERS = {"app_id": OXFORD_APP_ID, "app_key": OXFORD_APP_KEY}
+
+def oxford_url(word):
+    return f"{OXFORD_API_URL}/api/v2/entries/en-us/{word.lower()}"
+
+def parse_random_word(r):
+    defs = r.get("results", [])
+    return r.get("word"), defs[0].get("definition") if defs else None
+
+def parse_antonyms(ants, word):
+    return [w["word"] for w in ants if w.get("word") and w["word"] != word]
+
+def parse_oxford_definition(od):
+    defs = od["results"][0]["lexicalEntries"][0]["entries"][0]["senses"][0]["definitions"]
+    return defs[0] if defs else None
+
+def pick_static_word():
+    pick = random.choice(STATIC_WORDS)
+    return pick["word"], pick["definition"]
+
+def assemble_word_problem(correct, definition, antonyms, fill_words, oxford_definition):
+    wrongs = (antonyms or [])[:3]
+    if wrongs:
+        word_problem_steps.labels("2c_datamuse").inc()
+    filled = len(wrongs)
+    for w2 in fill_words:
+        if len(wrongs) < 3 and w2 and w2 != correct and w2 not in wrongs:
+            wrongs.append(w2)
+    if len(wrongs) > filled:
+        word_problem_steps.labels("2d_wordsapi_fill").inc()
+
+    # 2e) Final static fill if still short
+    if len(wrongs) < 3:
+        word_problem_steps.labels("2e_static_fill").inc()
+        spare = [w["word"] for w in STATIC_WORDS
+                 if w["word"] != correct and w["word"] not in wrongs]
+        wrongs += random.sample(spare, min(3 - len(wrongs), len(spare)))
+
+    if oxford_definition:
+        word_problem_steps.labels("2f_oxford").inc()
+
+    # 2g) Shuffle
+    word_problem_steps.labels("2g_assembled").inc()
+    options = wrongs + [correct]
+    random.shuffle(options)
+    return {"definition": oxford_definition or definition, "options": options, "answer": correct}
+
+# Every lookup gets the question's deadline, so a call still queued or in
+# flight when it passes gives up instead of holding an executor worker.
+def fetch_random_word(timeout, deadline=None):
+    return parse_random_word(
+        upstream.get_json(RANDOM_WORD_URL, headers=WORDS_API_HEADERS, timeout=timeout,
+                          deadline=deadline)
+    )
+
+def fetch_antonyms(word, deadline=None):
+    # Plain HTTP rather than the Datamuse SDK, which sets no timeout at all.
+    ants = upstream.get_json(f"{DATAMUSE_API_URL}/words", params={"rel_ant": word, "max": 5},
+                             deadline=deadline)
+    return parse_antonyms(ants, word)
+
+def fetch_oxford_definition(word, deadline=None):
+    return parse_oxford_definition(
+        upstream.get_json(oxford_url(word), headers=OXFORD_HEADERS, deadline=deadline)
+    )
+
+def _result(future, what):
+    """Result of a finished lookup, or None if it failed or missed the deadline."""
+    if not future.done():
+        future.cancel()    # drops it if still queued; a running call stops at the deadline
+        app.logger.warning("%s lookup missed the deadline.", what)
+        return None
+    try:
+        return future.result()
+    except Exception:
+        app.logger.warning("%s lookup failed.", what)
+        return None
+
+def build_word_problem():
+    # Lookups form a small dependency graph: the distractor fills need nothing,
+    # Datamuse and Oxford only need the chosen word. Everything runs on the
+    # upstream executor under one deadline and whatever has arrived is used.
+    deadline = time.monotonic() + WORD_PROBLEM_DEADLINE
+
+    def remaining():
+        return max(0.0, deadline - time.monotonic())
+
+    # 2d) Speculatively fetch distractor candidates from WordsAPI
+    fills = []
+    if WORDS_API_KEY:
+        fills = [upstream_executor.submit(fetch_random_word, 2, deadline) for _ in range(3)]
+
     # 2a) Try to get a random word + definition from WordsAPI
     correct = None
     definition = None
     if WORDS_API_KEY:
-        try:
-            r = requests.get(
-                f"https://{WORDS_API_HOST}/words/?random=true",
-                headers={
-                    "X-RapidAPI-Key": WORDS_API_KEY,
-                    "X-RapidAPI-Host": WORDS_API_HOST
-                },
-                timeout=3
-            ).json()
-            correct = r.get("word")
-            defs = r.get("results", [])
-            definition = defs[0].get("definition") if defs else None
-        except Exception:
-            app.logger.warning("WordsAPI lookup failed, falling back to static.")
+        root = upstream_executor.submit(fetch_random_word, 3, deadline)
+        wait([root], timeout=remaining())
+        correct, definition = _result(root, "WordsAPI") or (None, None)
 
     # 2b) Fallback to static list
     if not correct or not definition:
-        pick = random.choice(STATIC_WORDS)
-        correct, definition = pick["word"], pick["definition"]
+        word_problem_steps.labels("2b_static_word").inc()
+        correct, definition = pick_static_word()
+    else:
+        word_problem_steps.labels("2a_wordsapi").inc()
 
-    # 2c) Fetch antonyms from Datamuse
-    wrongs = []
-    try:
-        ants = dm.words(rel_ant=correct, max=5)
-        wrongs = [w["word"] for w in ants if w.get("word") and w["word"] != correct][:3]
-    except Exception:
-        app.logger.warning("Datamuse lookup failed.")
-
-    # 2d) Fill with additional random words from WordsAPI if needed
-    while len(wrongs) < 3 and WORDS_API_KEY:
-        try:
-            r2 = requests.get(
-                f"https://{WORDS_API_HOST}/words/?random=true",
-                headers={
-                    "X-RapidAPI-Key": WORDS_API_KEY,
-                    "X-RapidAPI-Host": WORDS_API_HOST
-                },
-                timeout=2
-            ).json()
-            w2 = r2.get("word")
-            if w2 and w2 != correct and w2 not in wrongs:
-                wrongs.append(w2)
-        except Exception:
-            break
+    # 2c) + 2f) Antonyms from Datamuse and a richer definition from Oxford
+    antonyms = upstream_executor.submit(fetch_antonyms, correct, deadline)
+    oxford = None
+    if OXFORD_APP_ID and OXFORD_APP_KEY:
+        oxford = upstream_executor.submit(fetch_oxford_definition, correct, deadline)
 
-    # 2e) Final static fill if still short
-    if len(wrongs) < 3:
-        for pick in random.sample(STATIC_WORDS, 3 - len(wrongs)):
-            if pick["word"] != correct:
-                wrongs.append(pick["word"])
+    wait([f for f in [antonyms, oxford] + fills if f], timeout=remaining())
 
-    # 2f) Try Oxford for richer definition
-    if OXFORD_APP_ID and OXFORD_APP_KEY:
-        try:
-            od = requests.get(
-                f"https://od-api-sandbox.oxforddictionaries.com/api/v2/entries/en-us/{correct.lower()}",
-                headers={"app_id": OXFORD_APP_ID, "app_key": OXFORD_APP_KEY},
-                timeout=3
-            ).json()
-            defs = od["results"][0]["lexicalEntries"][0]["entries"][0]["senses"][0]["definitions"]
-            if defs:
-                definition = defs[0]
-        except Exception:
-            app.logger.warning("Oxford lookup failed.")
-
-    # 2g) Shuffle and respond
-    options = wrongs + [correct]
-    random.shuffle(options)
-    return jsonify({"definition": definition, "options": options, "answer": correct})
+    return assemble_word_problem(
+        correct,
+        definition,
+        _result(antonyms, "Datamuse"),
+        [(_result(fill, "WordsAPI fill") or (None, None))[0] for fill in fills],
+        _result(oxford, "Oxford") if oxford else None,
+    )
+
+# Questions are assembled off the request path by a background worker, so a
+# request only ever pops from memory; the static builder covers a drained pool.
+word_pool = PrefetchPool(
+    build_word_problem,
+    high_water=WORD_POOL_SIZE,
+    low_water=WORD_POOL_LOW_WATER,
+    name="word_problem",
+    shared=shared_store,
+)
+
+# With a local word index configured, questions are a memory-mapped lookup
+# and the live upstream pipeline (and its pool) is never started.
+word_index = (WordIndexStore(WORD_INDEX_PATH, WORD_DUMP_PATH or None)
+              if WORD_INDEX_PATH else None)
+
+def next_word_problem(difficulty=None):
+    # Difficulty only applies to indexed words; live upstream words are unrated.
+    if word_index is not None:
+        word_index.start()
+        problem = word_index.question(difficulty)
+        if problem:
+            content_source.labels("word_problem", "index").inc()
+            return problem
+    word_pool.start()
+    problem = word_pool.get()
+    if problem:
+        content_source.labels("word_problem", "pool").inc()
+        return problem
+    content_source.labels("word_problem", "static").inc()
+    return build_static_word_problem()
+
+def take_word_problems(n, difficulty=None):
+    if word_index is not None:
+        word_index.start()
+        problems = [p for p in (word_index.question(difficulty) for _ in range(n)) if p]
+        if problems:
+            content_source.labels("word_problem", "index").inc(len(problems))
+            return problems
+    # Hand out only what is already built; the client asks again for more.
+    word_pool.start()
+    problems = word_pool.take(n)
+    if problems:
+        content_source.labels("word_problem", "pool").inc(len(problems))
+        return problems
+    content_source.labels("word_problem", "static").inc()
+    return [build_static_word_problem()]
+
+@app.route("/api/word_problem")
+def api_word_problem():
+    return jsonify(next_word_problem(resolve_difficulty(request.args, "reading")))
+
+@app.route("/api/word_problems")
+def api_word_problems():
+    n = batch_size(request.args.get("n", 5), WORD_BATCH_MAX)
+    return jsonify(take_word_problems(n, resolve_difficulty(request.args, "reading")))
 
 
 # ─── 3) SCIENCE (static → NASA APOD/Image Library → static) ────────────────
@@ -152,43 +444,74 @@ SCIENCE_STATIC = [
      "explanation":"This change is called metamorphosis."},
 ]
 
+NASA_SEARCH_TERMS = ["moon","mars","stars","rocket"]
+
+nasa_cache = TTLCache(
+    maxsize=NASA_CACHE_SIZE,
+    persist_path=os.path.join(CACHE_DIR, "nasa.json") if CACHE_DIR else None,
+    name="nasa",
+    shared=shared_store,
+)
+
+def seconds_until_next_utc_day():
+    now = datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+APOD_URL = f"{NASA_API_URL}/planetary/apod?api_key={NASA_API_KEY}"
+
+def nasa_search_url(term):
+    return f"{NASA_IMAGES_URL}/search?q={term}&media_type=image"
+
+def parse_apod(apod):
+    if "explanation" not in apod:
+        raise ValueError("APOD response has no explanation")
+    return {
+        "fact": apod.get("title","NASA Fact"),
+        "image": apod.get("url",""),
+        "explanation": apod["explanation"][:150] + "...",
+        "source": "NASA APOD"
+    }
+
+def parse_nasa_search(lib):
+    facts = []
+    for it in lib.get("collection",{}).get("items",[]):
+        meta = it["data"][0]
+        href = next((l["href"] for l in it.get("links",[]) if "href" in l), None)
+        if href:
+            facts.append({
+                "fact": meta.get("title","Space Image"),
+                "image": href,
+                "explanation": (meta.get("description","")[:150] + "..."),
+                "source": "NASA Images"
+            })
+    return facts
+
+def load_apod():
+    return parse_apod(upstream.get_json(APOD_URL))
+
+def load_nasa_search(term):
+    return parse_nasa_search(upstream.get_json(nasa_search_url(term)))
+
 def fetch_nasa_fact():
     if not NASA_API_KEY:
         return None
-    # APOD
+    # APOD (changes once per UTC day)
     try:
-        apod = requests.get(
-            f"https://api.nasa.gov/planetary/apod?api_key={NASA_API_KEY}",
-            timeout=5
-        ).json()
-        if "explanation" in apod:
-            return {
-                "fact": apod.get("title","NASA Fact"),
-                "image": apod.get("url",""),
-                "explanation": apod["explanation"][:150] + "...",
-                "source": "NASA APOD"
-            }
+        fact = nasa_cache.get_or_load("apod", load_apod, seconds_until_next_utc_day)
+        content_source.labels("science_fact", "apod").inc()
+        return fact
     except Exception:
         pass
-    # Image Library
+    # Image Library (cached per search term)
     try:
-        term = random.choice(["moon","mars","stars","rocket"])
-        lib = requests.get(
-            f"https://images-api.nasa.gov/search?q={term}&media_type=image",
-            timeout=5
-        ).json()
-        items = lib.get("collection",{}).get("items",[])
-        if items:
-            it = random.choice(items)
-            meta = it["data"][0]
-            href = next((l["href"] for l in it.get("links",[]) if "href" in l), None)
-            if href:
-                return {
-                    "fact": meta.get("title","Space Image"),
-                    "image": href,
-                    "explanation": (meta.get("description","")[:150] + "..."),
-                    "source": "NASA Images"
-                }
+        term = random.choice(NASA_SEARCH_TERMS)
+        facts = nasa_cache.get_or_load(
+            f"search:{term}", lambda: load_nasa_search(term), NASA_SEARCH_TTL
+        )
+        if facts:
+            content_source.labels("science_fact", "nasa_search").inc()
+            return random.choice(facts)
     except Exception:
         pass
     return None
@@ -200,9 +523,10 @@ def api_science_fact():
     # 2) try live NASA
     live = fetch_nasa_fact()
     if live:
-        return jsonify(live)
+        return jsonify(with_proxied_image(live))
     # 3) final fallback
-    return jsonify(fallback)
+    content_source.labels("science_fact", "static").inc()
+    return jsonify(with_proxied_image(fallback))
 
 
 # ─── 4) CELEBRATION GIF (Giphy SDK → static) ────────────────────────────────
@@ -211,26 +535,183 @@ CELEBRATION_STATIC = [
     "https://media.giphy.com/media/3o7TKDEhaHWJpBs2Xu/giphy.gif"
 ]
 
+def load_celebration_gifs(query):
+    from giphy_client.rest import ApiException
+
+    try:
+        resp = breakers.get(host_of(GIPHY_API_URL)).call(
+            giphy_api().gifs_search_get,
+            api_key=GIPHY_API_KEY,
+            q=query,
+            limit=25,
+            rating="g"
+        )
+    except ApiException:
+        app.logger.warning("Giphy SDK lookup failed.")
+        raise
+    return [g.images.fixed_height.url for g in resp.data or []]
+
+# Search results are refreshed in the background; a request is a random pick
+# from the locally stored list.
+gif_cache = SampledResultCache(
+    load_celebration_gifs,
+    GIPHY_QUERIES,
+    refresh_interval=GIPHY_REFRESH_INTERVAL,
+    name="giphy",
+    shared=shared_store,
+)
+
 @app.route("/api/celebration_gif")
 def api_celebration_gif():
     if GIPHY_API_KEY:
-        try:
-            resp = giphy_api.gifs_search_get(
-                api_key=GIPHY_API_KEY,
-                q="funny dog",
-                limit=25,
-                rating="g"
-            )
-            gifs = resp.data or []
-            if gifs:
-                choice = random.choice(gifs)
-                return jsonify({"url": choice.images.fixed_height.url})
-        except ApiException:
-            app.logger.warning("Giphy SDK lookup failed.")
-    return jsonify({"url": random.choice(CELEBRATION_STATIC)})
-
-
-# ─── 5) UI ROUTES ─────────────────────────────────────────────────────────────
+        gif_cache.start()
+        url = gif_cache.sample()
+        if url:
+            content_source.labels("celebration_gif", "giphy").inc()
+            return jsonify({"url": proxied(url, GIF_WIDTH)})
+    content_source.labels("celebration_gif", "static").inc()
+    return jsonify({"url": proxied(random.choice(CELEBRATION_STATIC), GIF_WIDTH)})
+
+
+# ─── 4b) MEDIA PROXY (NASA / Giphy images from our own origin) ───────────────
+SCIENCE_IMAGE_WIDTH = 600     # shown at up to 300 CSS px, 2x for high-DPI screens
+GIF_WIDTH = 400               # shown at up to 200 CSS px
+
+MEDIA_UPSTREAM = "media"      # one session/breaker/metrics label for every image host
+MEDIA_MAX_REDIRECTS = 3
+
+def fetch_media(url, max_bytes):
+    # Redirects are followed by hand so every hop is checked against the allowlist.
+    for _ in range(MEDIA_MAX_REDIRECTS + 1):
+        resp = upstream.get(url, stream=True, allow_redirects=False, name=MEDIA_UPSTREAM)
+        if not resp.is_redirect:
+            break
+        resp.close()
+        url = urljoin(url, resp.headers["Location"])
+        if not media_store.allowed(url):
+            raise ValueError(f"redirect to {url} is not allowed")
+    else:
+        raise ValueError(f"too many redirects fetching {url}")
+    try:
+        resp.raise_for_status()
+        data = bytearray()
+        for chunk in resp.iter_content(64 * 1024):
+            data += chunk
+            if len(data) > max_bytes:
+                raise ValueError(f"{url} is larger than {max_bytes} bytes")
+    finally:
+        resp.close()
+    return bytes(data), resp.headers.get("Content-Type", "").split(";")[0].strip()
+
+media_store = (MediaStore(MEDIA_CACHE_DIR, fetch_media, MEDIA_HOSTS,
+                          max_bytes=MEDIA_CACHE_MB << 20)
+               if MEDIA_PROXY else None)
+
+def proxied(url, width):
+    """Our /media URL for a remote image, or the URL itself if it isn't proxied."""
+    if media_store is None or not url or not media_store.allowed(url):
+        return url
+    return "/media?" + urlencode({"url": url, "w": width})
+
+def with_proxied_image(fact):
+    if fact.get("image"):
+        fact = dict(fact, image=proxied(fact["image"], SCIENCE_IMAGE_WIDTH))
+    return fact
+
+@app.route("/media")
+def media():
+    url = request.args.get("url", "")
+    if media_store is None or not media_store.allowed(url):
+        abort(404)
+    # Only clients that name WebP explicitly get it (a bare */* proves nothing).
+    webp = any(v == "image/webp" and q > 0 for v, q in request.accept_mimetypes)
+    try:
+        path, mimetype, key = media_store.get(url, request.args.get("w", type=int), webp)
+    except MediaError:
+        app.logger.warning("Media proxy could not serve %s.", url)
+        # The browser can still try the original host itself.
+        return redirect(url)
+    response = send_file(path, mimetype=mimetype, etag=key, max_age=7 * 24 * 3600,
+                         conditional=True)
+    response.vary.add("Accept")
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+# ─── 5) INTERNAL STATS & METRICS ─────────────────────────────────────────────
+@app.route("/internal/stats")
+def internal_stats():
+    return jsonify({
+        "players": players.stats(),
+        "word_pool": word_pool.stats(),
+        "word_index": word_index.stats() if word_index else None,
+        "upstream": upstream.stats(),
+        "breakers": breakers.stats(),
+        "nasa_cache": nasa_cache.stats(),
+        "gif_cache": gif_cache.stats(),
+        "media": media_store.stats() if media_store else None,
+        "shared": shared_store.stats() if shared_store else None,
+    })
+
+CACHE_RESULTS = (("hit", "hits"), ("stale", "stale_hits"),
+                 ("miss", "misses"), ("negative", "negative_hits"))
+
+def collect_component_metrics():
+    # Read at scrape time from the counters the components already keep.
+    pool = word_pool.stats()
+    yield ("learning_game_word_pool_size", "gauge",
+           "Prebuilt word questions ready to serve.", [({}, pool["size"])])
+    yield ("learning_game_word_pool_builds_total", "counter",
+           "Word questions built by the prefetch worker.",
+           [({"outcome": "ok"}, pool["built"]), ({"outcome": "error"}, pool["build_failures"])])
+    caches = {"nasa": nasa_cache.stats(), "giphy": gif_cache.stats()}
+    if media_store:
+        caches["media"] = media_store.stats()
+    yield ("learning_game_cache_lookups_total", "counter", "Cache lookups by result.",
+           [({"cache": name, "result": result}, stats[key])
+            for name, stats in caches.items() for result, key in CACHE_RESULTS if key in stats])
+    breaker_stats = breakers.stats()
+    yield ("learning_game_breaker_open", "gauge",
+           "1 while an upstream's circuit breaker is open or half-open.",
+           [({"upstream": name}, int(b["state"] != "closed")) for name, b in breaker_stats.items()])
+    yield ("learning_game_breaker_rejected_total", "counter",
+           "Calls failed fast by an open breaker.",
+           [({"upstream": name}, b["rejected"]) for name, b in breaker_stats.items()])
+    yield ("learning_game_players", "gauge", "Players with adaptive state in memory.",
+           [({}, len(players))])
+
+REGISTRY.register_collector(collect_component_metrics)
+
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+# ─── 6) UI ROUTES ─────────────────────────────────────────────────────────────
+# CSS/JS built by `python assets.py build` get content-hashed URLs, so they
+# can be cached forever; without a build the plain /static files are used.
+asset_manifest = AssetManifest()
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+@app.template_global()
+def asset_url(name):
+    return asset_manifest.url(name) or url_for("static", filename=name)
+
+@app.route("/assets/<path:path>")
+def hashed_asset(path):
+    found = asset_manifest.variant(path, lambda e: request.accept_encodings.quality(e) > 0)
+    if found is None:
+        abort(404)
+    file_path, encoding, mimetype, etag = found
+    response = send_file(file_path, mimetype=mimetype, etag=etag,
+                         max_age=ASSET_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route("/")
 def home():
     return render_template("index.html")
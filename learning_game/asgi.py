@@ -0,0 +1,258 @@
+"""
+Async (ASGI) serving mode for the learning game.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:5000 asgi:application
+
+The /api/* routes run natively on the event loop and do all upstream I/O
+through a non-blocking AsyncUpstreamClient, so a worker is never parked on
+WordsAPI/NASA while other requests wait. Pages, static files and
+/internal/stats are delegated to the regular Flask app, which stays the
+default sync mode (`gunicorn app:app`).
+"""
+import asyncio
+import json
+import random
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as core
+from upstream import AsyncUpstreamClient
+
+flask_asgi = WsgiToAsgi(core.app)
+
+_state = {}
+
+
+def _started():
+    """Per-process async resources, created lazily inside the running loop."""
+    if not _state:
+        loop = asyncio.get_running_loop()
+        refill = asyncio.Event()
+        _state["upstream"] = AsyncUpstreamClient(
+            timeouts=core.UPSTREAM_TIMEOUTS,
+            retries=core.UPSTREAM_RETRIES,
+            total_timeout=core.UPSTREAM_TOTAL_TIMEOUT,
+            breakers=core.breakers,
+        )
+        _state["refill"] = refill
+        core.word_pool.notify = lambda: loop.call_soon_threadsafe(refill.set)
+        _state["filler"] = loop.create_task(_fill_word_pool())
+        if core.word_index is None:
+            refill.set()
+    return _state
+
+
+# ─── 2) READING (async pipeline, same graph as app.build_word_problem) ────────
+async def fetch_random_word(timeout):
+    upstream = _state["upstream"]
+    r = await upstream.get_json(core.RANDOM_WORD_URL, headers=core.WORDS_API_HEADERS,
+                                timeout=timeout)
+    return core.parse_random_word(r)
+
+async def fetch_antonyms(word):
+    upstream = _state["upstream"]
+    ants = await upstream.get_json(f"{core.DATAMUSE_API_URL}/words",
+                                   params={"rel_ant": word, "max": 5})
+    return core.parse_antonyms(ants, word)
+
+async def fetch_oxford_definition(word):
+    upstream = _state["upstream"]
+    od = await upstream.get_json(core.oxford_url(word), headers=core.OXFORD_HEADERS)
+    return core.parse_oxford_definition(od)
+
+def _result(task, what):
+    if not task.done():
+        task.cancel()
+        core.app.logger.warning("%s lookup missed the deadline.", what)
+        return None
+    if task.exception() is not None:
+        core.app.logger.warning("%s lookup failed.", what)
+        return None
+    return task.result()
+
+async def build_word_problem():
+    deadline = time.monotonic() + core.WORD_PROBLEM_DEADLINE
+
+    def remaining():
+        return max(0.0, deadline - time.monotonic())
+
+    fills = []
+    if core.WORDS_API_KEY:
+        fills = [asyncio.ensure_future(fetch_random_word(2)) for _ in range(3)]
+
+    correct = definition = None
+    if core.WORDS_API_KEY:
+        root = asyncio.ensure_future(fetch_random_word(3))
+        await asyncio.wait([root], timeout=remaining())
+        correct, definition = _result(root, "WordsAPI") or (None, None)
+
+    if not correct or not definition:
+        core.word_problem_steps.labels("2b_static_word").inc()
+        correct, definition = core.pick_static_word()
+    else:
+        core.word_problem_steps.labels("2a_wordsapi").inc()
+
+    antonyms = asyncio.ensure_future(fetch_antonyms(correct))
+    oxford = None
+    if core.OXFORD_APP_ID and core.OXFORD_APP_KEY:
+        oxford = asyncio.ensure_future(fetch_oxford_definition(correct))
+
+    pending = [t for t in [antonyms, oxford] + fills if t]
+    await asyncio.wait(pending, timeout=remaining())
+
+    return core.assemble_word_problem(
+        correct,
+        definition,
+        _result(antonyms, "Datamuse"),
+        [(_result(fill, "WordsAPI fill") or (None, None))[0] for fill in fills],
+        _result(oxford, "Oxford") if oxford else None,
+    )
+
+async def _fill_word_pool():
+    pool = core.word_pool
+    refill = _state["refill"]
+    while True:
+        await refill.wait()
+        refill.clear()
+        try:
+            while pool.claim_fill() and len(pool) < pool.high_water:
+                try:
+                    pool.put(await build_word_problem())
+                except Exception:
+                    core.app.logger.exception("Async word problem build failed.")
+                    pool.build_failures += 1
+                    await asyncio.sleep(pool.retry_delay)
+        finally:
+            pool.release_fill()
+
+
+# ─── 3) SCIENCE ───────────────────────────────────────────────────────────────
+async def load_apod():
+    return core.parse_apod(await _state["upstream"].get_json(core.APOD_URL))
+
+async def load_nasa_search(term):
+    return core.parse_nasa_search(
+        await _state["upstream"].get_json(core.nasa_search_url(term))
+    )
+
+async def fetch_nasa_fact():
+    if not core.NASA_API_KEY:
+        return None
+    cache = core.nasa_cache
+    try:
+        fact = await cache.get_or_load_async("apod", load_apod, core.seconds_until_next_utc_day)
+        core.content_source.labels("science_fact", "apod").inc()
+        return fact
+    except Exception:
+        pass
+    try:
+        term = random.choice(core.NASA_SEARCH_TERMS)
+        facts = await cache.get_or_load_async(
+            f"search:{term}", lambda: load_nasa_search(term), core.NASA_SEARCH_TTL
+        )
+        if facts:
+            core.content_source.labels("science_fact", "nasa_search").inc()
+            return random.choice(facts)
+    except Exception:
+        pass
+    return None
+
+
+# ─── Routes ──────────────────────────────────────────────────────────────────
+async def api_math_problem(args):
+    grade = core.int_arg(args, "grade", 1)
+    return core.generate_math_problem(grade, core.resolve_difficulty(args, "math"))
+
+async def api_math_problems(args):
+    grade = core.int_arg(args, "grade", 1)
+    n = core.batch_size(args.get("n", 20), core.MATH_BATCH_MAX)
+    seed = core.int_arg(args, "seed", minimum=0)
+    return core.generate_math_problems(grade, n, seed, core.resolve_difficulty(args, "math"))
+
+async def api_word_problem(args):
+    return core.next_word_problem(core.resolve_difficulty(args, "reading"))
+
+async def api_word_problems(args):
+    n = core.batch_size(args.get("n", 5), core.WORD_BATCH_MAX)
+    return core.take_word_problems(n, core.resolve_difficulty(args, "reading"))
+
+async def api_science_fact(args):
+    fact = await fetch_nasa_fact()
+    if fact:
+        return core.with_proxied_image(fact)
+    core.content_source.labels("science_fact", "static").inc()
+    return core.with_proxied_image(random.choice(core.SCIENCE_STATIC))
+
+async def api_celebration_gif(args):
+    if core.GIPHY_API_KEY:
+        # The Giphy SDK is synchronous, so its refresher stays on a background
+        # thread; the request itself only samples from memory.
+        core.gif_cache.start()
+        url = core.gif_cache.sample()
+        if url:
+            core.content_source.labels("celebration_gif", "giphy").inc()
+            return {"url": core.proxied(url, core.GIF_WIDTH)}
+    core.content_source.labels("celebration_gif", "static").inc()
+    return {"url": core.proxied(random.choice(core.CELEBRATION_STATIC), core.GIF_WIDTH)}
+
+ROUTES = {
+    "/api/math_problem": api_math_problem,
+    "/api/math_problems": api_math_problems,
+    "/api/word_problem": api_word_problem,
+    "/api/word_problems": api_word_problems,
+    "/api/science_fact": api_science_fact,
+    "/api/celebration_gif": api_celebration_gif,
+}
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                _started()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if _state:
+                    _state["filler"].cancel()
+                    await _state["upstream"].aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    handler = ROUTES.get(scope.get("path")) if scope["type"] == "http" else None
+    if handler is None or scope["method"] != "GET":
+        return await flask_asgi(scope, receive, send)
+
+    _started()
+    # Routes delegated to Flask are timed by its own hooks; these are timed here.
+    route = scope["path"]
+    start = core.http_metrics.begin(route)
+    status = 500
+    try:
+        args = {k: v[-1] for k, v in parse_qs(scope["query_string"].decode()).items()}
+        try:
+            payload = await handler(args)
+        except ValueError as e:
+            status = 400
+            return await _send_json(send, status, {"error": str(e)})
+        status = 200
+        await _send_json(send, status, payload)
+    finally:
+        core.http_metrics.end(route, "GET", status, start)
@@ -0,0 +1,151 @@
+"""
+Build-time static asset pipeline.
+
+`build` copies every CSS/JS file under static/ to static/dist/ with a
+content hash in its name (css/style.3f9a1c2e.css), writes a gzip and, when
+the optional `brotli` package is installed, a brotli variant next to it,
+and records the mapping in static/dist/manifest.json:
+
+    python assets.py build
+
+Because a changed file gets a new name, the app can serve these with
+`Cache-Control: immutable` and a year's max-age (see AssetManifest).
+Without a build, templates fall back to the plain /static URLs.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_DIR, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+EXTENSIONS = (".css", ".js")
+MIN_COMPRESS_SIZE = 256     # smaller files are served as-is
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def hashed_name(path, digest):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest[:8]}{ext}"
+
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Write hashed and pre-compressed copies of the assets plus a manifest."""
+    brotli = _brotli()
+    if brotli is None:
+        logger.warning("brotli is not installed; writing gzip variants only.")
+
+    tmp = f"{dist_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir
+                   and not d.startswith("dist.")]
+        for name in sorted(files):
+            if not name.endswith(EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            rel = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            target = hashed_name(rel, digest)
+
+            variants = {"identity": data}
+            if len(data) >= MIN_COMPRESS_SIZE:
+                variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+                if brotli is not None:
+                    variants["br"] = brotli.compress(data, quality=11)
+            out = os.path.join(tmp, target)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            suffixes = dict(ENCODINGS, identity="")
+            for encoding, body in variants.items():
+                # Keep a compressed variant only if it actually saves bytes.
+                if encoding == "identity" or len(body) < len(data):
+                    with open(out + suffixes[encoding], "wb") as f:
+                        f.write(body)
+            manifest[rel] = {
+                "path": target,
+                "etag": digest[:16],
+                "size": len(data),
+                "encodings": [e for e, _ in ENCODINGS
+                              if e in variants and len(variants[e]) < len(data)],
+            }
+
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.replace(tmp, dist_dir)
+    logger.info("Built %d assets into %s.", len(manifest), dist_dir)
+    return manifest
+
+
+class AssetManifest:
+    """
+    Resolves logical asset names to their hashed URLs and picks the best
+    pre-compressed variant for a request.
+
+    The manifest is read once at startup; with no manifest (no build step
+    run) `url()` returns None so callers can fall back to /static.
+    """
+
+    def __init__(self, dist_dir=DIST_DIR):
+        self.dist_dir = dist_dir
+        self.assets = {}
+        self._by_path = {}
+        path = os.path.join(dist_dir, "manifest.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.assets = json.load(f)
+            self._by_path = {a["path"]: a for a in self.assets.values()}
+
+    def url(self, name):
+        asset = self.assets.get(name)
+        return f"/assets/{asset['path']}" if asset else None
+
+    def variant(self, path, accepts):
+        """
+        (file path, content encoding or None, mimetype, etag) for a hashed
+        asset path, or None if unknown. `accepts(encoding)` tells whether the
+        client takes an encoding.
+        """
+        asset = self._by_path.get(path)
+        if asset is None:
+            return None
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        file_path = os.path.join(self.dist_dir, path)
+        for encoding, suffix in ENCODINGS:
+            if encoding in asset["encodings"] and accepts(encoding):
+                return file_path + suffix, encoding, mimetype, f"{asset['etag']}-{encoding}"
+        return file_path, None, mimetype, asset["etag"]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Build hashed, pre-compressed static assets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="write static/dist/ and its manifest")
+    parser.parse_args()
+
+    for name, asset in sorted(build().items()):
+        print(f"{name} -> {asset['path']} ({asset['size']} bytes, "
+              f"{', '.join(asset['encodings']) or 'uncompressed'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Measure what the /metrics instrumentation costs.
+
+    python -m bench.bench_metrics --requests 20000
+
+Reports nanoseconds per recording call (counter, labelled counter, gauge,
+histogram), the added time per request for a Flask app with and without
+instrument_flask(), and how long a /metrics scrape takes to render, as JSON.
+"""
+import argparse
+import json
+import time
+import timeit
+
+from flask import Flask, jsonify
+
+from metrics import HttpMetrics, Registry, instrument_flask
+
+
+def ns_per_call(stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    return round(best / number * 1e9, 1)
+
+
+def bench_primitives(number):
+    registry = Registry()
+    counter = registry.counter("bench_total", "bench")
+    labelled = registry.counter("bench_labelled_total", "bench", ("route", "status"))
+    gauge = registry.gauge("bench_gauge", "bench")
+    histogram = registry.histogram("bench_seconds", "bench", ("route",))
+    child = histogram.labels("/api/math_problem")
+    return {
+        "counter.inc": ns_per_call(counter.inc, number),
+        "counter.labels().inc": ns_per_call(
+            lambda: labelled.labels("/api/math_problem", "200").inc(), number),
+        "gauge.inc+dec": ns_per_call(lambda: (gauge.inc(), gauge.dec()), number),
+        "histogram.labels().observe": ns_per_call(
+            lambda: histogram.labels("/api/math_problem").observe(0.0042), number),
+        "histogram child.observe": ns_per_call(lambda: child.observe(0.0042), number),
+    }
+
+
+def make_app(instrumented):
+    app = Flask(__name__)
+
+    @app.route("/api/math_problem")
+    def math_problem():
+        return jsonify({"problem": "2 + 3", "answer": 5})
+
+    if instrumented:
+        instrument_flask(app, HttpMetrics(Registry()))
+    return app
+
+
+def us_per_request(app, requests):
+    client = app.test_client()
+    for _ in range(200):                     # warm-up
+        client.get("/api/math_problem")
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get("/api/math_problem")
+        best = min(best, time.perf_counter() - start)
+    return best / requests * 1e6
+
+
+def bench_requests(requests):
+    plain = us_per_request(make_app(False), requests)
+    instrumented = us_per_request(make_app(True), requests)
+    return {
+        "plain_us": round(plain, 2),
+        "instrumented_us": round(instrumented, 2),
+        "overhead_us": round(instrumented - plain, 2),
+        "overhead_pct": round((instrumented - plain) / plain * 100, 2),
+    }
+
+
+def bench_render(series):
+    registry = Registry()
+    http = HttpMetrics(registry)
+    for i in range(series):
+        http.duration.labels(f"/route/{i}", "GET", "200").observe(0.01)
+    start = time.perf_counter()
+    body = registry.render()
+    return {"series": series, "render_ms": round((time.perf_counter() - start) * 1000, 2),
+            "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead benchmark")
+    parser.add_argument("--calls", type=int, default=200000,
+                        help="calls per primitive timing")
+    parser.add_argument("--requests", type=int, default=5000,
+                        help="test-client requests per app variant")
+    parser.add_argument("--series", type=int, default=100,
+                        help="histogram series rendered in the scrape timing")
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "primitives_ns": bench_primitives(args.calls),
+        "per_request": bench_requests(args.requests),
+        "scrape": bench_render(args.series),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare the sync (gunicorn app:app) and async (asgi:application) serving
+modes against stubbed upstreams.
+
+    python -m bench.bench_serving --concurrency 200 --duration 10 --latency 0.2
+
+Each mode is started as a gunicorn server with the same worker count and
+pointed at bench.stub_upstreams; requests/sec and p50/p95/p99 are printed as
+JSON. `--cold` disables the NASA response cache so every science request
+waits on the (stubbed) upstream, which is where the two modes differ most.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.loadgen import run_load
+from bench.stub_upstreams import serve, stub_env
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ["/api/math_problem?grade=1", "/api/word_problem",
+          "/api/science_fact", "/api/celebration_gif"]
+
+MODES = {
+    "sync": ["app:app"],
+    "async": ["-k", "uvicorn.workers.UvicornWorker", "asgi:application"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/math_problem", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not come up")
+
+
+def start_server(mode, port, workers, env):
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+           "--workers", str(workers), "--log-level", "warning"] + MODES[mode]
+    return subprocess.Popen(cmd, cwd=APP_DIR, env=env)
+
+
+def bench_mode(mode, args, upstream_env):
+    port = free_port()
+    env = dict(os.environ, **upstream_env)
+    if args.cold:
+        env["NASA_CACHE_SIZE"] = "0"
+    server = start_server(mode, port, args.workers, env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url)
+        run_load(base_url, args.routes, concurrency=4, duration=1.0)  # warm-up
+        return run_load(base_url, args.routes, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async serving benchmark")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--routes", nargs="+", default=ROUTES)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="stubbed upstream latency in seconds")
+    parser.add_argument("--cold", action="store_true",
+                        help="disable the NASA cache so requests wait on upstreams")
+    args = parser.parse_args()
+
+    stub = serve(latency=args.latency)
+    results = {mode: bench_mode(mode, args, stub_env(stub)) for mode in args.modes}
+    stub.shutdown()
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Closed-loop HTTP load generator shared by the benchmark scripts."""
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(q / 100 * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed, statuses=None):
+    """Throughput and latency percentiles (ms) for one run."""
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    summary = {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+    }
+    if statuses is not None:
+        summary["statuses"] = dict(sorted(statuses.items()))
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def _drive(base_url, paths, concurrency, duration, timeout):
+    latencies, errors = [], 0
+    statuses = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        stop_at = time.monotonic() + duration
+
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.monotonic() < stop_at:
+                path = paths[i % len(paths)]
+                i += 1
+                start = time.monotonic()
+                try:
+                    resp = await client.get(path)
+                    ok = resp.status_code < 400
+                    statuses[str(resp.status_code)] += 1
+                except httpx.HTTPError as e:
+                    ok = False
+                    statuses[type(e).__name__] += 1
+                if ok:
+                    latencies.append(time.monotonic() - start)
+                else:
+                    errors += 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.monotonic() - start
+    return summarize(latencies, errors, elapsed, statuses)
+
+
+def run_load(base_url, paths, concurrency=50, duration=10.0, timeout=30.0):
+    """Hit `paths` round-robin from `concurrency` clients for `duration` seconds."""
+    return asyncio.run(_drive(base_url, list(paths), concurrency, duration, timeout))
@@ -0,0 +1,107 @@
+"""
+Per-route load test of the learning game against stubbed upstreams.
+
+    python -m bench.loadtest --concurrency 50 --duration 10 --latency 0.1 \
+        --error-rate 0.02 --output results.json
+
+Starts bench.stub_upstreams and the app under gunicorn (`--mode sync` or
+`async`), then drives each /api route on its own at the given concurrency
+and prints throughput, p50/p95/p99 and error rates per route as JSON.
+`--url` targets an app that is already running instead (no stub, no
+server). With `--baseline` the run is compared to an earlier `--output`
+file and the exit status is 1 if any route's throughput dropped or p95
+grew by more than `--tolerance`.
+"""
+import argparse
+import json
+import os
+import sys
+
+from bench.bench_serving import free_port, start_server, wait_ready
+from bench.loadgen import run_load
+from bench.stub_upstreams import load_payloads, serve, stub_env
+
+ROUTES = [
+    "/api/math_problem?grade=2",
+    "/api/math_problems?grade=2&n=20",
+    "/api/word_problem",
+    "/api/word_problems?n=5",
+    "/api/science_fact",
+    "/api/celebration_gif",
+]
+
+
+def run_routes(base_url, args):
+    results = {}
+    for route in args.routes:
+        run_load(base_url, [route], concurrency=4, duration=0.5)  # warm-up
+        results[route] = run_load(base_url, [route], args.concurrency, args.duration)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Routes whose rps fell or p95 rose by more than `tolerance` (a fraction)."""
+    regressions = []
+    for route, now in results.items():
+        before = baseline.get(route)
+        if not before:
+            continue
+        if before["rps"] and now["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append({"route": route, "metric": "rps",
+                                "baseline": before["rps"], "current": now["rps"]})
+        if before["p95_ms"] and now["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append({"route": route, "metric": "p95_ms",
+                                "baseline": before["p95_ms"], "current": now["p95_ms"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-route load test")
+    parser.add_argument("--url", help="test an already running app at this base URL")
+    parser.add_argument("--mode", default="sync", choices=["sync", "async"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--routes", nargs="+", default=ROUTES)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per route")
+    parser.add_argument("--latency", type=float, default=0.1,
+                        help="stubbed upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of stubbed upstream calls that fail with a 503")
+    parser.add_argument("--payloads", help="stub payload overrides (see stub_upstreams)")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.url:
+        results = run_routes(args.url.rstrip("/"), args)
+    else:
+        stub = serve(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     payloads=load_payloads(args.payloads))
+        port = free_port()
+        server = start_server(args.mode, port, args.workers,
+                              dict(os.environ, **stub_env(stub)))
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_ready(base_url)
+            results = run_routes(base_url, args)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+            stub.shutdown()
+
+    report = {"config": vars(args), "results": results}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.tolerance)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measure worker cold start: how long `import app` takes and how much memory
+a fresh worker holds afterwards.
+
+    python -m bench.profile_startup --runs 5 --budget-ms 250 --budget-rss-mb 80
+
+Each run is a fresh interpreter (as a new gunicorn worker or container
+would be) importing app.py with `-X importtime`; the median import time,
+RSS after import and after a first /api/math_problem request, and the
+slowest direct imports of app are printed as JSON. The exit status is 1 if
+the median exceeds a given budget.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+base = rss_mb()
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+after_import = rss_mb()
+app.app.test_client().get("/api/math_problem")
+first_request = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_request_ms": (first_request - imported) * 1000,
+    "rss_base_mb": base,
+    "rss_after_import_mb": after_import,
+    "rss_after_request_mb": rss_mb(),
+}))
+"""
+
+# "import time: <self us> | <cumulative us> | <indent><module>"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def direct_imports(stderr, top):
+    """Slowest modules imported directly by app.py (cumulative ms)."""
+    found = []
+    for line in stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if not m:
+            continue
+        _, cumulative, indent, module = m.groups()
+        if len(indent) == 3:           # one level below the top-level import
+            found.append((module, int(cumulative)))
+        elif len(indent) == 1:
+            if module == "app":
+                break
+            found = []                 # interpreter start-up, not app's imports
+    found.sort(key=lambda item: -item[1])
+    return {module: round(us / 1000, 1) for module, us in found[:top]}
+
+
+def profile_once(env):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE],
+                          cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker cold-start profiler")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="direct imports to list")
+    parser.add_argument("--budget-ms", type=float, help="max median import time")
+    parser.add_argument("--budget-rss-mb", type=float, help="max median RSS after import")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    runs, stderr = [], ""
+    for _ in range(args.runs):
+        result, stderr = profile_once(env)
+        runs.append(result)
+
+    report = {key: round(statistics.median(r[key] for r in runs), 1) for key in runs[0]}
+    report["runs"] = args.runs
+    report["slowest_imports_ms"] = direct_imports(stderr, args.top)
+    over = []
+    if args.budget_ms is not None and report["import_ms"] > args.budget_ms:
+        over.append(f"import_ms {report['import_ms']} > {args.budget_ms}")
+    if args.budget_rss_mb is not None and report["rss_after_import_mb"] > args.budget_rss_mb:
+        over.append(f"rss_after_import_mb {report['rss_after_import_mb']} > {args.budget_rss_mb}")
+    report["over_budget"] = over
+    print(json.dumps(report, indent=2))
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
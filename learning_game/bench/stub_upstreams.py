@@ -0,0 +1,161 @@
+"""
+Local stand-in for the external APIs the learning game calls.
+
+Serves WordsAPI, Datamuse, Oxford, NASA APOD, the NASA image library and
+Giphy search from one port so the app can be load-tested without touching
+the real services:
+
+    python -m bench.stub_upstreams --port 8900 --latency 0.2 --jitter 0.05 \
+        --error-rate 0.05 --payloads payloads.json
+
+then start the app with every *_API_URL pointed at it (see stub_env()).
+`--error-rate` answers that share of requests with a 503, and a payloads
+file maps route prefixes (as in ROUTES) to fixed JSON bodies that replace
+the generated ones, e.g. {"/planetary/apod": {"title": "..."}}.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = ["happy", "sad", "big", "small", "fast", "slow", "hot", "cold",
+         "light", "dark", "loud", "quiet", "early", "late", "brave", "shy"]
+
+
+def wordsapi_random(query):
+    word = random.choice(WORDS)
+    return {"word": word, "results": [{"definition": f"the meaning of {word}"}]}
+
+def datamuse_words(query):
+    return [{"word": w, "score": 100} for w in random.sample(WORDS, 3)]
+
+def oxford_entry(query):
+    return {"results": [{"lexicalEntries": [{"entries": [{"senses": [
+        {"definitions": ["a richer stub definition"]}]}]}]}]}
+
+def nasa_apod(query):
+    return {"title": "Stub Nebula", "url": "https://apod.nasa.gov/stub.jpg",
+            "explanation": "A stubbed picture of the day. " * 10}
+
+def nasa_search(query):
+    term = query.get("q", ["space"])[0]
+    return {"collection": {"items": [
+        {"data": [{"title": f"{term} {i}", "description": f"Stub {term} image {i}."}],
+         "links": [{"href": f"https://images-assets.nasa.gov/stub/{term}{i}.jpg"}]}
+        for i in range(20)
+    ]}}
+
+def giphy_search(query):
+    return {"data": [
+        {"type": "gif", "id": f"stub{i}",
+         "images": {"fixed_height": {"url": f"https://media.giphy.com/media/stub{i}/200.gif"}}}
+        for i in range(25)
+    ], "pagination": {"total_count": 25, "count": 25, "offset": 0},
+        "meta": {"status": 200, "msg": "OK"}}
+
+ROUTES = [
+    ("/words/", wordsapi_random),         # WordsAPI ?random=true
+    ("/words", datamuse_words),           # Datamuse ?rel_ant=
+    ("/api/v2/entries/", oxford_entry),   # Oxford
+    ("/planetary/apod", nasa_apod),
+    ("/search", nasa_search),             # NASA image library
+    ("/gifs/search", giphy_search),
+]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    payloads = {}
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        prefix, handler = next(((prefix, fn) for prefix, fn in ROUTES
+                                if parts.path == prefix or
+                                (prefix.endswith("/") and parts.path.startswith(prefix))),
+                               (None, None))
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if handler is None:
+            return self._send(404, {"error": "unknown stub route"})
+        if self.error_rate and random.random() < self.error_rate:
+            return self._send(503, {"error": "stubbed failure"})
+        if prefix in self.payloads:
+            return self._send(200, self.payloads[prefix])
+        self._send(200, handler(parse_qs(parts.query)))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # load generator gave up on this request
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, payloads=None):
+    """Start the stub server on a daemon thread and return it."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "payloads": dict(payloads or {}),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def load_payloads(path):
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        payloads = json.load(f)
+    unknown = set(payloads) - {prefix for prefix, _ in ROUTES}
+    if unknown:
+        raise ValueError(f"unknown stub routes in {path}: {sorted(unknown)}")
+    return payloads
+
+def stub_env(server):
+    """Environment that points every upstream of app.py at `server`."""
+    base = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    return {
+        "WORDS_API_KEY": "stub", "NASA_API_KEY": "stub", "GIPHY_API_KEY": "stub",
+        "APP_ID": "stub", "APP_KEYS": "stub",
+        "WORDS_API_URL": base, "OXFORD_API_URL": base, "DATAMUSE_API_URL": base,
+        "NASA_API_URL": base, "NASA_IMAGES_URL": base, "GIPHY_API_URL": base,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="up to this many extra seconds, uniformly random")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of requests answered with a 503")
+    parser.add_argument("--payloads", help="JSON file of route prefix -> fixed response body")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                   load_payloads(args.payloads))
+    print(json.dumps(stub_env(server), indent=2))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
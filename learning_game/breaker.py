@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for a single upstream.
+
+    The breaker trips once at least `min_calls` of the last `window` calls
+    were made and `failure_rate` of them failed. While open, calls are
+    rejected immediately; after `reset_timeout` seconds up to
+    `half_open_calls` trial calls are let through and the first result
+    decides between closing again and re-opening. Latencies of the last
+    `latency_samples` calls are kept for percentile reporting, and
+    `on_record(name, ok, latency)`, if given, sees every recorded call
+    (e.g. to feed a metrics histogram).
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5,
+                 reset_timeout=30.0, half_open_calls=1, latency_samples=256,
+                 on_record=None):
+        self.name = name
+        self.on_record = on_record
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=latency_samples)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self):
+        """True if a call may go out now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._trials = 0
+            if self._trials < self.half_open_calls:
+                self._trials += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok, latency):
+        """Record the outcome and latency (seconds) of a call that went out."""
+        if self.on_record is not None:
+            self.on_record(self.name, ok, latency)
+        with self._lock:
+            self._latencies.append(latency)
+            if self.state == HALF_OPEN:
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(ok)
+            if len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._trip()
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn` through the breaker, raising CircuitOpenError when open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+    def percentiles(self, *qs):
+        samples = sorted(self._latencies)
+        if not samples:
+            return {f"p{q}": None for q in qs}
+        last = len(samples) - 1
+        return {f"p{q}": round(samples[min(last, int(q / 100 * len(samples)))] * 1000, 1)
+                for q in qs}
+
+    def stats(self):
+        outcomes = list(self._outcomes)
+        return {
+            "state": self.state,
+            "window_calls": len(outcomes),
+            "window_failure_rate": (round(outcomes.count(False) / len(outcomes), 3)
+                                    if outcomes else None),
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "latency_ms": self.percentiles(50, 95, 99),
+        }
+
+    def _trip(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.trips += 1
+
+
+class BreakerRegistry:
+    """Lazily created breakers keyed by upstream name, sharing one config."""
+
+    def __init__(self, **config):
+        self.config = config
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name, **self.config))
+        return breaker
+
+    def stats(self):
+        return {name: b.stats() for name, b in sorted(self._breakers.items())}
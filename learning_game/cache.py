@@ -0,0 +1,476 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+FRESH, STALE, STALE_REFRESHING, MISS = "fresh", "stale", "stale_refreshing", "miss"
+SHARED_POLL = 0.05    # seconds between checks while another process loads a key
+
+
+class TTLCache:
+    """
+    In-process response cache with per-entry TTLs and LRU eviction.
+
+    Expired entries are still served (up to `max_stale` seconds past expiry)
+    while a background thread reloads them, so only a cold miss ever waits
+    on the loader. With `persist_path` set the cache is snapshotted to a JSON
+    file on every write and reloaded at startup, so restarts start warm.
+    A cold-miss loader failure is remembered for `error_ttl` seconds so a
+    down upstream is not retried on every request.
+
+    With a `shared` SharedStore the in-process dict becomes a first level in
+    front of it: entries that are missing or expired locally are looked up
+    there, stores go to both, and loads take a lease so that across all
+    worker processes only one runs the loader for a key while the others
+    wait (up to `lease_timeout`) for its result.
+    Keys must be strings and values JSON-serialisable when persisting or
+    sharing.
+    """
+
+    def __init__(self, maxsize=128, max_stale=86400, error_ttl=60,
+                 persist_path=None, name="cache", shared=None, lease_timeout=10.0):
+        self.maxsize = maxsize
+        self.max_stale = max_stale
+        self.error_ttl = error_ttl
+        self.persist_path = persist_path
+        self.name = name
+        self.shared = shared
+        self.lease_timeout = lease_timeout
+
+        self._data = OrderedDict()   # key -> [expires_at, value]
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._failed = {}            # key -> retry_after
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self.shared_waits = 0
+
+        if persist_path:
+            self._load_snapshot()
+
+    def get_or_load(self, key, loader, ttl):
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+
+        `ttl` is either seconds or a zero-argument callable returning seconds,
+        evaluated each time the entry is (re)stored. Loader errors on a cold
+        miss propagate to the caller; errors during a background refresh are
+        logged and the stale value is kept.
+        """
+        state, value = self._lookup(key)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            threading.Thread(
+                target=self._refresh, args=(key, loader, ttl),
+                name=f"cache-refresh-{self.name}", daemon=True
+            ).start()
+            return value
+        if state == STALE_REFRESHING:
+            return value
+        try:
+            return self._load(key, loader, ttl)
+        except Exception:
+            self._load_failed(key)
+            raise
+
+    async def get_or_load_async(self, key, loader, ttl):
+        """Same as get_or_load() for a coroutine `loader`, from an event loop."""
+        state, value = self._lookup(key)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            import asyncio  # only reached from the async serving mode
+
+            asyncio.ensure_future(self._refresh_async(key, loader, ttl))
+            return value
+        if state == STALE_REFRESHING:
+            return value
+        try:
+            return await self._load_async(key, loader, ttl)
+        except Exception:
+            self._load_failed(key)
+            raise
+
+    def _load(self, key, loader, ttl, wait=True):
+        """
+        Run `loader` and store its value. With a shared store only the lease
+        holder loads; others wait for its value (or, with wait=False, give
+        up and return None).
+        """
+        if self.shared is None:
+            value = loader()
+            self.set(key, value, ttl)
+            return value
+        deadline = time.monotonic() + self.lease_timeout
+        while not self._acquire(key):
+            if not wait:
+                return None
+            found, value = self._pull_shared(key)
+            if found:
+                return value
+            if time.monotonic() >= deadline:
+                # The lease holder is slow or gone; load it here as well.
+                value = loader()
+                self.set(key, value, ttl)
+                return value
+            self.shared_waits += 1
+            time.sleep(SHARED_POLL)
+        try:
+            # The previous holder may have stored it just before we got the lease.
+            found, value = self._pull_shared(key)
+            if found:
+                return value
+            try:
+                value = loader()
+            except Exception:
+                self._shared_failed(key)
+                raise
+            self.set(key, value, ttl)
+            return value
+        finally:
+            self._release(key)
+
+    async def _load_async(self, key, loader, ttl, wait=True):
+        import asyncio
+
+        if self.shared is None:
+            value = await loader()
+            self.set(key, value, ttl)
+            return value
+        deadline = time.monotonic() + self.lease_timeout
+        while not self._acquire(key):
+            if not wait:
+                return None
+            found, value = self._pull_shared(key)
+            if found:
+                return value
+            if time.monotonic() >= deadline:
+                value = await loader()
+                self.set(key, value, ttl)
+                return value
+            self.shared_waits += 1
+            await asyncio.sleep(SHARED_POLL)
+        try:
+            found, value = self._pull_shared(key)
+            if found:
+                return value
+            try:
+                value = await loader()
+            except Exception:
+                self._shared_failed(key)
+                raise
+            self.set(key, value, ttl)
+            return value
+        finally:
+            self._release(key)
+
+    def _acquire(self, key):
+        try:
+            return self.shared.acquire(self.name, key, self.lease_timeout)
+        except Exception:
+            logger.warning("Shared lease for %s[%s] unavailable.", self.name, key)
+            return True
+
+    def _release(self, key):
+        try:
+            self.shared.release(self.name, key)
+        except Exception:
+            logger.warning("Could not release shared lease for %s[%s].", self.name, key)
+
+    def _shared_failed(self, key):
+        # Waiting processes see the failure instead of each retrying the loader.
+        try:
+            self.shared.set(f"{self.name}:failed", key, True, time.time() + self.error_ttl)
+        except Exception:
+            pass
+
+    def _pull_shared(self, key):
+        """
+        (True, value) after copying a fresh shared entry into this process;
+        raises LookupError if the shared entry recently failed to load.
+        """
+        try:
+            row = self.shared.get(self.name, key)
+            failed = None if row else self.shared.get(f"{self.name}:failed", key)
+        except Exception:
+            logger.warning("Shared cache for %s unavailable.", self.name)
+            return False, None
+        now = time.time()
+        if row is None or now >= row[0]:
+            if failed and now < failed[0]:
+                self._load_failed(key)
+                raise LookupError(f"{self.name}[{key}] failed to load in another process")
+            if row is not None:
+                self._adopt(key, row)
+            return False, None
+        self._adopt(key, row)
+        self.shared_hits += 1
+        return True, row[1]
+
+    def _adopt(self, key, row):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or row[0] > entry[0]:
+                self._data[key] = [row[0], row[1]]
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+
+    def _lookup(self, key):
+        """Classify `key` as FRESH, STALE (caller refreshes), STALE_REFRESHING or MISS."""
+        now = time.time()
+        if self.shared is not None:
+            entry = self._data.get(key)
+            if entry is None or now >= entry[0]:
+                # Another process may have loaded or refreshed it already.
+                self._pull_shared_quietly(key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                expires_at, value = entry
+                if now < expires_at:
+                    self.hits += 1
+                    return FRESH, value
+                if now < expires_at + self.max_stale:
+                    self.stale_hits += 1
+                    if key in self._refreshing:
+                        return STALE_REFRESHING, value
+                    self._refreshing.add(key)
+                    return STALE, value
+            if now < self._failed.get(key, 0):
+                self.negative_hits += 1
+                raise LookupError(f"{self.name}[{key}] recently failed to load")
+            self.misses += 1
+            return MISS, None
+
+    def _pull_shared_quietly(self, key):
+        try:
+            self._pull_shared(key)
+        except LookupError:
+            pass
+
+    def _load_failed(self, key):
+        with self._lock:
+            self._failed[key] = time.time() + self.error_ttl
+
+    def set(self, key, value, ttl):
+        seconds = ttl() if callable(ttl) else ttl
+        expires_at = time.time() + seconds
+        if self.shared is not None:
+            try:
+                self.shared.set(self.name, key, value, expires_at)
+                self.shared.trim(self.name, self.maxsize, time.time() - self.max_stale)
+            except Exception:
+                logger.warning("Could not write %s[%s] to the shared cache.", self.name, key)
+        with self._lock:
+            self._data[key] = [expires_at, value]
+            self._data.move_to_end(key)
+            self._failed.pop(key, None)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            snapshot = dict(self._data) if self.persist_path else None
+        if snapshot is not None:
+            self._write_snapshot(snapshot)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "evictions": self.evictions,
+            "shared_hits": self.shared_hits,
+            "shared_waits": self.shared_waits,
+        }
+
+    def _refresh(self, key, loader, ttl):
+        try:
+            # Skipped if another process holds the lease; its value is
+            # picked up from the shared store on a later lookup.
+            self._load(key, loader, ttl, wait=False)
+            self.refreshes += 1
+        except Exception:
+            self.refresh_failures += 1
+            logger.warning("Background refresh of %s[%s] failed.", self.name, key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _refresh_async(self, key, loader, ttl):
+        try:
+            await self._load_async(key, loader, ttl, wait=False)
+            self.refreshes += 1
+        except Exception:
+            self.refresh_failures += 1
+            logger.warning("Background refresh of %s[%s] failed.", self.name, key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _load_snapshot(self):
+        try:
+            with open(self.persist_path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable cache snapshot %s.", self.persist_path)
+            return
+        for key, (expires_at, value) in snapshot.items():
+            self._data[key] = [expires_at, value]
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _write_snapshot(self, snapshot):
+        tmp = f"{self.persist_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self.persist_path)
+        except (OSError, TypeError, ValueError):
+            logger.warning("Could not persist cache %s to %s.", self.name, self.persist_path)
+
+
+class SampledResultCache:
+    """
+    Locally stored result lists, one per query, refreshed in the background.
+
+    Each query's list is reloaded every `refresh_interval` seconds (or after
+    `retry_interval` when a load fails, keeping the previous list).
+    `sample()` is a random pick from memory and never touches the network.
+    With a `shared` SharedStore one process (the lease holder) does the
+    reloads and the others copy its lists from the store.
+    """
+
+    def __init__(self, load, queries, refresh_interval=3600, retry_interval=60,
+                 name="samples", shared=None):
+        self.load = load
+        self.shared = shared
+        self.queries = list(queries)
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.name = name
+
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh = {}
+
+    def start(self):
+        """Start the refresher thread (idempotent, safe to call per request)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            if not self.queries:
+                logger.warning("No queries configured for %s; nothing to refresh.", self.name)
+            self._thread = threading.Thread(
+                target=self._run, name=f"refresh-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    def sample(self, query=None):
+        """Random cached result for `query` (any query if None), or None."""
+        if query is None:
+            lists = [r for r in self._results.values() if r]
+            results = random.choice(lists) if lists else None
+        else:
+            results = self._results.get(query)
+        if not results:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(results)
+
+    def stats(self):
+        return {
+            "queries": {q: len(self._results.get(q) or ()) for q in self.queries},
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_refresh": dict(self.last_refresh),
+        }
+
+    def _run(self):
+        due = {q: 0.0 for q in self.queries}
+        while due:
+            for query in self.queries:
+                if time.time() < due[query]:
+                    continue
+                due[query] = self._refresh(query)
+            time.sleep(max(0.0, min(due.values()) - time.time()))
+
+    def _refresh(self, query):
+        """Reload one query's list; returns when it is next due."""
+        leased = False
+        if self.shared is not None:
+            try:
+                row = self.shared.get(self.name, query)
+                if row and time.time() < row[0]:
+                    self._results[query] = row[1]
+                    self.last_refresh[query] = row[0] - self.refresh_interval
+                    return row[0]
+                if row and not self._results.get(query):
+                    self._results[query] = row[1]     # stale beats empty
+                leased = self.shared.acquire(self.name, query, self.retry_interval)
+            except Exception:
+                logger.warning("Shared store for %s unavailable.", self.name)
+                leased = True
+            if not leased:
+                # Another process is reloading it; pick its result up shortly.
+                return time.time() + min(5.0, self.retry_interval)
+        try:
+            try:
+                results = list(self.load(query))
+            except Exception:
+                results = None
+                logger.warning("Refreshing %s[%s] failed.", self.name, query)
+            now = time.time()
+            if not results:
+                self.refresh_failures += 1
+                return now + self.retry_interval
+            self._results[query] = results
+            self.refreshes += 1
+            self.last_refresh[query] = now
+            if self.shared is not None:
+                try:
+                    self.shared.set(self.name, query, results, now + self.refresh_interval)
+                except Exception:
+                    logger.warning("Could not share %s[%s].", self.name, query)
+            return now + self.refresh_interval
+        finally:
+            if leased and self.shared is not None:
+                try:
+                    self.shared.release(self.name, query)
+                except Exception:
+                    pass
@@ -0,0 +1,113 @@
+"""
+Vectorised bulk math problem generator.
+
+Problems are generated as columnar NumPy arrays (operand a, operand b, op
+code, answer) following the same per-grade rules as
+app.generate_math_problem, and only rendered to strings when asked for.
+A seed makes a batch reproducible, e.g. for printable worksheets:
+
+    python mathgen.py --grade 2 -n 40 --seed 7 > worksheet.csv
+"""
+import argparse
+import csv
+import sys
+
+ADD, SUB, MUL = 0, 1, 2
+OP_SYMBOLS = ("+", "-", "*")
+
+
+# Difficulty level -> (allowed op codes, max operand for +/-, max operand for *).
+# Grade 1 plays at level 1 and higher grades at level 2 unless a level is given.
+LEVELS = {
+    1: ((ADD, SUB), 10, 10),
+    2: ((ADD, SUB, MUL), 20, 10),
+    3: ((ADD, SUB, MUL), 50, 12),
+    4: ((ADD, SUB, MUL), 100, 12),
+    5: ((ADD, SUB, MUL), 1000, 20),
+}
+
+
+def grade_rules(grade, difficulty=None):
+    """(allowed op codes, max operand for +/-, max operand for *) for a grade/level."""
+    if difficulty is None:
+        difficulty = 1 if grade == 1 else 2
+    return LEVELS[min(max(int(difficulty), 1), max(LEVELS))]
+
+
+class MathBatch:
+    """Columnar batch of problems; rows are rendered lazily."""
+
+    __slots__ = ("a", "b", "op", "answer")
+
+    def __init__(self, a, b, op, answer):
+        self.a = a
+        self.b = b
+        self.op = op
+        self.answer = answer
+
+    def __len__(self):
+        return len(self.answer)
+
+    def problem(self, i):
+        """Render row `i` in the /api/math_problem format."""
+        return {"problem": f"{self.a[i]} {OP_SYMBOLS[self.op[i]]} {self.b[i]}",
+                "answer": int(self.answer[i])}
+
+    def to_dicts(self, start=0, stop=None):
+        rows = slice(start, stop)
+        return [
+            {"problem": f"{a} {OP_SYMBOLS[op]} {b}", "answer": answer}
+            for a, b, op, answer in zip(self.a[rows].tolist(), self.b[rows].tolist(),
+                                        self.op[rows].tolist(), self.answer[rows].tolist())
+        ]
+
+    def __iter__(self):
+        chunk = 4096
+        for start in range(0, len(self), chunk):
+            yield from self.to_dicts(start, start + chunk)
+
+
+def generate_math_batch(grade, n, seed=None, difficulty=None):
+    """
+    Generate `n` problems for `grade` in one vectorised pass.
+
+    Grade 1 uses + and - on 1..10 with no negative results; higher grades add
+    multiplication on 1..10 and use 1..20 for + and -. An explicit
+    `difficulty` (1-5, see LEVELS) overrides the grade. The same `seed`
+    always yields the same batch.
+    """
+    import numpy as np  # deferred: web workers that never build a batch skip it
+
+    rng = np.random.default_rng(seed)
+    ops, add_sub_max, mul_max = grade_rules(grade, difficulty)
+
+    op = rng.choice(np.array(ops, dtype=np.int8), size=n)
+    high = np.where(op == MUL, mul_max, add_sub_max) + 1
+    a = rng.integers(1, high, dtype=np.int32)
+    b = rng.integers(1, high, dtype=np.int32)
+
+    # No negative differences: put the larger operand first.
+    swap = (op == SUB) & (a < b)
+    a, b = np.where(swap, b, a), np.where(swap, a, b)
+
+    answer = np.select([op == ADD, op == SUB], [a + b, a - b], a * b)
+    return MathBatch(a, b, op, answer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a math worksheet as CSV")
+    parser.add_argument("--grade", type=int, default=1)
+    parser.add_argument("--difficulty", type=int, choices=sorted(LEVELS),
+                        help="difficulty level, overrides --grade")
+    parser.add_argument("-n", type=int, default=20, help="number of problems")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible worksheet")
+    args = parser.parse_args()
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["problem", "answer"])
+    for row in generate_math_batch(args.grade, args.n, args.seed, args.difficulty):
+        writer.writerow([row["problem"], row["answer"]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Same-origin image proxy with a disk-backed, size-bounded LRU.
+
+NASA pictures and Giphy GIFs are fetched once, resized to the width the
+page shows them at (and re-encoded as WebP, animated where the source is,
+for clients that accept it) and kept on disk under a byte budget. Only
+hosts on an allowlist are fetched, including every redirect hop, so the
+proxy cannot be pointed at internal addresses. Transcoding needs the
+optional Pillow package; without it the original bytes are cached and
+served as they are.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Requested widths snap to these so arbitrary ?w= values can't fill the cache.
+WIDTHS = (200, 300, 400, 600, 800)
+EXTENSIONS = {"image/webp": ".webp", "image/jpeg": ".jpg", "image/png": ".png",
+              "image/gif": ".gif"}
+MIMETYPES = {ext: mimetype for mimetype, ext in EXTENSIONS.items()}
+
+
+class MediaError(Exception):
+    """The image is not allowed, could not be fetched or is not an image."""
+
+
+def host_allowed(url, allowed_hosts):
+    """
+    True for http(s) URLs on an allowed host. Entries match exactly; only a
+    "*.example.com" entry also admits the subdomains of example.com.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return False
+    host = parts.hostname.lower()
+    return any(host.endswith(h[1:]) if h.startswith("*.") else host == h
+               for h in allowed_hosts)
+
+
+def snap_width(width):
+    if not width:
+        return None
+    return next((w for w in WIDTHS if w >= width), WIDTHS[-1])
+
+
+def transcode(data, width=None, webp=False):
+    """
+    (bytes, mimetype) of an image scaled down to `width`, as WebP if `webp`.
+    Returns (data, None) when Pillow is missing or the image can't be read.
+    """
+    try:
+        from PIL import Image, ImageSequence
+    except ImportError:
+        return data, None
+    try:
+        img = Image.open(io.BytesIO(data))
+        original = Image.MIME.get(img.format)
+        scale = width / img.width if width and img.width > width else 1.0
+        if scale == 1.0 and not webp:
+            return data, original
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        out = io.BytesIO()
+
+        if getattr(img, "is_animated", False):
+            frames, durations = [], []
+            for frame in ImageSequence.Iterator(img):
+                durations.append(frame.info.get("duration", 100))
+                frames.append(frame.convert("RGBA").resize(size, Image.LANCZOS))
+            fmt = "WEBP" if webp else "GIF"
+            options = {"quality": 75} if webp else {"disposal": 2}
+            frames[0].save(out, fmt, save_all=True, append_images=frames[1:],
+                           duration=durations, loop=img.info.get("loop", 0), **options)
+        else:
+            if scale < 1.0:
+                img = img.resize(size, Image.LANCZOS)
+            if webp:
+                fmt, options = "WEBP", {"quality": 80}
+            elif original == "image/jpeg":
+                fmt, options = "JPEG", {"quality": 85}
+                img = img.convert("RGB")
+            else:
+                fmt, options = "PNG", {"optimize": True}
+            img.save(out, fmt, **options)
+    except Exception:
+        logger.warning("Could not transcode image; serving the original.")
+        return data, None
+
+    body = out.getvalue()
+    if scale == 1.0 and len(body) >= len(data):
+        return data, original
+    return body, Image.MIME[fmt]
+
+
+class MediaStore:
+    """
+    Disk LRU of proxied images, bounded to `max_bytes`.
+
+    `fetch(url, max_bytes)` returns (bytes, content type) for a source
+    image. Concurrent misses for the same variant share one fetch. Files
+    are named by a hash of (url, width, format) and their mtime is bumped on
+    each hit, so several workers can share the directory and the LRU order
+    survives restarts: whenever the budget is exceeded the directory is
+    rescanned and the least recently used files are removed.
+    """
+
+    def __init__(self, cache_dir, fetch, allowed_hosts, max_bytes=256 << 20,
+                 max_source_bytes=20 << 20):
+        self.cache_dir = cache_dir
+        self.fetch = fetch
+        self.allowed_hosts = [h.lower() for h in allowed_hosts]
+        self.max_bytes = max_bytes
+        self.max_source_bytes = max_source_bytes
+
+        self._entries = OrderedDict()     # key -> (path, size), oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fetch_failures = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def allowed(self, url):
+        return host_allowed(url, self.allowed_hosts)
+
+    def get(self, url, width=None, webp=False):
+        """(file path, mimetype, key) for a proxied image; raises MediaError."""
+        if not self.allowed(url):
+            raise MediaError(f"host of {url!r} is not allowed")
+        width = snap_width(width)
+        key = hashlib.sha256(f"{url}|{width}|{int(webp)}".encode()).hexdigest()[:32]
+        found = self._hit(key)
+        if found:
+            return found
+
+        with self._lock:
+            fetching = self._inflight.setdefault(key, threading.Lock())
+        with fetching:
+            try:
+                found = self._hit(key)
+                if found:
+                    return found
+                self.misses += 1
+                try:
+                    data, content_type = self.fetch(url, self.max_source_bytes)
+                except Exception as e:
+                    self.fetch_failures += 1
+                    raise MediaError(f"could not fetch {url}") from e
+                body, mimetype = transcode(data, width, webp)
+                mimetype = mimetype or content_type
+                if mimetype not in EXTENSIONS:
+                    raise MediaError(f"{url} is not a supported image ({mimetype})")
+                return self._store(key, body, mimetype), mimetype, key
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def stats(self):
+        return {
+            "files": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "fetch_failures": self.fetch_failures,
+        }
+
+    def _hit(self, key):
+        with self._lock:
+            entry = self._entries.get(key) or self._adopt_locked(key)
+            if entry is None:
+                return None
+            path = entry[0]
+            try:
+                os.utime(path)
+            except OSError:
+                # Evicted by another worker sharing the directory.
+                self._bytes -= entry[1]
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return path, MIMETYPES[os.path.splitext(path)[1]], key
+
+    def _adopt_locked(self, key):
+        # Another worker sharing the directory may already have stored it.
+        for ext in MIMETYPES:
+            path = os.path.join(self.cache_dir, key[:2], key + ext)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            self._entries[key] = (path, size)
+            self._bytes += size
+            return path, size
+        return None
+
+    def _store(self, key, body, mimetype):
+        path = os.path.join(self.cache_dir, key[:2], key + EXTENSIONS[mimetype])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[1]
+            self._entries[key] = (path, len(body))
+            self._bytes += len(body)
+            if self._bytes > self.max_bytes:
+                self._scan_locked()
+                self._evict_locked(keep=key)
+        return path
+
+    def _scan(self):
+        with self._lock:
+            self._scan_locked()
+
+    def _scan_locked(self):
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                key, ext = os.path.splitext(name)
+                if ext not in MIMETYPES:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, key, path, st.st_size))
+        found.sort()
+        self._entries = OrderedDict((key, (path, size)) for _, key, path, size in found)
+        self._bytes = sum(size for _, _, _, size in found)
+
+    def _evict_locked(self, keep):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, (path, size) = next(iter(self._entries.items()))
+            if key == keep:
+                self._entries.move_to_end(key)
+                continue
+            del self._entries[key]
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
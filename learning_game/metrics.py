@@ -0,0 +1,428 @@
+"""
+Small in-process metrics registry exported in the Prometheus text format.
+
+Counters, gauges and histograms take optional label names; each label
+combination is a child created on first use and then looked up from a dict,
+so recording a value is a dict hit plus a short locked update. Values that
+other components already count (cache hits, pool sizes, breaker states) are
+not duplicated on the hot path: a collector callback reads them when
+/metrics is scraped.
+
+Values are kept per process. Under several gunicorn workers, point
+`Registry.enable_multiprocess()` at a directory shared by the workers: each
+one then writes a snapshot there every few seconds, and a scrape of any
+worker merges them all. Counters and histograms are summed over every
+worker that wrote a snapshot, including exited ones, so totals never drop
+when a worker is recycled. Gauges are reported per live worker with a `pid`
+label.
+"""
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers in-process routes (sub-ms) up to slow upstream calls.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)    # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """(suffix, label string, value) tuples for the exposition format."""
+        for values, child in sorted(self._children.items()):
+            yield "", _format_labels(self.labelnames, values), child.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield "_bucket", _format_labels(self.labelnames, values, le), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+
+class Registry:
+    """Named metrics plus scrape-time collectors, rendered by `render()`."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.multiprocess_dir = None
+        self.flush_interval = 5.0
+        self._flusher_pid = None
+        self._exit_hook = False
+
+    def _get_or_create(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered differently")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def register_collector(self, collect):
+        """
+        Add a scrape-time callback returning (name, kind, help, samples)
+        tuples, where samples is a list of (labels dict, value).
+        """
+        self._collectors.append(collect)
+
+    def enable_multiprocess(self, directory, flush_interval=5.0):
+        """
+        Merge metrics across the processes that share `directory`.
+
+        Start each server run with an empty directory; snapshots of exited
+        workers are kept so their counts stay in the totals.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.multiprocess_dir = directory
+        self.flush_interval = flush_interval
+
+    def start_flusher(self):
+        """Start this process's snapshot thread; a no-op once it runs (or if disabled)."""
+        if self.multiprocess_dir is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            # Threads don't survive fork(), so each worker starts its own.
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            if not self._exit_hook:
+                self._exit_hook = True
+                atexit.register(self.flush)
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not write the metrics snapshot.")
+
+    def flush(self):
+        """Write this process's snapshot to the multiprocess directory."""
+        if self.multiprocess_dir is None:
+            return
+        path = os.path.join(self.multiprocess_dir, f"metrics_{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._snapshot(), f)
+        os.replace(tmp, path)
+
+    def _snapshot(self):
+        metrics = []
+        for metric in list(self._metrics.values()):
+            entry = {"name": metric.name, "kind": metric.kind, "help": metric.help,
+                     "labelnames": list(metric.labelnames)}
+            if isinstance(metric, Histogram):
+                entry["bounds"] = list(metric.bounds)
+                children = []
+                for values, child in list(metric._children.items()):
+                    with child._lock:
+                        children.append([list(values), list(child.counts), child.sum])
+            else:
+                children = [[list(values), child.value]
+                            for values, child in list(metric._children.items())]
+            entry["children"] = children
+            metrics.append(entry)
+        collected = [
+            [name, kind, help, [[{k: str(v) for k, v in labels.items()}, value]
+                                for labels, value in samples]]
+            for collect in self._collectors for name, kind, help, samples in collect()
+        ]
+        return {"time": time.time(), "metrics": metrics, "collected": collected}
+
+    def _merged(self):
+        """A registry holding the sum of every worker's snapshot."""
+        merged = Registry()
+        collected = {}      # name -> (kind, help, {label items: value})
+        live_after = time.time() - 3 * self.flush_interval
+        for filename in sorted(os.listdir(self.multiprocess_dir)):
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            pid = filename[len("metrics_"):-len(".json")]
+            try:
+                with open(os.path.join(self.multiprocess_dir, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            live = snapshot["time"] >= live_after
+            for m in snapshot["metrics"]:
+                try:
+                    self._merge_metric(merged, m, pid, live)
+                except ValueError:
+                    # Registered differently by another version of the code.
+                    continue
+            for name, kind, help, samples in snapshot["collected"]:
+                if kind == "gauge" and not live:
+                    continue
+                family = collected.setdefault(name, (kind, help, {}))
+                for labels, value in samples:
+                    if kind == "gauge":
+                        labels = dict(labels, pid=pid)
+                    key = tuple(labels.items())
+                    family[2][key] = family[2].get(key, 0) + value
+        merged.register_collector(lambda: [
+            (name, kind, help, [(dict(key), value) for key, value in sorted(samples.items())])
+            for name, (kind, help, samples) in collected.items()
+        ])
+        return merged
+
+    @staticmethod
+    def _merge_metric(merged, m, pid, live):
+        name, help, labelnames = m["name"], m["help"], m["labelnames"]
+        if m["kind"] == "gauge":
+            if live:
+                gauge = merged.gauge(name, help, labelnames + ["pid"])
+                for values, value in m["children"]:
+                    gauge.labels(*values, pid).set(value)
+        elif m["kind"] == "counter":
+            counter = merged.counter(name, help, labelnames)
+            for values, value in m["children"]:
+                counter.labels(*values).inc(value)
+        else:
+            histogram = merged.histogram(name, help, labelnames, buckets=m["bounds"])
+            if list(histogram.bounds) != m["bounds"]:
+                raise ValueError(f"metric {name} has different buckets")
+            for values, counts, total in m["children"]:
+                child = histogram.labels(*values)
+                child.counts = [a + b for a, b in zip(child.counts, counts)]
+                child.sum += total
+
+    def render(self):
+        if self.multiprocess_dir is None:
+            return self._render()
+        self.flush()    # this worker's own figures are always current
+        return self._merged()._render()
+
+    def _render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_str = _format_labels(labels.keys(), labels.values())
+                    lines.append(f"{name}{label_str} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class HttpMetrics:
+    """Per-route request latency and in-flight gauges shared by both serving modes."""
+
+    def __init__(self, registry=REGISTRY, prefix="learning_game"):
+        self.registry = registry
+        self.duration = registry.histogram(
+            f"{prefix}_http_request_duration_seconds",
+            "Time spent handling a request.",
+            ("route", "method", "status"),
+        )
+        self.in_flight = registry.gauge(
+            f"{prefix}_http_requests_in_flight",
+            "Requests currently being handled.",
+            ("route",),
+        )
+
+    def begin(self, route):
+        self.registry.start_flusher()
+        self.in_flight.labels(route).inc()
+        return time.perf_counter()
+
+    def end(self, route, method, status, start):
+        self.duration.labels(route, method, str(status)).observe(time.perf_counter() - start)
+        self.in_flight.labels(route).dec()
+
+
+def instrument_flask(app, http_metrics):
+    """Time every request of a Flask app, labelled by its URL rule."""
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_begin():
+        g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.metrics_start = http_metrics.begin(g.metrics_route)
+
+    @app.after_request
+    def _metrics_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_end(exc):
+        # Teardown also runs when a view raised, so the gauge always drops.
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            http_metrics.end(g.metrics_route, request.method,
+                             g.pop("metrics_status", 500), start)
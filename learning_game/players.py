@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+
+MIN_LEVEL, MAX_LEVEL = 1, 5
+
+
+class SubjectState:
+    """Running accuracy/speed for one player and subject (EWMA, O(1) update)."""
+
+    __slots__ = ("level", "accuracy", "response_ms", "answered", "since_change")
+
+    def __init__(self, level):
+        self.level = level
+        self.accuracy = 0.7
+        self.response_ms = 0.0
+        self.answered = 0
+        self.since_change = 0
+
+    def as_dict(self):
+        return {
+            "level": self.level,
+            "accuracy": round(self.accuracy, 3),
+            "response_ms": round(self.response_ms),
+            "answered": self.answered,
+        }
+
+
+class PlayerRecord:
+    __slots__ = ("subjects", "score", "last_seen")
+
+    def __init__(self):
+        self.subjects = {}
+        self.score = 0
+        self.last_seen = time.monotonic()
+
+
+class PlayerStore:
+    """
+    In-memory per-player state driving adaptive difficulty.
+
+    Each answer updates exponentially weighted accuracy and response time for
+    the subject in O(1). After `min_answers` answers at a level, a player who
+    is accurate and quick moves up a level and one who struggles moves down.
+    Records are kept in LRU order; players idle for `idle_ttl` seconds, or the
+    least recently seen beyond `max_players`, are evicted.
+    """
+
+    def __init__(self, max_players=10000, idle_ttl=3600.0, alpha=0.3, min_answers=5,
+                 promote_accuracy=0.85, demote_accuracy=0.5, fast_ms=8000.0,
+                 start_levels=None):
+        self.max_players = max_players
+        self.idle_ttl = idle_ttl
+        self.alpha = alpha
+        self.min_answers = min_answers
+        self.promote_accuracy = promote_accuracy
+        self.demote_accuracy = demote_accuracy
+        self.fast_ms = fast_ms
+        self.start_levels = dict(start_levels or {})
+
+        self._players = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def level(self, player_id, subject):
+        """Current level for a player (the subject's start level if unknown)."""
+        with self._lock:
+            record = self._players.get(player_id)
+            state = record.subjects.get(subject) if record else None
+            return state.level if state else self.start_levels.get(subject, MIN_LEVEL)
+
+    def record_answer(self, player_id, subject, correct, response_ms, points=10):
+        """Update a player's state with one answer; returns the subject state dict."""
+        now = time.monotonic()
+        with self._lock:
+            record = self._touch(player_id, now)
+            state = record.subjects.get(subject)
+            if state is None:
+                state = record.subjects[subject] = SubjectState(
+                    self.start_levels.get(subject, MIN_LEVEL))
+            if correct:
+                record.score += points
+
+            a = self.alpha
+            state.accuracy += a * ((1.0 if correct else 0.0) - state.accuracy)
+            if response_ms > 0:
+                state.response_ms = (response_ms if not state.answered
+                                     else state.response_ms + a * (response_ms - state.response_ms))
+            state.answered += 1
+            state.since_change += 1
+
+            previous = state.level
+            if state.since_change >= self.min_answers:
+                if (state.accuracy >= self.promote_accuracy and
+                        state.response_ms <= self.fast_ms and state.level < MAX_LEVEL):
+                    state.level += 1
+                elif state.accuracy < self.demote_accuracy and state.level > MIN_LEVEL:
+                    state.level -= 1
+            if state.level != previous:
+                state.since_change = 0
+                state.accuracy = 0.7
+
+            result = state.as_dict()
+            result["changed"] = state.level != previous
+            result["score"] = record.score
+            return result
+
+    def player(self, player_id):
+        with self._lock:
+            record = self._players.get(player_id)
+            if record is None:
+                return None
+            return {"score": record.score,
+                    "subjects": {s: st.as_dict() for s, st in record.subjects.items()}}
+
+    def __len__(self):
+        return len(self._players)
+
+    def stats(self):
+        return {"players": len(self._players), "max_players": self.max_players,
+                "evictions": self.evictions}
+
+    def _touch(self, player_id, now):
+        record = self._players.get(player_id)
+        if record is None:
+            record = self._players[player_id] = PlayerRecord()
+        else:
+            self._players.move_to_end(player_id)
+        record.last_seen = now
+        # Oldest entries sit at the front, so eviction stops at the first live one.
+        while self._players:
+            oldest_id, oldest = next(iter(self._players.items()))
+            if len(self._players) <= self.max_players and now - oldest.last_seen < self.idle_ttl:
+                break
+            del self._players[oldest_id]
+            self.evictions += 1
+        return record
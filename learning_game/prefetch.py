@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchPool:
+    """
+    Warm pool of ready-made items filled by a background worker.
+
+    `get()` hands out an item in O(1) from memory; whenever the pool drops
+    below `low_water` the worker is woken to build items until it reaches
+    `high_water` again. Callers supply their own fallback when `get()`
+    returns None (pool drained).
+
+    An external filler (e.g. an asyncio task) can replace the thread: set
+    `notify` to a callable that is invoked whenever a refill is due and
+    feed the pool with `put()`; `start()` is then a no-op.
+
+    With a `shared` SharedStore the items live in a queue that all worker
+    processes pop from, and a fill lease makes sure only one of them builds
+    items at a time. Items must then be JSON-serialisable.
+    """
+
+    FILL_LEASE = 30.0   # seconds; renewed for every item built
+
+    def __init__(self, build, high_water=20, low_water=None, name="pool",
+                 retry_delay=5.0, shared=None):
+        self.build = build
+        self.high_water = max(1, int(high_water))
+        if low_water is None:
+            low_water = self.high_water // 2
+        self.low_water = min(max(0, int(low_water)), self.high_water - 1)
+        self.name = name
+        self.retry_delay = retry_delay
+        self.notify = None
+        self.shared = shared
+
+        self._items = deque()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.served = 0
+        self.drained = 0
+        self.built = 0
+        self.build_failures = 0
+
+    def start(self):
+        """Start the refill worker (idempotent, safe to call per request)."""
+        if self._thread is not None or self.notify is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"prefetch-{self.name}", daemon=True
+            )
+            self._thread.start()
+            self._wakeup.set()
+
+    def get(self):
+        """Pop one ready item, or None if the pool is empty."""
+        if self.shared is not None:
+            items = self.take(1)
+            return items[0] if items else None
+        try:
+            item = self._items.popleft()
+        except IndexError:
+            self.drained += 1
+            self._request_refill()
+            return None
+        self.served += 1
+        if len(self._items) <= self.low_water:
+            self._request_refill()
+        return item
+
+    def put(self, item):
+        """Add a ready item built outside the worker thread."""
+        if self.shared is not None:
+            self.shared.push(self.name, [item])
+        else:
+            self._items.append(item)
+        self.built += 1
+
+    def take(self, n):
+        """Pop up to `n` ready items without waiting for the worker."""
+        if self.shared is None:
+            items = []
+            for _ in range(n):
+                item = self.get()
+                if item is None:
+                    break
+                items.append(item)
+            return items
+        try:
+            items = self.shared.pop(self.name, n)
+        except Exception:
+            logger.warning("Shared pool %s unavailable.", self.name)
+            items = []
+        self.served += len(items)
+        if not items:
+            self.drained += 1
+        if len(items) < n or len(self) <= self.low_water:
+            self._request_refill()
+        return items
+
+    def claim_fill(self):
+        """
+        True if this process may build items now. Always true without a
+        shared store; otherwise takes (or renews) the shared fill lease.
+        """
+        if self.shared is None:
+            return True
+        try:
+            return self.shared.acquire(self.name, "fill", self.FILL_LEASE)
+        except Exception:
+            logger.warning("Shared fill lease for %s unavailable.", self.name)
+            return False
+
+    def release_fill(self):
+        if self.shared is not None:
+            try:
+                self.shared.release(self.name, "fill")
+            except Exception:
+                pass
+
+    def __len__(self):
+        if self.shared is not None:
+            try:
+                return self.shared.qsize(self.name)
+            except Exception:
+                return 0
+        return len(self._items)
+
+    def stats(self):
+        return {
+            "size": len(self),
+            "shared": self.shared is not None,
+            "high_water": self.high_water,
+            "low_water": self.low_water,
+            "served": self.served,
+            "drained": self.drained,
+            "built": self.built,
+            "build_failures": self.build_failures,
+        }
+
+    def _request_refill(self):
+        self._wakeup.set()
+        if self.notify is not None:
+            self.notify()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                # Another process holding the fill lease is already topping up.
+                while self.claim_fill() and len(self) < self.high_water:
+                    try:
+                        item = self.build()
+                    except Exception:
+                        logger.exception("Prefetch build for %s failed.", self.name)
+                        item = None
+                    if item is None:
+                        self.build_failures += 1
+                        time.sleep(self.retry_delay)
+                        continue
+                    self.put(item)
+            finally:
+                self.release_fill()
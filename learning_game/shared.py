@@ -0,0 +1,148 @@
+"""
+Cache, lease and queue storage shared by all worker processes on a host.
+
+A single SQLite database in WAL mode (readers never block the writer) holds
+three tables: TTL'd cache entries, short-lived leases used for single-flight
+get-or-compute across processes, and FIFO queues of ready-made items.
+Values are stored as JSON. Every thread/process opens its own connection
+lazily, so the store is safe to create before gunicorn forks.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ns TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, value TEXT NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    ns TEXT NOT NULL, key TEXT NOT NULL, owner TEXT NOT NULL, until REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, ns TEXT NOT NULL, value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS queue_ns ON queue (ns, id);
+"""
+
+
+class SharedStore:
+    """
+    SQLite-backed store for TTLCache, PrefetchPool and SampledResultCache.
+
+    `acquire(ns, key, ttl)` takes a lease that expires on its own, so a
+    worker that dies mid-load only blocks the key for `ttl` seconds.
+    Leases are owned per process and thread and are re-entrant.
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._conn()    # create the schema (and fail early on a bad path)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _owner():
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    # ── cache entries ──
+    def get(self, ns, key):
+        """(expires_at, value) or None."""
+        row = self._conn().execute(
+            "SELECT expires_at, value FROM entries WHERE ns = ? AND key = ?", (ns, key)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set(self, ns, key, value, expires_at):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (ns, key, expires_at, value) VALUES (?, ?, ?, ?)",
+            (ns, key, expires_at, json.dumps(value)),
+        )
+
+    def trim(self, ns, keep, expired_before):
+        """Drop entries that expired before `expired_before` and all but the `keep` newest."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE ns = ? AND expires_at < ?",
+                         (ns, expired_before))
+            conn.execute(
+                "DELETE FROM entries WHERE ns = ? AND key NOT IN ("
+                " SELECT key FROM entries WHERE ns = ? ORDER BY expires_at DESC LIMIT ?)",
+                (ns, ns, keep),
+            )
+
+    # ── leases ──
+    def acquire(self, ns, key, ttl):
+        """Take the lease on (ns, key) for `ttl` seconds; False if someone else holds it."""
+        now = time.time()
+        owner = self._owner()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, until FROM leases WHERE ns = ? AND key = ?",
+                               (ns, key)).fetchone()
+            if row and row[1] > now and row[0] != owner:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (ns, key, owner, until) VALUES (?, ?, ?, ?)",
+                         (ns, key, owner, now + ttl))
+        return True
+
+    def release(self, ns, key):
+        self._conn().execute("DELETE FROM leases WHERE ns = ? AND key = ? AND owner = ?",
+                             (ns, key, self._owner()))
+
+    # ── queues ──
+    def push(self, ns, items):
+        with self._transaction() as conn:
+            conn.executemany("INSERT INTO queue (ns, value) VALUES (?, ?)",
+                             [(ns, json.dumps(item)) for item in items])
+
+    def pop(self, ns, n=1):
+        """Remove and return up to `n` of the oldest items."""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT id, value FROM queue WHERE ns = ? ORDER BY id LIMIT ?",
+                                (ns, n)).fetchall()
+            if rows:
+                conn.execute(f"DELETE FROM queue WHERE id IN ({','.join('?' * len(rows))})",
+                             [row[0] for row in rows])
+        return [json.loads(value) for _, value in rows]
+
+    def qsize(self, ns):
+        return self._conn().execute("SELECT COUNT(*) FROM queue WHERE ns = ?", (ns,)).fetchone()[0]
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "path": self.path,
+            "entries": dict(conn.execute("SELECT ns, COUNT(*) FROM entries GROUP BY ns")),
+            "queues": dict(conn.execute("SELECT ns, COUNT(*) FROM queue GROUP BY ns")),
+            "leases": conn.execute("SELECT COUNT(*) FROM leases WHERE until > ?",
+                                   (time.time(),)).fetchone()[0],
+        }
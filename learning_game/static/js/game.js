@@ -3,6 +3,82 @@ let currentSubject = '';
 let currentAnswer = null;
 let playerName = '';
 
+// Math and reading questions are fetched in batches and kept in a local
+// queue; the next batch is prefetched in the background before it runs out.
+// Difficulty adapts on the server from the answers posted for `playerId`.
+const playerId = localStorage.getItem('playerId') ||
+    `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+localStorage.setItem('playerId', playerId);
+
+const BATCH_URLS = {
+    math: `/api/math_problems?grade=1&n=20&player=${encodeURIComponent(playerId)}`,
+    reading: `/api/word_problems?n=5&player=${encodeURIComponent(playerId)}`
+};
+const PREFETCH_AT = 2;
+const questionQueues = { math: [], reading: [] };
+const pendingBatches = {};
+let questionShownAt = 0;
+let answerRecorded = true;
+
+function fetchBatch(subject) {
+    if (!pendingBatches[subject]) {
+        pendingBatches[subject] = fetch(BATCH_URLS[subject])
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Failed to fetch ${subject} questions`);
+                }
+                return response.json();
+            })
+            .then(batch => {
+                questionQueues[subject].push(...batch);
+            })
+            .finally(() => {
+                delete pendingBatches[subject];
+            });
+    }
+    return pendingBatches[subject];
+}
+
+async function takeQuestion(subject) {
+    const queue = questionQueues[subject];
+    if (queue.length === 0) {
+        await fetchBatch(subject);
+    }
+    const question = queue.shift();
+    if (queue.length <= PREFETCH_AT) {
+        fetchBatch(subject).catch(error => console.error('Error prefetching questions:', error));
+    }
+    questionShownAt = Date.now();
+    answerRecorded = false;
+    return question;
+}
+
+function recordAnswer(subject, correct) {
+    // Only the first answer to a question counts towards the player's level.
+    if (answerRecorded || !questionQueues[subject]) {
+        return;
+    }
+    answerRecorded = true;
+    fetch('/api/answer', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            player: playerId,
+            subject,
+            correct,
+            response_ms: Date.now() - questionShownAt
+        })
+    })
+        .then(response => response.ok ? response.json() : null)
+        .then(result => {
+            if (result && result.changed) {
+                // Queued questions were generated for the old level.
+                questionQueues[subject].length = 0;
+            }
+        })
+        .catch(error => console.error('Error recording answer:', error));
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     playerName = localStorage.getItem('character') || 'Player';
     document.getElementById('playerName').textContent = `Welcome, ${playerName}!`;
@@ -24,16 +100,18 @@ async function nextQuestion() {
         let questionData;
         switch(currentSubject) {
             case 'math':
-                questionDiv.innerHTML = '<p>Loading math problem...</p>';
-                const response = await fetch('/api/math_problem?grade=1');
-                questionData = await response.json();
+                if (questionQueues.math.length === 0) {
+                    questionDiv.innerHTML = '<p>Loading math problem...</p>';
+                }
+                questionData = await takeQuestion('math');
                 currentAnswer = questionData.answer;
                 displayMathQuestion(questionData.problem);
                 break;
             case 'reading':
-                questionDiv.innerHTML = '<p>Loading word problem...</p>';
-                const wordResponse = await fetch('/api/word_problem');
-                questionData = await wordResponse.json();
+                if (questionQueues.reading.length === 0) {
+                    questionDiv.innerHTML = '<p>Loading word problem...</p>';
+                }
+                questionData = await takeQuestion('reading');
                 currentAnswer = questionData.word;
                 displayWordQuestion(questionData);
                 break;
@@ -165,6 +243,7 @@ async function checkAnswer(userAnswer) {
     const feedbackText = document.getElementById('feedbackText');
     const feedbackGif = document.getElementById('feedbackGif');
     
+    recordAnswer(currentSubject, userAnswer === currentAnswer);
     if (userAnswer === currentAnswer) {
         currentScore += 10;
         document.getElementById('score').textContent = currentScore;
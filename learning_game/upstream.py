@@ -0,0 +1,244 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def host_of(url):
+    """Host key used for pooling, timeouts and breakers (host[:port])."""
+    return urlsplit(url).netloc or url
+
+
+class _UpstreamBase:
+    def __init__(self, timeouts=None, default_timeout=5.0, retries=2,
+                 backoff=0.2, breakers=None, total_timeout=10.0):
+        # Timeouts may be keyed by bare host or by base URL.
+        self.timeouts = {host_of(k) if "//" in k else k: v
+                         for k, v in (timeouts or {}).items()}
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breakers = breakers
+        self.total_timeout = total_timeout
+
+        self._calls = {}
+        self._retried = {}
+
+    def _prepare(self, url, timeout, deadline, name=None):
+        host = name or host_of(url)
+        if timeout is None:
+            timeout = self.timeouts.get(host, self.default_timeout)
+        if deadline is None:
+            deadline = time.monotonic() + self.total_timeout
+        self._calls[host] = self._calls.get(host, 0) + 1
+        breaker = self.breakers.get(host) if self.breakers else None
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"{host} circuit is open")
+        return host, timeout, deadline, breaker
+
+    @staticmethod
+    def _attempt_timeout(host, timeout, deadline):
+        """Per-attempt timeout, shortened to what is left of the call's budget."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{host} call ran out of time")
+        return min(timeout, remaining)
+
+    def _retry_delay(self, host, attempt, deadline):
+        """Backoff before retry `attempt`, or None if the retry would not fit the budget."""
+        delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        if time.monotonic() + delay >= deadline:
+            return None
+        self._retried[host] = self._retried.get(host, 0) + 1
+        return delay
+
+
+class UpstreamClient(_UpstreamBase):
+    """
+    Shared HTTP layer for every external API the game talks to.
+
+    One keep-alive `requests.Session` is kept per host so repeated calls reuse
+    pooled TCP/TLS connections instead of handshaking each time. Calls get a
+    per-host timeout and a bounded number of retries with jittered
+    exponential backoff on connection errors and retryable statuses, all
+    within `total_timeout` seconds (or before an explicit monotonic
+    `deadline`); a response that is retried is closed first so its
+    connection goes back to the pool. Passing `name` files a call under that
+    key instead of its host (session, timeout, breaker and stats), so calls
+    to an open-ended set of hosts share one bounded entry.
+    With a `breakers` registry, each host gets a circuit breaker and calls to
+    a tripped host fail fast with CircuitOpenError. `requests` is imported
+    when the first session is opened rather than at worker start.
+    """
+
+    def __init__(self, timeouts=None, default_timeout=5.0, retries=2,
+                 backoff=0.2, pool_maxsize=16, breakers=None, total_timeout=10.0):
+        super().__init__(timeouts, default_timeout, retries, backoff, breakers, total_timeout)
+        self.pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._requests = None
+
+    def session(self, host):
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    self._requests = requests
+                    session = requests.Session()
+                    # A named session may reach a few hosts; pools are LRU-bounded.
+                    adapter = HTTPAdapter(pool_connections=4,
+                                          pool_maxsize=self.pool_maxsize)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._sessions[host] = session
+        return session
+
+    def get(self, url, timeout=None, deadline=None, name=None, **kwargs):
+        """GET `url` through the host's pooled session, retrying transient failures."""
+        host, timeout, deadline, breaker = self._prepare(url, timeout, deadline, name)
+        session = self.session(host)
+        if breaker is None:
+            return self._get_with_retries(session, host, url, timeout, deadline, **kwargs)
+        start = time.monotonic()
+        try:
+            resp = self._get_with_retries(session, host, url, timeout, deadline, **kwargs)
+        except Exception:
+            breaker.record(False, time.monotonic() - start)
+            raise
+        breaker.record(resp.status_code < 500, time.monotonic() - start)
+        return resp
+
+    def _get_with_retries(self, session, host, url, timeout, deadline, **kwargs):
+        attempt = 0
+        while True:
+            resp = error = None
+            try:
+                resp = session.get(url, timeout=self._attempt_timeout(host, timeout, deadline),
+                                   **kwargs)
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return resp
+            except (self._requests.ConnectionError, self._requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                error = e
+            attempt += 1
+            delay = self._retry_delay(host, attempt, deadline)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return resp
+            if resp is not None:
+                resp.close()
+            time.sleep(delay)
+
+    def get_json(self, url, timeout=None, deadline=None, name=None, **kwargs):
+        resp = self.get(url, timeout=timeout, deadline=deadline, name=name, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    def stats(self):
+        """Per-host call counts and connection reuse (pool hit rate)."""
+        out = {}
+        for host, session in list(self._sessions.items()):
+            requests_made = connections = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    requests_made += pool.num_requests
+                    connections += pool.num_connections
+            out[host] = {
+                "calls": self._calls.get(host, 0),
+                "retries": self._retried.get(host, 0),
+                "requests": requests_made,
+                "connections_opened": connections,
+                "handshakes_saved": max(0, requests_made - connections),
+                "pool_hit_rate": (round(1 - connections / requests_made, 3)
+                                  if requests_made else None),
+            }
+        return out
+
+
+class AsyncUpstreamClient(_UpstreamBase):
+    """
+    Non-blocking counterpart of UpstreamClient for the ASGI serving mode.
+
+    Uses a single pooled `httpx.AsyncClient` with the same per-host timeouts,
+    retry/backoff policy and circuit breakers. Must be created and used from
+    within a running event loop.
+    """
+
+    def __init__(self, timeouts=None, default_timeout=5.0, retries=2,
+                 backoff=0.2, max_connections=200, breakers=None, total_timeout=10.0):
+        import asyncio  # only needed for the async serving mode
+        import httpx
+
+        super().__init__(timeouts, default_timeout, retries, backoff, breakers, total_timeout)
+        self._asyncio = asyncio
+        self._httpx = httpx
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+        )
+
+    async def get(self, url, timeout=None, deadline=None, name=None, **kwargs):
+        host, timeout, deadline, breaker = self._prepare(url, timeout, deadline, name)
+        start = time.monotonic()
+        try:
+            resp = await self._get_with_retries(host, url, timeout, deadline, **kwargs)
+        except Exception:
+            if breaker is not None:
+                breaker.record(False, time.monotonic() - start)
+            raise
+        if breaker is not None:
+            breaker.record(resp.status_code < 500, time.monotonic() - start)
+        return resp
+
+    async def _get_with_retries(self, host, url, timeout, deadline, **kwargs):
+        attempt = 0
+        while True:
+            resp = error = None
+            try:
+                resp = await self._client.get(
+                    url, timeout=self._attempt_timeout(host, timeout, deadline), **kwargs)
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return resp
+            except self._httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise
+                error = e
+            attempt += 1
+            delay = self._retry_delay(host, attempt, deadline)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return resp
+            if resp is not None:
+                await resp.aclose()
+            await self._asyncio.sleep(delay)
+
+    async def get_json(self, url, timeout=None, deadline=None, name=None, **kwargs):
+        resp = await self.get(url, timeout=timeout, deadline=deadline, name=name, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def stats(self):
+        return {host: {"calls": calls, "retries": self._retried.get(host, 0)}
+                for host, calls in self._calls.items()}
@@ -0,0 +1,384 @@
+"""
+Precomputed, memory-mapped word index for reading questions.
+
+An index is built offline from a JSON-lines dump, one word per line:
+
+    {"word": "happy", "definition": "feeling joy", "antonyms": ["sad"], "difficulty": 1}
+
+(`antonyms` and `difficulty` are optional; difficulty defaults to a bucket
+by word length). Each entry stores its definition, antonyms and a set of
+distractors drawn from words of the same difficulty, so assembling a
+question is a local lookup:
+
+    python word_index.py build words.jsonl words.idx
+
+File layout: magic, record count and a JSON meta block (difficulty ranges,
+source dump size/mtime), then a uint64 offset table and the records as
+compact JSON. Records are sorted by (difficulty, word) so each difficulty
+is a contiguous index range.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WIDX\x00\x00\x00\x01"
+HEADER = struct.Struct("<8sII")    # magic, record count, meta length
+DISTRACTORS_PER_WORD = 8
+
+
+def default_difficulty(word):
+    return 1 if len(word) <= 4 else 2 if len(word) <= 6 else 3 if len(word) <= 8 else 4
+
+
+def parse_dump_line(line):
+    """Normalised record from one dump line, or None if unusable."""
+    try:
+        raw = json.loads(line)
+        word = raw["word"].strip()
+        definition = raw["definition"].strip()
+        antonyms = raw.get("antonyms") or []
+        level = int(raw.get("difficulty") or default_difficulty(word))
+    except (ValueError, KeyError, AttributeError, TypeError):
+        return None
+    if not word or not definition or not isinstance(antonyms, list):
+        return None
+    return {
+        "w": word,
+        "d": definition,
+        "a": [a for a in antonyms if isinstance(a, str) and a != word],
+        "l": level,
+    }
+
+
+def pick_distractors(word, antonyms, candidates, rng, k=DISTRACTORS_PER_WORD):
+    exclude = {word, *antonyms}
+    picks = []
+    for cand in rng.sample(candidates, min(len(candidates), k + len(exclude))):
+        if cand not in exclude:
+            picks.append(cand)
+            if len(picks) == k:
+                break
+    return picks
+
+
+def build_index(dump_path, index_path, seed=0):
+    """Build `index_path` from the dump at `dump_path` (atomic replace)."""
+    stat = os.stat(dump_path)
+    records = {}
+    skipped = 0
+    with open(dump_path, encoding="utf-8") as f:
+        for line in f:
+            rec = parse_dump_line(line)
+            if rec:
+                records[rec["w"]] = rec
+            elif line.strip():
+                skipped += 1
+    if skipped:
+        logger.warning("Skipped %d unusable lines in %s.", skipped, dump_path)
+    ordered = sorted(records.values(), key=lambda r: (r["l"], r["w"]))
+
+    by_level = {}
+    for i, rec in enumerate(ordered):
+        by_level.setdefault(rec["l"], []).append(i)
+    all_words = [r["w"] for r in ordered]
+
+    rng = random.Random(seed)
+    for rec in ordered:
+        same = [ordered[i]["w"] for i in by_level[rec["l"]]]
+        # Tiny difficulty buckets borrow from the whole vocabulary.
+        pool = same if len(same) > DISTRACTORS_PER_WORD else all_words
+        rec["x"] = pick_distractors(rec["w"], rec["a"], pool, rng)
+
+    levels = {str(l): [idx[0], idx[-1] + 1] for l, idx in by_level.items()}
+    meta = json.dumps({
+        "levels": levels,
+        "source": {"size": stat.st_size, "mtime": stat.st_mtime},
+    }).encode()
+    blobs = [json.dumps(r, separators=(",", ":")).encode() for r in ordered]
+
+    tmp = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(blobs), len(meta)))
+        f.write(meta)
+        f.write(b"\0" * (-f.tell() % 8))
+        offset = 0
+        offsets = [0]
+        for blob in blobs:
+            offset += len(blob)
+            offsets.append(offset)
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, index_path)
+    logger.info("Built word index %s with %d words.", index_path, len(blobs))
+    return len(blobs)
+
+
+class WordIndex:
+    """
+    Read-only view over an index file; records are decoded on access.
+
+    Raises ValueError if the file is not a complete word index (e.g. it is
+    corrupt or was truncated).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError(f"{path} is truncated")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open()
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.close()
+            raise ValueError(f"{path} is not a valid word index: {e}") from None
+
+    def _open(self):
+        magic, self.count, meta_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError("bad magic")
+        meta_start = HEADER.size
+        self.meta = json.loads(self._mm[meta_start:meta_start + meta_len])
+        self.levels = {int(l): tuple(r) for l, r in self.meta["levels"].items()}
+        if not isinstance(self.meta["source"]["size"], int):
+            raise ValueError("meta has no source size")
+        table = meta_start + meta_len
+        table += -table % 8
+        self._data = table + 8 * (self.count + 1)
+        if self._data > len(self._mm):
+            raise ValueError("offset table is truncated")
+        self._table = memoryview(self._mm)[table:self._data]
+        self._offsets = self._table.cast("Q")
+        if self._data + self._offsets[self.count] != len(self._mm):
+            raise ValueError("records are truncated")
+        if any(not 0 <= start <= stop <= self.count for start, stop in self.levels.values()):
+            raise ValueError("difficulty ranges are out of bounds")
+
+    def __len__(self):
+        return self.count
+
+    def record(self, i):
+        start = self._data + self._offsets[i]
+        return json.loads(self._mm[start:self._data + self._offsets[i + 1]])
+
+    def random_index(self, difficulty=None, rng=random):
+        if difficulty is not None and self.levels:
+            # Nearest available difficulty.
+            level = min(self.levels, key=lambda l: abs(l - difficulty))
+            start, stop = self.levels[level]
+            return rng.randrange(start, stop)
+        return rng.randrange(self.count)
+
+    def close(self):
+        for view in (getattr(self, "_offsets", None), getattr(self, "_table", None)):
+            if view is not None:
+                view.release()
+        self._mm.close()
+
+
+def question_from_record(rec, rng=random):
+    """Build a word question from an index record, or None if too few distractors."""
+    correct = rec["w"]
+    wrongs = []
+    for w in rec["a"][:3] + rng.sample(rec["x"], len(rec["x"])):
+        if w != correct and w not in wrongs:
+            wrongs.append(w)
+            if len(wrongs) == 3:
+                break
+    if len(wrongs) < 3:
+        return None
+    options = wrongs + [correct]
+    rng.shuffle(options)
+    return {"definition": rec["d"], "options": options, "answer": correct}
+
+
+class WordIndexStore:
+    """
+    Serves questions from a WordIndex, kept current by a background thread.
+
+    If a dump is configured, the thread builds the index when it is missing
+    and picks up lines appended to the dump incrementally: they are parsed
+    into a small in-memory overlay (distractors drawn from the mapped index)
+    until `compact_after` of them accumulate, when the index is rebuilt and
+    re-mapped. A dump that shrank (was rewritten rather than appended to)
+    triggers a full rebuild, and so does an index file that cannot be
+    loaded. Until an index is available `question()` returns None and the
+    caller falls back to its other sources.
+    """
+
+    def __init__(self, index_path, dump_path=None, refresh_interval=300.0,
+                 compact_after=1000):
+        self.index_path = index_path
+        self.dump_path = dump_path
+        self.refresh_interval = refresh_interval
+        self.compact_after = compact_after
+
+        self.index = None
+        self._overlay = []
+        self._overlay_levels = {}     # difficulty -> overlay records
+        self._dump_offset = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.served = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.load_failures = 0
+        self.skipped = 0
+
+    def start(self):
+        """Map an existing index right away and start the refresher (idempotent)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._load()
+            self._thread = threading.Thread(target=self._run, name="word-index", daemon=True)
+            self._thread.start()
+
+    def question(self, difficulty=None):
+        index, overlay, by_level = self.index, self._overlay, self._overlay_levels
+        if index is None or not len(index):
+            self.misses += 1
+            return None
+        if difficulty is None or not index.levels:
+            start, stop, extra = 0, len(index), overlay
+        else:
+            # Nearest available difficulty, counting words so far only in the overlay
+            level = min(set(index.levels) | set(by_level), key=lambda l: abs(l - difficulty))
+            start, stop = index.levels.get(level, (0, 0))
+            extra = by_level.get(level, [])
+        i = random.randrange(stop - start + len(extra))
+        try:
+            rec = index.record(start + i) if i < stop - start else extra[i - (stop - start)]
+        except ValueError:
+            logger.warning("Corrupt record %d in word index %s.", start + i, index.path)
+            self.misses += 1
+            return None
+        question = question_from_record(rec)
+        if question is None:
+            self.misses += 1
+        else:
+            self.served += 1
+        return question
+
+    def stats(self):
+        index = self.index
+        return {
+            "words": len(index) if index else 0,
+            "overlay": len(self._overlay),
+            "served": self.served,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "load_failures": self.load_failures,
+            "skipped": self.skipped,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Word index refresh failed.")
+            time.sleep(self.refresh_interval)
+
+    def refresh(self):
+        """Load, rebuild or extend the index as needed (called by the thread)."""
+        if self.index is None:
+            self._load()
+        if self.dump_path and os.path.exists(self.dump_path):
+            dump = os.stat(self.dump_path)
+            source = self.index.meta["source"] if self.index else None
+            if source is None or dump.st_size < self._dump_offset:
+                self._rebuild()
+            elif dump.st_size > self._dump_offset:
+                self._read_appended()
+                if len(self._overlay) >= self.compact_after:
+                    self._rebuild()
+
+    def _load(self):
+        """Map the index file if there is one; an unusable file is logged, not raised."""
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            index = WordIndex(self.index_path)
+        except (OSError, ValueError) as e:
+            self.load_failures += 1
+            logger.error("Cannot load word index: %s; %s.", e,
+                         "rebuilding it from the dump" if self.dump_path
+                         else "serving questions without it")
+            return False
+        self._swap(index)
+        return True
+
+    def _rebuild(self):
+        build_index(self.dump_path, self.index_path)
+        self.rebuilds += 1
+        self._swap(WordIndex(self.index_path))
+
+    def _swap(self, index):
+        old = self.index
+        self.index = index
+        self._overlay = []
+        self._overlay_levels = {}
+        self._dump_offset = index.meta["source"]["size"]
+        if old is not None:
+            # Let in-flight readers finish with the old mapping.
+            threading.Timer(5.0, old.close).start()
+
+    def _read_appended(self):
+        index = self.index
+        with open(self.dump_path, "rb") as f:
+            f.seek(self._dump_offset)
+            chunk = f.read()
+        complete = chunk.rfind(b"\n") + 1      # leave a half-written last line
+        overlay = list(self._overlay)
+        by_level = {level: list(recs) for level, recs in self._overlay_levels.items()}
+        for line in chunk[:complete].decode("utf-8", "replace").splitlines():
+            rec = parse_dump_line(line)
+            if rec is None:
+                if line.strip():
+                    self.skipped += 1
+                continue
+            start, stop = index.levels.get(rec["l"], (0, len(index)))
+            sample = [index.record(random.randrange(start, stop))["w"]
+                      for _ in range(min(stop - start, 2 * DISTRACTORS_PER_WORD))]
+            rec["x"] = pick_distractors(rec["w"], rec["a"], sample, random)
+            overlay.append(rec)
+            by_level.setdefault(rec["l"], []).append(rec)
+        self._overlay = overlay
+        self._overlay_levels = by_level
+        self._dump_offset += complete
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect a word index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build an index from a JSON-lines dump")
+    build.add_argument("dump")
+    build.add_argument("index")
+    show = sub.add_parser("sample", help="print a few questions from an index")
+    show.add_argument("index")
+    show.add_argument("-n", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"{build_index(args.dump, args.index)} words indexed")
+    else:
+        index = WordIndex(args.index)
+        for _ in range(args.n):
+            print(json.dumps(question_from_record(index.record(index.random_index()))))
+
+
+if __name__ == "__main__":
+    main()
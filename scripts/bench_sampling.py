@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+WiFi Sampling Benchmark - Counter Source Comparison
+
+Measures how fast each counter source can be read: samples per second
+(wall clock) and CPU time per sample (process time), for psutil, the
+kept-open /proc/net/dev reader (whole table and monitored interface only),
+the sysfs reader and a full SpeedCalculator.get_speeds() on each path.
+
+    python bench_sampling.py --interface wlo1 --iterations 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import psutil
+
+from procnet import ProcNetDev, SysfsCounters
+from wifi_monitor import SpeedCalculator, psutil_counters
+
+
+def measure(read, iterations):
+    """
+    Call `read` repeatedly and time it.
+
+    Args:
+        read (callable): Zero-argument function to benchmark
+        iterations (int): Number of calls
+
+    Returns:
+        dict: samples_per_sec and cpu_us_per_sample
+    """
+    for _ in range(min(iterations, 100)):   # warm-up
+        read()
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        read()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return {
+        "samples_per_sec": round(iterations / wall),
+        "cpu_us_per_sample": round(cpu / iterations * 1e6, 2),
+    }
+
+
+def sources(interface_name):
+    """Counter sources to compare, by name; unavailable ones are skipped."""
+    candidates = {
+        "psutil": lambda: psutil_counters,
+        "procnet_all": lambda: ProcNetDev(),
+        "procnet_selected": lambda: ProcNetDev([interface_name]),
+        "sysfs": lambda: SysfsCounters(interface_name),
+        "get_speeds_psutil": lambda: SpeedCalculator(interface_name).get_speeds,
+        "get_speeds_fast": lambda: SpeedCalculator(interface_name, fast=True).get_speeds,
+    }
+    result = {}
+    for name, make in candidates.items():
+        try:
+            result[name] = make()
+        except OSError as e:
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare network counter sources")
+    parser.add_argument("--interface", "-i", help="interface to sample (default: first non-loopback)")
+    parser.add_argument("--iterations", "-n", type=int, default=10000, help="samples per source")
+    args = parser.parse_args()
+
+    interface_name = args.interface
+    if interface_name is None:
+        names = sorted(psutil.net_io_counters(pernic=True))
+        interface_name = next((name for name in names if name != "lo"), names[0])
+
+    results = {"interface": interface_name, "iterations": args.iterations}
+    for name, read in sources(interface_name).items():
+        results[name] = measure(read, args.iterations)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+WiFi Bulk Import - Parallel CSV Session Ingest
+
+This module converts a backlog of CSV sessions written by
+`DataManager.save_to_csv` into the columnar session format. Files are
+spread across a process pool; each worker streams its file line by line
+into typed arrays (no per-row tuples) and parses the fixed
+"YYYY-MM-DD HH:MM:SS" timestamps by slicing out the digits, calling
+`time.mktime` only once per distinct hour. The results are merged into one
+time-ordered, deduplicated .wfs file, optionally alongside one .wfs file per
+CSV, and malformed rows are counted by reason.
+
+    python bulk_import.py data/ --output data/wifi_session_merged.wfs
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import logging
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from session_format import EXTENSION, PRECISIONS, parse_timestamp_us, write_session
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("bulk_import")
+
+HEADER_PREFIX = b"Timestamp"
+
+
+def parse_csv_file(path: str) -> Tuple[array, array, array, Counter]:
+    """
+    Stream a CSV session into typed arrays.
+
+    Args:
+        path: CSV file written by DataManager.save_to_csv
+
+    Returns:
+        tuple: (timestamps 'q', upload 'd', download 'd' arrays, Counter of
+        "rows", "imported" and one key per malformed-row reason)
+    """
+    timestamps, upload, download = array("q"), array("d"), array("d")
+    stats = Counter()
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.rstrip(b"\r\n")
+            if not line or line.startswith(HEADER_PREFIX):
+                continue
+            stats["rows"] += 1
+            fields = line.split(b",")
+            if len(fields) < 3:
+                stats["too_few_fields"] += 1
+                continue
+            try:
+                epoch_us = parse_timestamp_us(fields[0])
+            except ValueError:
+                stats["bad_timestamp"] += 1
+                continue
+            try:
+                up, down = float(fields[1]), float(fields[2])
+            except ValueError:
+                stats["bad_number"] += 1
+                continue
+            timestamps.append(epoch_us)
+            upload.append(up)
+            download.append(down)
+    stats["imported"] = len(timestamps)
+    return timestamps, upload, download, stats
+
+
+def import_file(path: str, convert_dir: Optional[str] = None, precision: str = "float64",
+                compress: bool = False) -> Tuple[str, bytes, bytes, bytes, Counter, Optional[str]]:
+    """
+    Worker entry point: parse one CSV and optionally write it as a .wfs file.
+
+    Failures are reported rather than raised, so one bad file never aborts
+    the import of the others.
+
+    Returns:
+        tuple: (path, raw timestamp/upload/download array bytes, stats, error
+        message or None); raw bytes keep the result cheap to send back to the
+        parent process. A file that could not be parsed contributes no rows;
+        one that parsed but could not be converted still does.
+    """
+    try:
+        timestamps, upload, download, stats = parse_csv_file(path)
+    except Exception as e:
+        logger.error(f"Failed to read {path}: {e}")
+        return path, b"", b"", b"", Counter(), f"read failed: {e}"
+    error = None
+    if convert_dir is not None:
+        name = os.path.splitext(os.path.basename(path))[0] + EXTENSION
+        try:
+            write_session(os.path.join(convert_dir, name), timestamps, upload, download,
+                          precision=precision, compress=compress)
+        except Exception as e:
+            logger.error(f"Failed to convert {path}: {e}")
+            error = f"convert failed: {e}"
+    return path, timestamps.tobytes(), upload.tobytes(), download.tobytes(), stats, error
+
+
+def merge(columns: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Merge column sets into one time-ordered set without exact duplicate rows.
+
+    Args:
+        columns: (timestamps, upload, download) arrays per file
+
+    Returns:
+        tuple: (timestamps, upload, download, number of duplicates removed)
+    """
+    if not columns:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), 0
+    timestamps, upload, download = (np.concatenate(parts) for parts in zip(*columns))
+    order = np.lexsort((download, upload, timestamps))
+    timestamps, upload, download = timestamps[order], upload[order], download[order]
+    if len(timestamps) == 0:
+        return timestamps, upload, download, 0
+    keep = np.ones(len(timestamps), dtype=bool)
+    keep[1:] = ((timestamps[1:] != timestamps[:-1]) | (upload[1:] != upload[:-1])
+                | (download[1:] != download[:-1]))
+    return timestamps[keep], upload[keep], download[keep], int(len(keep) - keep.sum())
+
+
+def find_csv_files(paths: List[str]) -> List[str]:
+    """Expand directories (to their wifi_session_*.csv files) and glob patterns."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "wifi_session_*.csv")))
+        else:
+            files.extend(glob.glob(path) or [path])
+    return sorted(set(files))
+
+
+def bulk_import(paths: List[str], output: Optional[str] = None, convert_dir: Optional[str] = None,
+                workers: Optional[int] = None, precision: str = "float64",
+                compress: bool = False) -> dict:
+    """
+    Import CSV sessions in parallel and merge them.
+
+    Args:
+        paths: CSV files, directories or glob patterns
+        output: Path of the merged .wfs file (default: no merged file)
+        convert_dir: Also write one .wfs file per CSV into this directory
+        workers: Worker processes (default: one per CPU)
+        precision: "float64" (default, lossless for CSV values) or "float32"
+        compress: zlib-compress the written .wfs files
+
+    Returns:
+        dict: Import report with file, row, malformed-row and duplicate counts,
+        and an error message per file that could not be read or converted
+    """
+    files = find_csv_files(paths)
+    if convert_dir is not None:
+        os.makedirs(convert_dir, exist_ok=True)
+    started = time.perf_counter()
+    totals = Counter()
+    per_file = {}
+    errors = {}
+    columns = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(import_file, path, convert_dir, precision, compress)
+                   for path in files]
+        for future in futures:
+            path, ts_bytes, up_bytes, down_bytes, stats, error = future.result()
+            if error is not None:
+                errors[path] = error
+            totals.update(stats)
+            malformed = {k: v for k, v in stats.items() if k not in ("rows", "imported")}
+            if malformed:
+                per_file[path] = malformed
+            columns.append((np.frombuffer(ts_bytes, dtype=np.int64),
+                            np.frombuffer(up_bytes, dtype=np.float64),
+                            np.frombuffer(down_bytes, dtype=np.float64)))
+
+    timestamps, upload, download, duplicates = merge(columns)
+    if output is not None:
+        write_session(output, timestamps, upload, download, precision=precision, compress=compress)
+    return {
+        "files": len(files),
+        "rows": totals.pop("rows", 0),
+        "imported": totals.pop("imported", 0),
+        "malformed": dict(totals),
+        "malformed_by_file": per_file,
+        "failed_files": len(errors),
+        "errors": errors,
+        "duplicates": duplicates,
+        "merged": len(timestamps),
+        "start_us": int(timestamps[0]) if len(timestamps) else None,
+        "end_us": int(timestamps[-1]) if len(timestamps) else None,
+        "output": output,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import CSV WiFi sessions into the binary session format")
+    parser.add_argument("paths", nargs="+", help="CSV files, directories or glob patterns")
+    parser.add_argument("--output", "-o", help="merged, deduplicated .wfs file to write")
+    parser.add_argument("--convert-dir", help="also write one .wfs file per CSV here")
+    parser.add_argument("--workers", "-j", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--precision", choices=sorted(PRECISIONS), default="float64")
+    parser.add_argument("--compress", action="store_true", help="zlib-compress written files")
+    args = parser.parse_args()
+
+    if not args.output and not args.convert_dir:
+        parser.error("nothing to write: pass --output and/or --convert-dir")
+    report = bulk_import(args.paths, args.output, args.convert_dir, args.workers,
+                         args.precision, args.compress)
+    print(json.dumps(report, indent=2))
+    return 0 if report["files"] and not report["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+WiFi Session Catalog - Range-Query Index Module
+
+This module keeps a SQLite index of the session files in a data directory:
+time bounds, sample count and summary statistics per file, and the same
+per block of `block_rows` consecutive samples together with where the block
+lives in the file (a row range for .wfs files, a byte range for CSV files).
+A time-range query then only opens the sessions whose blocks overlap the
+range and reads only those blocks: memory-mapped .wfs columns touch just the
+pages of the selected rows, CSV files are read from the block's byte offset.
+Compressed .wfs files are the exception and are decompressed as a whole.
+
+Files are re-indexed only when their size or modification time changes. A
+CSV file next to a .wfs file of the same name is an export of that session
+and is left out, so its samples are not returned twice.
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from session_format import (EXTENSION, Session, SessionFormatError, parse_timestamp_us,
+                            read_session)
+
+logger = logging.getLogger("catalog")
+
+CATALOG_FILENAME = "catalog.sqlite3"
+BLOCK_ROWS = 3600
+
+STATS = ("upload_min", "upload_max", "upload_mean",
+         "download_min", "download_max", "download_mean")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    filename TEXT PRIMARY KEY, format TEXT NOT NULL, size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL, start_us INTEGER, end_us INTEGER, count INTEGER NOT NULL,
+    {", ".join(f"{name} REAL" for name in STATS)}
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    filename TEXT NOT NULL, block INTEGER NOT NULL,
+    start_us INTEGER NOT NULL, end_us INTEGER NOT NULL,
+    row_start INTEGER NOT NULL, row_count INTEGER NOT NULL,
+    byte_start INTEGER, byte_end INTEGER,
+    {", ".join(f"{name} REAL" for name in STATS)},
+    PRIMARY KEY (filename, block)
+);
+CREATE INDEX IF NOT EXISTS blocks_time ON blocks (start_us, end_us);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions (start_us, end_us);
+"""
+
+
+def _block_stats(timestamps: np.ndarray, upload: np.ndarray, download: np.ndarray,
+                 starts: np.ndarray) -> List[tuple]:
+    """(start_us, end_us, row_start, row_count, *STATS) for blocks beginning at `starts`."""
+    counts = np.diff(np.r_[starts, len(timestamps)])
+    upload = upload.astype(np.float64)
+    download = download.astype(np.float64)
+    columns = [
+        np.minimum.reduceat(timestamps, starts), np.maximum.reduceat(timestamps, starts),
+        starts, counts,
+        np.minimum.reduceat(upload, starts), np.maximum.reduceat(upload, starts),
+        np.add.reduceat(upload, starts) / counts,
+        np.minimum.reduceat(download, starts), np.maximum.reduceat(download, starts),
+        np.add.reduceat(download, starts) / counts,
+    ]
+    return list(zip(*(column.tolist() for column in columns)))
+
+
+def _parse_csv_row(line: bytes) -> Optional[tuple]:
+    """(epoch microseconds, upload, download) of a CSV data row, or None if malformed."""
+    fields = line.strip().split(b",")
+    if len(fields) < 3:
+        return None
+    try:
+        return parse_timestamp_us(fields[0]), float(fields[1]), float(fields[2])
+    except ValueError:
+        return None
+
+
+def _rows_to_session(rows: List[tuple]) -> Session:
+    if not rows:
+        return Session(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+    timestamps, upload, download = zip(*rows)
+    return Session(np.array(timestamps, dtype=np.int64),
+                   np.array(upload, dtype=np.float64), np.array(download, dtype=np.float64))
+
+
+def _parse_csv_block(data: bytes) -> Session:
+    """Parse a run of CSV data rows; malformed rows are skipped."""
+    return _rows_to_session([row for row in map(_parse_csv_row, data.splitlines()) if row])
+
+
+def _read_csv_rows(path: str) -> tuple:
+    """
+    Parsed rows of a CSV session plus the byte range [start, end) of each row.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    rows, byte_starts, byte_ends = [], [], []
+    position = 0
+    for number, line in enumerate(data.splitlines(keepends=True)):
+        row = _parse_csv_row(line) if number > 0 else None    # skip the header row
+        if row:
+            rows.append(row)
+            byte_starts.append(position)
+            byte_ends.append(position + len(line))
+        position += len(line)
+    return _rows_to_session(rows), byte_starts, byte_ends
+
+
+class SessionCatalog:
+    """
+    SQLite index of the session files (.wfs and CSV) in one data directory.
+    """
+
+    def __init__(self, data_dir: str, block_rows: int = BLOCK_ROWS):
+        """
+        Open (or create) the catalog of a data directory.
+
+        Args:
+            data_dir: Directory holding the session files and the catalog
+            block_rows: Samples per indexed block
+        """
+        self.data_dir = data_dir
+        self.block_rows = max(1, block_rows)
+        self.path = os.path.join(data_dir, CATALOG_FILENAME)
+        self._lock = threading.Lock()
+        os.makedirs(data_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def update(self) -> Dict[str, int]:
+        """
+        Bring the catalog in line with the data directory.
+
+        Returns:
+            dict: Number of files indexed, removed and left unchanged
+        """
+        result = {"indexed": 0, "removed": 0, "unchanged": 0}
+        present = set()
+        filenames = set(os.listdir(self.data_dir))
+        for filename in filenames:
+            if not (filename.startswith("wifi_session_")
+                    and filename.endswith((EXTENSION, ".csv"))):
+                continue
+            if self._shadowed(filename, filenames):
+                continue
+            present.add(filename)
+            result["indexed" if self.index_file(filename) else "unchanged"] += 1
+        with self._lock:
+            known = [row[0] for row in self._conn.execute("SELECT filename FROM sessions")]
+        for filename in set(known) - present:
+            self.remove(filename)
+            result["removed"] += 1
+        return result
+
+    @staticmethod
+    def _shadowed(filename: str, filenames) -> bool:
+        """True for a CSV export of a session that is also stored as a .wfs file."""
+        stem, ext = os.path.splitext(filename)
+        return ext == ".csv" and f"{stem}{EXTENSION}" in filenames
+
+    def index_file(self, filename: str, force: bool = False) -> bool:
+        """
+        (Re-)index one session file if it changed since it was last indexed.
+
+        Args:
+            filename: Name of the session file in the data directory
+            force: Re-index even if size and modification time are unchanged
+
+        Returns:
+            bool: True if the file was (re-)indexed
+        """
+        filename = os.path.basename(filename)
+        path = os.path.join(self.data_dir, filename)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.remove(filename)
+            return False
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns FROM sessions WHERE filename = ?",
+                                     (filename,)).fetchone()
+        if not force and row == (st.st_size, st.st_mtime_ns):
+            return False
+
+        try:
+            if filename.endswith(EXTENSION):
+                fmt, session = "wfs", read_session(path)
+                byte_starts = byte_ends = None
+            else:
+                fmt = "csv"
+                session, byte_starts, byte_ends = _read_csv_rows(path)
+        except (OSError, SessionFormatError, ValueError) as e:
+            logger.error(f"Failed to index {filename}: {e}")
+            return False
+
+        timestamps, upload, download = session
+        starts = np.arange(0, len(timestamps), self.block_rows)
+        blocks = _block_stats(timestamps, upload, download, starts) if len(timestamps) else []
+        if byte_starts is not None:
+            blocks = [block[:4] + (byte_starts[block[2]], byte_ends[block[2] + block[3] - 1])
+                      + block[4:] for block in blocks]
+        else:
+            blocks = [block[:4] + (None, None) + block[4:] for block in blocks]
+
+        if len(timestamps):
+            summary = (int(timestamps.min()), int(timestamps.max()), len(timestamps),
+                       float(upload.min()), float(upload.max()), float(upload.mean()),
+                       float(download.min()), float(download.max()), float(download.mean()))
+        else:
+            summary = (None, None, 0) + (None,) * len(STATS)
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM blocks WHERE filename = ?", (filename,))
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO sessions VALUES ({', '.join('?' * 13)})",
+                (filename, fmt, st.st_size, st.st_mtime_ns) + summary)
+            self._conn.executemany(
+                f"INSERT INTO blocks VALUES ({', '.join('?' * 14)})",
+                [(filename, i) + block for i, block in enumerate(blocks)])
+        logger.info(f"Indexed {filename}: {len(timestamps)} samples in {len(blocks)} blocks")
+        return True
+
+    def remove(self, filename: str) -> None:
+        """Drop a session file from the catalog."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM blocks WHERE filename = ?", (filename,))
+            self._conn.execute("DELETE FROM sessions WHERE filename = ?", (filename,))
+
+    def find_sessions(self, start_us: Optional[int] = None,
+                      end_us: Optional[int] = None) -> List[dict]:
+        """
+        Sessions with samples in [start_us, end_us], oldest first.
+
+        Args:
+            start_us: Range start in epoch microseconds (default: unbounded)
+            end_us: Range end in epoch microseconds (default: unbounded)
+
+        Returns:
+            List of dicts with filename, format, start_us, end_us, count and STATS
+        """
+        columns = ("filename", "format", "start_us", "end_us", "count") + STATS
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM sessions"
+                " WHERE count > 0 AND start_us <= ? AND end_us >= ? ORDER BY start_us",
+                (end_us if end_us is not None else 2 ** 63 - 1,
+                 start_us if start_us is not None else -2 ** 63)).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def query(self, start_us: int, end_us: int) -> Session:
+        """
+        All samples in [start_us, end_us] across the catalogued sessions.
+
+        Only blocks whose time bounds overlap the range are read.
+
+        Args:
+            start_us: Range start in epoch microseconds
+            end_us: Range end in epoch microseconds
+
+        Returns:
+            Session of (epoch microseconds, upload, download) arrays sorted by time
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT b.filename, s.format, b.row_start, b.row_count, b.byte_start, b.byte_end"
+                " FROM blocks b JOIN sessions s ON s.filename = b.filename"
+                " WHERE b.start_us <= ? AND b.end_us >= ? ORDER BY b.filename, b.block",
+                (end_us, start_us)).fetchall()
+
+        chunks = []
+        opened = {}
+        for filename, fmt, row_start, row_count, byte_start, byte_end in rows:
+            path = os.path.join(self.data_dir, filename)
+            try:
+                if fmt == "wfs":
+                    if filename not in opened:
+                        opened[filename] = read_session(path)
+                    block = Session(*(column[row_start:row_start + row_count]
+                                      for column in opened[filename]))
+                else:
+                    with open(path, "rb") as f:
+                        f.seek(byte_start)
+                        block = _parse_csv_block(f.read(byte_end - byte_start))
+            except (OSError, SessionFormatError) as e:
+                logger.error(f"Failed to read {filename}: {e}")
+                continue
+            mask = (block.timestamps >= start_us) & (block.timestamps <= end_us)
+            chunks.append(Session(*(np.asarray(column[mask], dtype=dtype) for column, dtype
+                                    in zip(block, (np.int64, np.float64, np.float64)))))
+
+        if not chunks:
+            return Session(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+        merged = Session(*(np.concatenate(columns) for columns in zip(*chunks)))
+        order = np.argsort(merged.timestamps, kind="stable")
+        return Session(*(column[order] for column in merged))
+
+    def stats(self) -> dict:
+        """Number of catalogued sessions, blocks and samples."""
+        with self._lock:
+            sessions, samples = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(count), 0) FROM sessions").fetchone()
+            blocks = self._conn.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+        return {"sessions": sessions, "blocks": blocks, "samples": samples}
+
@@ -1,9 +1,18 @@
 import os
 import csv
+import time
 import logging
 from datetime import datetime
-from collections import deque
-from typing import List, Tuple, Optional, Deque
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from session_format import (EXTENSION, SessionFormatError, Session, read_session,
+                            to_epoch_us, write_session)
+from session_log import SessionWriter, compact_session, find_segments, read_segments
+from rollups import ROLLUP, RollupStore
+from catalog import SessionCatalog
+from ring_buffer import RingBuffer
 
 # Configure logging
 logging.basicConfig(
@@ -17,23 +26,36 @@ class DataManager:
     Manages data storage, retrieval, and persistence for WiFi monitoring sessions.
     
     This class handles:
-    - Circular buffer for real-time historical data
-    - CSV file operations for data backup and restoration
+    - Ring buffer of typed arrays for real-time historical data (the hot window)
+    - Streaming every data point to an append-only session log (see
+      session_log) so a crash or a long session loses nothing
+    - Rollup tiers (see rollups) for plotting long sessions at a fitting resolution
+    - A catalog of stored sessions (see catalog) for time-range queries
+    - Columnar binary session files (.wfs, see session_format) for backup
+      and restoration
+    - CSV export and import
     - Session data management with timestamp tracking
     """
     
-    def __init__(self, buffer_size: int = 60, data_dir: str = "data"):
+    def __init__(self, buffer_size: int = 60, data_dir: str = "data",
+                 stream: bool = True, fsync: str = "interval"):
         """
         Initialize the DataManager with specified buffer size and data directory.
         
         Args:
             buffer_size: Maximum number of data points to keep in memory (default: 60)
-            data_dir: Directory to store CSV data files (default: "data")
+            data_dir: Directory to store session data files (default: "data")
+            stream: Append every data point to the session log on disk (default: True)
+            fsync: Session log durability: "always", "interval" or "never"
         """
         self.buffer_size = buffer_size
         self.data_dir = data_dir
-        self.history: Deque[Tuple[datetime, float, float]] = deque(maxlen=buffer_size)
-        self.session_start_time = datetime.now()
+        self.history = RingBuffer(buffer_size)
+        self.stream = stream
+        self.fsync = fsync
+        self.writer: Optional[SessionWriter] = None
+        self.loaded_rollups: Optional[RollupStore] = None  # of the last load_session()
+        self._catalog: Optional[SessionCatalog] = None
         
         # Ensure data directory exists
         try:
@@ -42,6 +64,27 @@ class DataManager:
                 logger.info(f"Created data directory: {data_dir}")
         except Exception as e:
             logger.error(f"Failed to create data directory: {e}")
+        
+        self.new_session()
+    
+    def new_session(self) -> None:
+        """
+        Start a new session: a fresh session name and empty rollups.
+        
+        The name is made unique in the data directory, so a session started
+        within the same second as an earlier one never overwrites its session
+        file or its CSV export.
+        """
+        self.session_start_time = datetime.now()
+        base = f"wifi_session_{self.format_timestamp_for_filename(self.session_start_time)}"
+        in_use = find_segments(self.data_dir)
+        name, suffix = base, 1
+        while name in in_use or any(os.path.exists(os.path.join(self.data_dir, f"{name}{ext}"))
+                                    for ext in (EXTENSION, ".csv")):
+            suffix += 1
+            name = f"{base}_{suffix}"
+        self.session_name = name
+        self.rollups = RollupStore()
             
     def add_data_point(self, upload_speed: float, download_speed: float) -> None:
         """
@@ -51,8 +94,19 @@ class DataManager:
             upload_speed: Upload speed in MB/s
             download_speed: Download speed in MB/s
         """
-        timestamp = datetime.now()
-        self.history.append((timestamp, upload_speed, download_speed))
+        timestamp = time.time()
+        self.history.append(timestamp, upload_speed, download_speed)
+        epoch_us = round(timestamp * 1_000_000)
+        self.rollups.add(epoch_us, upload_speed, download_speed)
+        
+        if self.stream:
+            try:
+                if self.writer is None:
+                    # Opened on first use so idle instances leave no files behind
+                    self.writer = SessionWriter(self.data_dir, self.session_name, fsync=self.fsync)
+                self.writer.append(epoch_us, upload_speed, download_speed)
+            except Exception as e:
+                logger.error(f"Failed to append to session log: {e}")
         
     def get_history(self) -> List[Tuple[datetime, float, float]]:
         """
@@ -61,30 +115,209 @@ class DataManager:
         Returns:
             List of tuples containing (timestamp, upload_speed, download_speed)
         """
-        return list(self.history)
+        return [(datetime.fromtimestamp(timestamp), upload, download)
+                for timestamp, upload, download in self.history]
+    
+    def get_history_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the buffer as oldest-to-newest array views, without copying.
+        
+        Returns:
+            Tuple of (timestamps in epoch seconds, upload_speed, download_speed)
+            read-only numpy views; see RingBuffer for how long they stay valid
+        """
+        return self.history.arrays()
     
     def clear_history(self) -> None:
-        """Clear all historical data points from the buffer."""
+        """Clear all historical data points from the buffer (session log and rollups are kept)."""
         try:
             self.history.clear()
             logger.info("Historical data cleared")
         except Exception as e:
             logger.error(f"Failed to clear historical data: {e}")
     
+    def query_rollups(self, start: datetime, end: datetime, points: int = 500,
+                      loaded: bool = False) -> Tuple[int, np.ndarray]:
+        """
+        Downsampled buckets of the current (or loaded) session between two times.
+        
+        The coarsest rollup tier that still yields `points` buckets is used,
+        so a week-long session plots as fast as a one-hour one.
+        
+        Args:
+            start: Range start
+            end: Range end
+            points: Number of points wanted (e.g. the plot width)
+            loaded: Query the session opened by load_session instead of the
+                one being recorded
+            
+        Returns:
+            tuple: (bucket width in seconds, rollup records with start,
+            count and min/max/mean/p50/p95 per direction)
+        """
+        rollups = self.loaded_rollups if loaded else self.rollups
+        if rollups is None:
+            return 1, np.empty(0, dtype=ROLLUP)
+        return rollups.query(to_epoch_us(start), to_epoch_us(end), points)
+    
+    def save_session(self, filename: Optional[str] = None, compress: bool = False,
+                     precision: str = "float32") -> Optional[str]:
+        """
+        Save current session data to a columnar binary (.wfs) file.
+        
+        When streaming, the whole session recorded so far is saved from the
+        session log; otherwise only the points in the buffer.
+        
+        Args:
+            filename: Name of the session file (default: auto-generated based on timestamp)
+            compress: zlib-compress the columns (smaller, but not memory-mappable)
+            precision: "float32" or "float64" for the speed columns
+            
+        Returns:
+            Path of the written file, or None if the save failed
+        """
+        if not filename:
+            filename = f"{self.session_name}{EXTENSION}"
+        
+        filepath = os.path.join(self.data_dir, filename)
+        
+        try:
+            if self.writer is not None:
+                self.writer.flush()
+                columns = read_segments(self.writer.segments)
+            else:
+                timestamps, upload, download = self.history.arrays()
+                columns = (np.round(timestamps * 1_000_000).astype(np.int64), upload, download)
+            write_session(filepath, *columns, precision=precision, compress=compress)
+            logger.info(f"Session data saved to {filepath}")
+            self._index(filepath)
+            return filepath
+        except Exception as e:
+            logger.error(f"Failed to save session data: {e}")
+            return None
+    
+    def open_session(self, filename: str, mmap: bool = True) -> Optional[Session]:
+        """
+        Open a .wfs session file as column arrays without touching the buffer.
+        
+        Uncompressed files are memory-mapped, so even multi-day sessions
+        open in milliseconds; use this for analysis of whole sessions.
+        
+        Args:
+            filename: Name of the session file
+            mmap: Memory-map uncompressed files (default: True)
+            
+        Returns:
+            Session of (timestamps in epoch microseconds, upload, download)
+            arrays, or None if the file could not be read
+        """
+        filepath = os.path.join(self.data_dir, filename)
+        
+        try:
+            return read_session(filepath, mmap=mmap)
+        except FileNotFoundError:
+            logger.error(f"File not found: {filepath}")
+        except (OSError, SessionFormatError) as e:
+            logger.error(f"Failed to open session file: {e}")
+        return None
+    
+    def load_session(self, filename: str) -> bool:
+        """
+        Load session data from a .wfs file into the history buffer.
+        
+        Only the newest `buffer_size` points fit the buffer, so only those
+        are converted back into tuples. The session's rollups are built into
+        `loaded_rollups` (see query_rollups); the ones of the session being
+        recorded are left alone.
+        
+        Args:
+            filename: Name of the session file to load from
+            
+        Returns:
+            bool: True if load was successful, False otherwise
+        """
+        session = self.open_session(filename)
+        if session is None:
+            return False
+        
+        self.clear_history()
+        loaded = RollupStore()
+        loaded.load(*session)
+        self.loaded_rollups = loaded
+        tail = slice(max(0, len(session.timestamps) - self.buffer_size), None)
+        self.history.extend(session.timestamps[tail] / 1_000_000,
+                            session.upload[tail], session.download[tail])
+        logger.info(f"Loaded {len(self.history)} of {len(session.timestamps)} data points "
+                    f"from {os.path.join(self.data_dir, filename)}")
+        return True
+    
+    def close(self, compress: bool = False) -> Optional[str]:
+        """
+        Finish the session: flush the session log and compact it into a .wfs file.
+        
+        Data points added afterwards go to a new session (see new_session),
+        so they never overwrite the file written here.
+        
+        Args:
+            compress: zlib-compress the resulting session file
+            
+        Returns:
+            Path of the session file, or None if nothing was recorded or compaction failed
+        """
+        if self.writer is None:
+            return None
+        
+        filepath = os.path.join(self.data_dir, f"{self.session_name}{EXTENSION}")
+        try:
+            self.writer.close()
+            count = compact_session(self.data_dir, self.session_name, filepath, compress=compress)
+            logger.info(f"Session with {count} data points saved to {filepath}")
+            self._index(filepath)
+        except Exception as e:
+            # The segments are only removed after a successful compaction
+            logger.error(f"Failed to compact session log: {e}")
+            return None
+        finally:
+            self.writer = None
+            self.new_session()
+        return filepath
+    
+    def recover_sessions(self) -> List[str]:
+        """
+        Compact session logs left behind by a crash into .wfs files.
+        
+        Call at startup, before recording; torn tails are truncated to the
+        last intact batch.
+        
+        Returns:
+            List of filenames of the recovered session files
+        """
+        recovered = []
+        for name in find_segments(self.data_dir):
+            if self.writer is not None and name == self.session_name:
+                continue
+            filename = f"{name}{EXTENSION}"
+            try:
+                count = compact_session(self.data_dir, name, os.path.join(self.data_dir, filename))
+                logger.info(f"Recovered {count} data points of an interrupted session into {filename}")
+                self._index(filename)
+                recovered.append(filename)
+            except Exception as e:
+                logger.error(f"Failed to recover session {name}: {e}")
+        return recovered
+    
     def save_to_csv(self, filename: Optional[str] = None) -> bool:
         """
-        Save current session data to a CSV file.
+        Export current session data to a CSV file.
         
         Args:
-            filename: Name of the CSV file (default: auto-generated based on timestamp)
+            filename: Name of the CSV file (default: the session name with a .csv extension)
             
         Returns:
             bool: True if save was successful, False otherwise
         """
         if not filename:
-            # Generate filename based on session start time
-            timestamp = self.format_timestamp_for_filename(self.session_start_time)
-            filename = f"wifi_session_{timestamp}.csv"
+            filename = f"{self.session_name}.csv"
         
         filepath = os.path.join(self.data_dir, filename)
         
@@ -95,10 +328,12 @@ class DataManager:
                 csv_writer.writerow(['Timestamp', 'Upload Speed (MB/s)', 'Download Speed (MB/s)'])
                 
                 # Write data
-                for timestamp, upload, download in self.history:
+                # Speeds are float32 in the buffer; 7 significant digits round-trip them
+                for timestamp, upload, download in self.get_history():
                     formatted_timestamp = self.format_timestamp(timestamp)
-                    csv_writer.writerow([formatted_timestamp, upload, download])
+                    csv_writer.writerow([formatted_timestamp, f"{upload:.7g}", f"{download:.7g}"])
             
+            # Not catalogued: the samples are already in the session's .wfs file
             logger.info(f"Session data saved to {filepath}")
             return True
         except Exception as e:
@@ -135,7 +370,7 @@ class DataManager:
                             timestamp = self.parse_timestamp(row[0])
                             upload = float(row[1])
                             download = float(row[2])
-                            self.history.append((timestamp, upload, download))
+                            self.history.append(timestamp.timestamp(), upload, download)
                         except (ValueError, IndexError) as e:
                             logger.warning(f"Skipping malformed row in CSV: {e}")
             
@@ -147,7 +382,7 @@ class DataManager:
     
     def list_available_sessions(self) -> List[str]:
         """
-        List all available session CSV files in the data directory.
+        List all available session files (.wfs and CSV) in the data directory.
         
         Returns:
             List of filenames of available session data files
@@ -157,18 +392,64 @@ class DataManager:
                 return []
                 
             files = [f for f in os.listdir(self.data_dir) 
-                    if f.startswith('wifi_session_') and f.endswith('.csv')]
+                    if f.startswith('wifi_session_') and f.endswith((EXTENSION, '.csv'))]
             return sorted(files)
         except Exception as e:
             logger.error(f"Failed to list available sessions: {e}")
             return []
     
+    @property
+    def catalog(self) -> SessionCatalog:
+        """Catalog of the session files in the data directory (opened on first use)."""
+        if self._catalog is None:
+            self._catalog = SessionCatalog(self.data_dir)
+        return self._catalog
+    
+    def _index(self, filename: str) -> None:
+        try:
+            self.catalog.index_file(filename)
+        except Exception as e:
+            logger.error(f"Failed to update session catalog: {e}")
+    
+    def find_sessions(self, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> List[dict]:
+        """
+        Stored sessions with samples between two times, with their summary stats.
+        
+        Args:
+            start: Range start (default: unbounded)
+            end: Range end (default: unbounded)
+            
+        Returns:
+            List of dicts with filename, format, start_us, end_us, count and
+            min/max/mean per direction, oldest first
+        """
+        self.catalog.update()
+        return self.catalog.find_sessions(
+            to_epoch_us(start) if start else None, to_epoch_us(end) if end else None)
+    
+    def query_samples(self, start: datetime, end: datetime) -> Session:
+        """
+        All stored samples between two times, across every session file.
+        
+        Only the blocks of the catalogued files that overlap the range are read.
+        
+        Args:
+            start: Range start
+            end: Range end
+            
+        Returns:
+            Session of (timestamps in epoch microseconds, upload, download) arrays
+        """
+        self.catalog.update()
+        return self.catalog.query(to_epoch_us(start), to_epoch_us(end))
+    
     def delete_session_file(self, filename: str) -> bool:
         """
         Delete a session data file.
         
         Args:
-            filename: Name of the CSV file to delete
+            filename: Name of the session file to delete
             
         Returns:
             bool: True if deletion was successful, False otherwise
@@ -182,6 +463,8 @@ class DataManager:
         try:
             os.remove(filepath)
             logger.info(f"Deleted session file: {filepath}")
+            if self._catalog is not None:
+                self._catalog.remove(filename)
             return True
         except Exception as e:
             logger.error(f"Failed to delete session file: {e}")
@@ -229,8 +512,8 @@ class DataManager:
 
 # Simple test if the file is run directly
 if __name__ == "__main__":
-    # Create data manager
-    dm = DataManager()
+    # Create data manager (buffer only, no session log for this demo)
+    dm = DataManager(stream=False)
     
     # Add some test data
     for i in range(10):
@@ -241,15 +524,16 @@ if __name__ == "__main__":
     for point in dm.get_history():
         print(f"  {dm.format_timestamp(point[0])}: Up: {point[1]:.2f} MB/s, Down: {point[2]:.2f} MB/s")
     
-    # Save to CSV
+    # Save as a binary session and export to CSV
+    dm.save_session("test_session.wfs")
     dm.save_to_csv("test_session.csv")
     
     # Clear history
     dm.clear_history()
     print(f"After clearing: {len(dm.get_history())} points")
     
-    # Load from CSV
-    dm.load_from_csv("test_session.csv")
+    # Load the binary session back
+    dm.load_session("test_session.wfs")
     print(f"After loading: {len(dm.get_history())} points")
     
     # List available sessions
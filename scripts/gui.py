@@ -5,7 +5,6 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import time
 import threading
-from datetime import datetime, timedelta
 import numpy as np
 import sys
 import os
@@ -13,6 +12,7 @@ import os
 # Import from our modules
 from wifi_monitor import SpeedCalculator, validate_interface
 from data_manager import DataManager
+from scheduler import SamplingScheduler
 
 class WiFiMonitorGUI:
     def __init__(self, interface='wlo1'):
@@ -26,6 +26,10 @@ class WiFiMonitorGUI:
         self.interface = interface
         self.running = False
         self.monitoring_thread = None
+        self.sample_rate = 1.0  # samples per second
+        # Each run gets its own stop event and scheduler (see toggle_monitoring)
+        self.stop_event = threading.Event()
+        self.scheduler = SamplingScheduler(rate=self.sample_rate)
         self.show_mbps = False  # Default to MB/s
         
         try:
@@ -38,6 +42,7 @@ class WiFiMonitorGUI:
             # Initialize core components
             self.speed_calculator = SpeedCalculator(self.interface)
             self.data_manager = DataManager()
+            self.data_manager.recover_sessions()
             
             # Create GUI elements
             self.create_widgets()
@@ -183,21 +188,28 @@ class WiFiMonitorGUI:
             self.start_stop_button.config(text="Stop")
             self.status_bar.config(text=f"Monitoring {self.interface}...")
             
-            # Start monitoring in a separate thread
-            self.monitoring_thread = threading.Thread(target=self.monitor_network, daemon=True)
+            # Start monitoring in a separate thread. A thread from a previous
+            # run may still be finishing its last sample; it keeps its own
+            # (set) event and scheduler, so it exits instead of resuming
+            # alongside the new one.
+            self.stop_event = threading.Event()
+            self.scheduler = SamplingScheduler(rate=self.sample_rate)
+            self.monitoring_thread = threading.Thread(
+                target=self.monitor_network, args=(self.stop_event, self.scheduler), daemon=True)
             self.monitoring_thread.start()
         else:
             # Stop monitoring
             self.running = False
+            self.stop_event.set()
             self.start_stop_button.config(text="Start")
             self.status_bar.config(text="Monitoring stopped")
     
-    def monitor_network(self):
-        """Monitor network traffic in a separate thread"""
-        while self.running:
+    def monitor_network(self, stop_event, scheduler):
+        """Monitor network traffic in a separate thread, one sample per scheduler tick"""
+        for tick in scheduler.run(stop_event):
             try:
                 # Get current speeds
-                download_speed, upload_speed = self.speed_calculator.get_speeds()
+                upload_speed, download_speed = self.speed_calculator.get_speeds()[:2]
                 
                 # Update data lists
                 current_time = time.time()
@@ -221,20 +233,13 @@ class WiFiMonitorGUI:
                 # Update the labels
                 self.update_labels(download_speed, upload_speed)
                 
-                # Update data manager
-                # Update data manager
-                self.data_manager.add_data_point(
-                    datetime.now(),  # datetime.datetime
-                    upload_speed,    # float
-                    download_speed   # float
-                )
-                # Sleep for 1 second
-                time.sleep(1)
+                # Update data manager (also streams the point to the session log)
+                self.data_manager.add_data_point(upload_speed, download_speed)
                 
             except Exception as e:
                 # Update status with the error
-                self.root.after(0, lambda: self.status_bar.config(text=f"Error: {str(e)}"))
-                time.sleep(1)
+                message = f"Error: {e}"
+                self.root.after(0, lambda: self.status_bar.config(text=message))
     
     def update_labels(self, download_speed, upload_speed):
         """Update the speed labels with current values"""
@@ -248,7 +253,7 @@ class WiFiMonitorGUI:
             upload_text = f"{upload_mbps:.2f} Mbps ({upload_speed:.2f} MB/s)"
         else:
             download_text = f"{download_speed:.2f} MB/s ({download_mbps:.2f} Mbps)"
-            upload_text = f"{upload_mbps:.2f} MB/s ({upload_mbps:.2f} Mbps)"
+            upload_text = f"{upload_speed:.2f} MB/s ({upload_mbps:.2f} Mbps)"
         
         # Update labels in the main thread
         self.root.after(0, lambda: self.download_label.config(text=download_text))
@@ -288,9 +293,11 @@ class WiFiMonitorGUI:
         self.update_plot()
     
     def save_data(self):
-        """Save current session data to CSV"""
+        """Save current session data to a binary session file"""
         try:
-            filename = self.data_manager.save_to_csv()
+            filename = self.data_manager.save_session()
+            if not filename:
+                raise IOError("Could not write the session file (see log)")
             self.status_bar.config(text=f"Data saved to {filename}")
         except Exception as e:
             messagebox.showerror("Save Error", str(e))
@@ -300,12 +307,13 @@ class WiFiMonitorGUI:
         # Stop monitoring if running
         if self.running:
             self.running = False
+            self.stop_event.set()
             if self.monitoring_thread and self.monitoring_thread.is_alive():
                 self.monitoring_thread.join(timeout=1.0)
         
-        # Save data before closing
+        # Flush the session log and compact it into a session file
         try:
-            self.data_manager.save_to_csv()
+            self.data_manager.close()
         except Exception as e:
             print(f"Error saving data: {e}")
         
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+WiFi Traffic Monitor - Linux Fast-Path Counter Sources
+
+psutil re-opens /proc/net/dev, decodes it as text and builds a namedtuple
+per interface on every call, which caps how fast SpeedCalculator can
+usefully sample. The readers here keep their files open and re-read them
+with pread into a reused buffer:
+
+- ProcNetDev parses /proc/net/dev, skipping lines of interfaces that are
+  not monitored before splitting their fields.
+- SysfsCounters reads /sys/class/net/<if>/statistics/* for one interface.
+
+Both return {name: counters} with counters in psutil's snetio order
+(bytes_sent, bytes_recv, packets_sent, packets_recv, errin, errout, dropin,
+dropout), so they are drop-in `read_counters` sources for SpeedCalculator
+and MultiInterfaceSampler. `counter_source` picks the fastest one available
+and falls back to psutil (or the caller's source) on other platforms.
+"""
+
+import os
+import logging
+
+logger = logging.getLogger('procnet')
+
+PROC_NET_DEV = "/proc/net/dev"
+SYS_CLASS_NET = "/sys/class/net"
+
+# /proc/net/dev fields (after "iface:") in snetio order
+PROC_FIELDS = (8, 0, 9, 1, 2, 10, 3, 11)
+# /sys/class/net/<if>/statistics files in snetio order
+SYSFS_FILES = ("tx_bytes", "rx_bytes", "tx_packets", "rx_packets",
+               "rx_errors", "tx_errors", "rx_dropped", "tx_dropped")
+
+
+def _pread_into(fd, buffer):
+    """Read a whole pseudo-file from offset 0 into `buffer`; returns the byte count."""
+    if hasattr(os, "preadv"):
+        return os.preadv(fd, [buffer], 0)
+    data = os.pread(fd, len(buffer), 0)
+    buffer[:len(data)] = data
+    return len(data)
+
+
+class ProcNetDev:
+    """
+    Counter source backed by a kept-open /proc/net/dev.
+    """
+
+    def __init__(self, interfaces=None, buffer_size=65536):
+        """
+        Open /proc/net/dev.
+
+        Args:
+            interfaces (list): Interface names to return, or None for all of them
+            buffer_size (int): Read buffer size in bytes (grown if the table is larger)
+
+        Raises:
+            OSError: If /proc/net/dev cannot be opened (not Linux)
+        """
+        self.interfaces = None if interfaces is None else list(interfaces)
+        self._wanted = (None if interfaces is None
+                        else [(name, name.encode() + b":") for name in self.interfaces])
+        self._fd = os.open(PROC_NET_DEV, os.O_RDONLY)
+        self._buffer = bytearray(buffer_size)
+
+    def close(self):
+        """Close the file descriptor."""
+        if getattr(self, "_fd", None) is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
+
+    def _read(self):
+        n = _pread_into(self._fd, self._buffer)
+        while n == len(self._buffer):
+            # The table filled the buffer; grow it and read again
+            self._buffer = bytearray(2 * len(self._buffer))
+            n = _pread_into(self._fd, self._buffer)
+        return n
+
+    def _parse_line(self, start, end):
+        values = self._buffer[start:end].partition(b":")[2].split()
+        return tuple(int(values[i]) for i in PROC_FIELDS)
+
+    def __call__(self):
+        """
+        Read the counters.
+
+        Returns:
+            dict: Interface name -> tuple of 8 counters in snetio order
+        """
+        size = self._read()
+        buffer = self._buffer
+        if self._wanted is None:
+            counters = {}
+            for line in buffer[:size].splitlines()[2:]:
+                name, _, fields = line.partition(b":")
+                values = fields.split()
+                counters[name.strip().decode()] = tuple(int(values[i]) for i in PROC_FIELDS)
+            return counters
+
+        # Only the monitored lines are sliced out of the buffer and split;
+        # the rest of the table is skipped by find()
+        counters = {}
+        for name, token in self._wanted:
+            position = buffer.find(token, 0, size)
+            # Names are right-aligned: the match must start a line or follow padding
+            while position > 0 and buffer[position - 1] not in b" \n":
+                position = buffer.find(token, position + 1, size)
+            if position < 0:
+                continue
+            end = buffer.find(b"\n", position, size)
+            counters[name] = self._parse_line(position, end if end >= 0 else size)
+        return counters
+
+
+class SysfsCounters:
+    """
+    Counter source for a single interface backed by kept-open sysfs files.
+    """
+
+    def __init__(self, interface_name):
+        """
+        Open the interface's statistics files.
+
+        Args:
+            interface_name (str): Interface to read
+
+        Raises:
+            OSError: If the statistics files cannot be opened
+        """
+        self.interface_name = interface_name
+        directory = os.path.join(SYS_CLASS_NET, interface_name, "statistics")
+        self._fds = []
+        try:
+            for filename in SYSFS_FILES:
+                self._fds.append(os.open(os.path.join(directory, filename), os.O_RDONLY))
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        """Close the file descriptors."""
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+    def __del__(self):
+        self.close()
+
+    def __call__(self):
+        """
+        Read the counters.
+
+        Returns:
+            dict: {interface name: tuple of 8 counters in snetio order}
+        """
+        return {self.interface_name: tuple(int(os.pread(fd, 32, 0)) for fd in self._fds)}
+
+
+def counter_source(interfaces=None, fallback=None):
+    """
+    Pick the fastest available counter source.
+
+    Args:
+        interfaces (list): Interface names that will be read, or None for all
+        fallback (callable): Source to use where /proc/net/dev is unavailable
+            (default: wifi_monitor.psutil_counters)
+
+    Returns:
+        callable: Zero-argument counter source returning {name: counters},
+        or the fallback when not on Linux
+    """
+    try:
+        return ProcNetDev(interfaces)
+    except OSError:
+        logger.info("/proc/net/dev is not available; using the fallback counter source")
+    if fallback is None:
+        # Imported here: wifi_monitor itself imports this module
+        from wifi_monitor import psutil_counters
+        fallback = psutil_counters
+    return fallback
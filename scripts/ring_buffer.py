@@ -0,0 +1,129 @@
+"""
+WiFi Ring Buffer - Fixed-Capacity Sample Storage Module
+
+This module provides the in-memory window used by SpeedCalculator and
+DataManager: float64 epoch-second timestamps and float32 upload/download
+speeds in preallocated numpy arrays. That is 32 bytes per sample including
+the mirror copy described below, against roughly 160 for a tuple holding a
+datetime.
+
+Every sample is written twice, at `i` and `i + capacity` of arrays twice the
+capacity long, so the last `len(buffer)` samples are always one contiguous
+slice. Appends are O(1) and the ordered views are slices of the storage, not
+copies.
+
+With `width` set, each sample holds a row of `width` upload and download
+speeds (e.g. one column per network interface) under a single timestamp.
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity ring buffer of (timestamp, upload_speed, download_speed).
+
+    Views returned by `arrays()` share memory with the buffer. Once it is
+    full, the next append overwrites the oldest sample of earlier views, so
+    copy them if samples may be appended (e.g. from another thread) while
+    they are in use.
+    """
+
+    def __init__(self, capacity: int, width: Optional[int] = None):
+        """
+        Args:
+            capacity: Maximum number of samples kept; the oldest are overwritten
+            width: Speeds per sample, or None for scalar speeds
+        """
+        self.capacity = max(1, int(capacity))
+        self.width = width
+        shape = (2 * self.capacity,) if width is None else (2 * self.capacity, width)
+        self._timestamps = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._upload = np.zeros(shape, dtype=np.float32)
+        self._download = np.zeros(shape, dtype=np.float32)
+        self._next = 0      # slot the next sample goes to, in [0, capacity)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, upload_speed: float, download_speed: float) -> None:
+        """
+        Add one sample, overwriting the oldest once the buffer is full.
+
+        Args:
+            timestamp: Sample time in epoch seconds
+            upload_speed: Upload speed in MB/s (a row of `width` with width set)
+            download_speed: Download speed in MB/s (likewise)
+        """
+        i = self._next
+        mirror = i + self.capacity
+        self._timestamps[i] = self._timestamps[mirror] = timestamp
+        self._upload[i] = self._upload[mirror] = upload_speed
+        self._download[i] = self._download[mirror] = download_speed
+        self._next = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def extend(self, timestamps, upload, download) -> None:
+        """
+        Append whole columns at once; only the last `capacity` samples are kept.
+
+        Args:
+            timestamps: Sample times in epoch seconds
+            upload: Upload speeds in MB/s
+            download: Download speeds in MB/s
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)[-self.capacity:]
+        upload = np.asarray(upload, dtype=np.float32)[-self.capacity:]
+        download = np.asarray(download, dtype=np.float32)[-self.capacity:]
+        n = len(timestamps)
+        if n == 0:
+            return
+        slots = (self._next + np.arange(n)) % self.capacity
+        for storage, values in ((self._timestamps, timestamps), (self._upload, upload),
+                                (self._download, download)):
+            storage[slots] = values
+            storage[slots + self.capacity] = values
+        self._next = (self._next + n) % self.capacity
+        self._size = min(self.capacity, self._size + n)
+
+    def clear(self) -> None:
+        """Drop all samples (the storage is kept)."""
+        self._next = 0
+        self._size = 0
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Oldest-to-newest views of the timestamps, upload and download speeds.
+
+        Returns:
+            tuple: Three read-only numpy views (no copy)
+        """
+        # The newest sample sits just before _next in the upper copy
+        end = self._next + self.capacity
+        start = end - self._size
+        views = (self._timestamps[start:end], self._upload[start:end],
+                 self._download[start:end])
+        for view in views:
+            view.flags.writeable = False
+        return views
+
+    def __iter__(self) -> Iterator[Tuple[float, float, float]]:
+        timestamps, upload, download = self.arrays()
+        return zip(timestamps.tolist(), upload.tolist(), download.tolist())
+
+    def __getitem__(self, index: int) -> Tuple[float, float, float]:
+        if not -self._size <= index < self._size:
+            raise IndexError("ring buffer index out of range")
+        if index < 0:
+            index += self._size
+        i = (self._next - self._size + index) % self.capacity
+        return (self._timestamps[i].item(), self._upload[i].tolist(), self._download[i].tolist())
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the sample storage in bytes."""
+        return self._timestamps.nbytes + self._upload.nbytes + self._download.nbytes
@@ -0,0 +1,270 @@
+"""
+WiFi Rollups - Multi-Resolution Time-Series Module
+
+This module keeps downsampled tiers of a session (by default 1 s, 10 s,
+1 min and 15 min buckets) with min/max/mean/median/95th-percentile upload
+and download speeds per bucket. Tiers are maintained incrementally as
+samples arrive: only the currently open bucket of each tier keeps its raw
+values, and it is aggregated once the first sample of the next bucket
+arrives. Range queries pick the coarsest tier that still yields the
+requested number of points, so plotting a week-long capture reads a few
+hundred buckets instead of every sample. Each tier keeps at most
+`max_buckets` closed buckets (by default a day of the 1 s tier), dropping
+the oldest, so a session that runs for weeks uses bounded memory while the
+coarser tiers still cover it.
+"""
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("rollups")
+
+DEFAULT_INTERVALS = (1, 10, 60, 900)
+MAX_BUCKETS = 86400
+AGGREGATES = ("min", "max", "mean", "p50", "p95")
+PERCENTILES = {"p50": 0.50, "p95": 0.95}
+SERIES = ("upload", "download")
+
+ROLLUP = np.dtype(
+    [("start", "<i8"), ("count", "<i4")]
+    + [(f"{series}_{agg}", "<f4") for series in SERIES for agg in AGGREGATES]
+)
+
+
+def aggregate(bucket_starts: np.ndarray, upload: np.ndarray,
+              download: np.ndarray) -> np.ndarray:
+    """
+    Aggregate samples into ROLLUP records, one per distinct bucket.
+
+    Args:
+        bucket_starts: Bucket start (epoch microseconds) of every sample,
+            non-decreasing
+        upload: Upload speeds in MB/s
+        download: Download speeds in MB/s
+
+    Returns:
+        numpy structured array of ROLLUP records
+    """
+    if len(bucket_starts) == 0:
+        return np.empty(0, dtype=ROLLUP)
+    starts = np.flatnonzero(np.r_[True, bucket_starts[1:] != bucket_starts[:-1]])
+    counts = np.diff(np.r_[starts, len(bucket_starts)])
+
+    records = np.empty(len(starts), dtype=ROLLUP)
+    records["start"] = bucket_starts[starts]
+    records["count"] = counts
+    for series, values in zip(SERIES, (upload, download)):
+        values = np.asarray(values, dtype=np.float64)
+        records[f"{series}_min"] = np.minimum.reduceat(values, starts)
+        records[f"{series}_max"] = np.maximum.reduceat(values, starts)
+        records[f"{series}_mean"] = np.add.reduceat(values, starts) / counts
+        if len(starts) == len(values):
+            # One sample per bucket (e.g. the 1 s tier at 1 Hz): nothing to rank
+            for agg in PERCENTILES:
+                records[f"{series}_{agg}"] = values
+            continue
+        # Sort within each bucket, then interpolate like np.percentile does
+        ordered = values[np.lexsort((values, bucket_starts))]
+        for agg, q in PERCENTILES.items():
+            position = starts + q * (counts - 1)
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            weight = position - low
+            records[f"{series}_{agg}"] = ordered[low] * (1 - weight) + ordered[high] * weight
+    return records
+
+
+class RollupTier:
+    """
+    One resolution: closed buckets in a growable array plus the open bucket.
+    """
+
+    def __init__(self, interval: int, max_buckets: Optional[int] = MAX_BUCKETS):
+        """
+        Args:
+            interval: Bucket width in seconds
+            max_buckets: Closed buckets kept; the oldest are dropped (None: unbounded)
+        """
+        self.interval = interval
+        self.interval_us = interval * 1_000_000
+        self.max_buckets = None if max_buckets is None else max(1, max_buckets)
+        self._records = np.empty(64, dtype=ROLLUP)
+        self._size = 0
+        self._dropped = False       # whether old buckets were dropped for max_buckets
+        self._open_start: Optional[int] = None
+        self._open: List[Tuple[float, float]] = []
+
+    def __len__(self) -> int:
+        return self._size + (1 if self._open else 0)
+
+    def add(self, timestamp_us: int, upload_speed: float, download_speed: float) -> None:
+        """Add one sample, closing the open bucket if the sample starts a new one."""
+        start = timestamp_us - timestamp_us % self.interval_us
+        if self._open_start is not None and start != self._open_start:
+            self._close()
+        self._open_start = start
+        self._open.append((upload_speed, download_speed))
+
+    def load(self, timestamps: np.ndarray, upload: np.ndarray, download: np.ndarray) -> None:
+        """Replace the tier with buckets built from whole (time-sorted) columns."""
+        starts = timestamps - timestamps % self.interval_us
+        records = aggregate(starts, upload, download)
+        closed = records[:-1]
+        self._dropped = self.max_buckets is not None and len(closed) > self.max_buckets
+        if self._dropped:
+            closed = closed[-self.max_buckets:]
+        self._records = np.empty(max(64, 2 * len(closed)), dtype=ROLLUP)
+        self._records[:len(closed)] = closed
+        self._size = len(closed)
+        self._open_start, self._open = None, []
+        if len(records):
+            # Keep the last bucket open so live samples can still join it
+            tail = starts == records["start"][-1]
+            self._open_start = int(records["start"][-1])
+            self._open = list(zip(upload[tail].tolist(), download[tail].tolist()))
+
+    def records(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> np.ndarray:
+        """
+        Buckets overlapping [start_us, end_us], including the open one.
+
+        Returns:
+            numpy structured array of ROLLUP records (a copy)
+        """
+        closed = self._records[:self._size]
+        lo = 0 if start_us is None else np.searchsorted(
+            closed["start"], start_us - self.interval_us, side="right")
+        hi = self._size if end_us is None else np.searchsorted(closed["start"], end_us, side="right")
+        parts = [closed[lo:hi]]
+        if self._open and (end_us is None or self._open_start <= end_us) and (
+                start_us is None or self._open_start + self.interval_us > start_us):
+            parts.append(self._aggregate_open())
+        return np.concatenate(parts)
+
+    def count_in_range(self, start_us: int, end_us: int) -> int:
+        """Number of buckets a query over [start_us, end_us] would return, without copying."""
+        closed = self._records[:self._size]["start"]
+        lo = np.searchsorted(closed, start_us - self.interval_us, side="right")
+        hi = np.searchsorted(closed, end_us, side="right")
+        open_hit = bool(self._open) and start_us - self.interval_us < self._open_start <= end_us
+        return int(hi - lo) + open_hit
+
+    def covers(self, start_us: int) -> bool:
+        """False if buckets at or after `start_us` were dropped to respect max_buckets."""
+        if not self._dropped:
+            return True
+        first = self._records[0]["start"] if self._size else self._open_start
+        return first is not None and first <= start_us
+
+    def clear(self) -> None:
+        self._size = 0
+        self._dropped = False
+        self._open_start, self._open = None, []
+
+    def _aggregate_open(self) -> np.ndarray:
+        values = np.array(self._open, dtype=np.float64)
+        starts = np.full(len(values), self._open_start, dtype=np.int64)
+        return aggregate(starts, values[:, 0], values[:, 1])
+
+    def _close(self) -> None:
+        if self._size == self.max_buckets:
+            # Drop the oldest quarter at once so trimming is amortised O(1)
+            keep = self._size - max(1, self._size // 4)
+            self._records[:keep] = self._records[self._size - keep:self._size]
+            self._size = keep
+            self._dropped = True
+        if self._size == len(self._records):
+            capacity = len(self._records) * 2
+            if self.max_buckets is not None:
+                capacity = min(capacity, self.max_buckets)
+            grown = np.empty(capacity, dtype=ROLLUP)
+            grown[:self._size] = self._records
+            self._records = grown
+        if len(self._open) == 1:
+            # Common case for the finest tier; skips the numpy round trip
+            upload, download = self._open[0]
+            self._records[self._size] = (self._open_start, 1) + (upload,) * 5 + (download,) * 5
+        else:
+            self._records[self._size] = self._aggregate_open()[0]
+        self._size += 1
+        self._open = []
+
+
+class RollupStore:
+    """
+    Set of rollup tiers over one session, finest first.
+    """
+
+    def __init__(self, intervals: Sequence[int] = DEFAULT_INTERVALS,
+                 max_buckets: Optional[int] = MAX_BUCKETS):
+        """
+        Args:
+            intervals: Bucket widths in seconds (default: 1 s, 10 s, 1 min, 15 min)
+            max_buckets: Closed buckets kept per tier (None: unbounded)
+        """
+        self.tiers = [RollupTier(interval, max_buckets) for interval in sorted(intervals)]
+
+    def add(self, timestamp_us: int, upload_speed: float, download_speed: float) -> None:
+        """
+        Add one sample to every tier.
+
+        Args:
+            timestamp_us: Sample time in epoch microseconds
+            upload_speed: Upload speed in MB/s
+            download_speed: Download speed in MB/s
+        """
+        for tier in self.tiers:
+            tier.add(timestamp_us, upload_speed, download_speed)
+
+    def load(self, timestamps: Sequence[int], upload: Sequence[float],
+             download: Sequence[float]) -> None:
+        """
+        Rebuild all tiers from whole columns (e.g. a loaded session) in bulk.
+
+        Args:
+            timestamps: Epoch microseconds
+            upload: Upload speeds in MB/s
+            download: Download speeds in MB/s
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        upload = np.asarray(upload, dtype=np.float64)
+        download = np.asarray(download, dtype=np.float64)
+        if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, upload, download = timestamps[order], upload[order], download[order]
+        for tier in self.tiers:
+            tier.load(timestamps, upload, download)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+    def query(self, start_us: int, end_us: int, points: int = 500) -> Tuple[int, np.ndarray]:
+        """
+        Buckets covering [start_us, end_us] at a resolution fit for `points`.
+
+        The coarsest tier that still yields at least `points` buckets in the
+        range is used; if none does, the finest tier is. Tiers that have
+        dropped buckets from the start of the range are skipped (if all have,
+        the coarsest tier is used).
+
+        Args:
+            start_us: Range start in epoch microseconds
+            end_us: Range end in epoch microseconds
+            points: Number of points wanted (e.g. the plot width in pixels)
+
+        Returns:
+            tuple: (bucket width in seconds, ROLLUP records)
+        """
+        tiers = [tier for tier in self.tiers if tier.covers(start_us)] or self.tiers[-1:]
+        chosen = tiers[0]
+        for tier in reversed(tiers):
+            if tier.count_in_range(start_us, end_us) >= points:
+                chosen = tier
+                break
+        return chosen.interval, chosen.records(start_us, end_us)
+
+    def stats(self) -> dict:
+        """Bucket count per tier, keyed by bucket width in seconds."""
+        return {tier.interval: len(tier) for tier in self.tiers}
@@ -0,0 +1,153 @@
+"""
+WiFi Sampling Scheduler - Monotonic Deadline Module
+
+This module paces the monitor loop. Sleeping a fixed second after each
+sample makes the real period 1 s plus the sampling work, and it drifts
+further whenever the thread is delayed. SamplingScheduler instead keeps a
+grid of deadlines `start + k * period` on `time.monotonic_ns()` (immune to
+NTP and manual clock changes) and sleeps until the next one, so work time
+does not accumulate and ticks stay evenly spaced.
+
+A tick that is late by a whole period or more is not replayed in a burst:
+the scheduler moves on to the latest deadline that has passed and counts
+the deadlines it skipped as missed. How late each tick fired (jitter) is
+recorded for a rolling window of ticks.
+"""
+
+import threading
+import time
+import logging
+from collections import deque, namedtuple
+from typing import Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger("scheduler")
+
+Tick = namedtuple("Tick", ["index", "deadline_ns", "lateness_ns", "missed"])
+Tick.__doc__ = """
+One scheduler tick: its index on the deadline grid, the deadline in
+monotonic nanoseconds, how late it fired and how many ticks were skipped
+just before it.
+"""
+
+
+class SamplingScheduler:
+    """
+    Deadline-based periodic scheduler on the monotonic clock.
+    """
+
+    def __init__(self, rate: float = 1.0, jitter_window: int = 600):
+        """
+        Args:
+            rate: Ticks per second
+            jitter_window: Number of recent ticks kept for the jitter statistics
+        """
+        self.period_ns = self._period(rate)
+        self.ticks = 0
+        self.missed = 0
+        self._jitter_ns = deque(maxlen=max(1, jitter_window))
+        self._index = 0
+        self._deadline_ns = None
+
+    @staticmethod
+    def _period(rate: float) -> int:
+        if rate <= 0:
+            raise ValueError(f"Sampling rate must be positive, got {rate}")
+        return max(1, round(1e9 / rate))
+
+    @property
+    def rate(self) -> float:
+        """Ticks per second."""
+        return 1e9 / self.period_ns
+
+    def set_rate(self, rate: float) -> None:
+        """
+        Change the rate; the new period starts from the last tick.
+
+        Args:
+            rate: Ticks per second
+        """
+        period_ns = self._period(rate)
+        if self._deadline_ns is not None:
+            self._deadline_ns += period_ns - self.period_ns
+        self.period_ns = period_ns
+
+    def start(self) -> None:
+        """(Re)start the deadline grid one period from now and reset the statistics."""
+        self._index = 0
+        self._deadline_ns = time.monotonic_ns() + self.period_ns
+        self.ticks = 0
+        self.missed = 0
+        self._jitter_ns.clear()
+
+    def wait(self, stop_event: Optional[threading.Event] = None) -> Optional[Tick]:
+        """
+        Sleep until the next deadline.
+
+        Args:
+            stop_event: Event that interrupts the wait when set
+
+        Returns:
+            Tick, or None if `stop_event` was set while waiting
+        """
+        if self._deadline_ns is None:
+            self.start()
+        while True:
+            remaining_ns = self._deadline_ns - time.monotonic_ns()
+            if stop_event is not None and stop_event.is_set():
+                return None
+            if remaining_ns <= 0:
+                break
+            if stop_event is not None:
+                stop_event.wait(remaining_ns / 1e9)
+            else:
+                time.sleep(remaining_ns / 1e9)
+
+        lateness_ns = time.monotonic_ns() - self._deadline_ns
+        missed = lateness_ns // self.period_ns
+        if missed:
+            # Skip to the latest deadline that has passed instead of bursting
+            self._deadline_ns += missed * self.period_ns
+            self._index += missed
+            lateness_ns -= missed * self.period_ns
+            self.missed += missed
+            logger.warning(f"Sampling fell behind; skipped {missed} tick(s)")
+
+        tick = Tick(self._index, self._deadline_ns, lateness_ns, missed)
+        self._jitter_ns.append(lateness_ns)
+        self.ticks += 1
+        self._index += 1
+        self._deadline_ns += self.period_ns
+        return tick
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> Iterator[Tick]:
+        """
+        Yield a Tick at every deadline until `stop_event` is set.
+
+        Args:
+            stop_event: Event that ends the iteration when set
+        """
+        self.start()
+        while True:
+            tick = self.wait(stop_event)
+            if tick is None:
+                return
+            yield tick
+
+    def stats(self) -> dict:
+        """
+        Tick counts and jitter over the recent window.
+
+        Returns:
+            dict: rate, ticks, missed and jitter mean/p95/max in milliseconds
+        """
+        jitter_ms = np.array(self._jitter_ns, dtype=np.float64) / 1e6
+        summary = {"rate": self.rate, "ticks": self.ticks, "missed": self.missed}
+        if len(jitter_ms):
+            summary.update(jitter_mean_ms=float(jitter_ms.mean()),
+                           jitter_p95_ms=float(np.percentile(jitter_ms, 95)),
+                           jitter_max_ms=float(jitter_ms.max()))
+        else:
+            summary.update(jitter_mean_ms=None, jitter_p95_ms=None, jitter_max_ms=None)
+        return summary
@@ -0,0 +1,271 @@
+"""
+WiFi Session Format - Columnar Binary Storage Module
+
+This module reads and writes `.wfs` session files: one column of int64
+epoch-microsecond timestamps followed by one column per speed series
+(float32 or float64). Uncompressed files are memory-mapped on load, so
+opening a multi-day session costs a header parse rather than a parse of
+every row; compressed (zlib) files trade that for a smaller footprint and
+store the timestamps as deltas, which for a fixed sampling interval
+compress to almost nothing. The epoch-microsecond conversions used by
+the importers and the catalog (including a fast parser for the CSV
+timestamp format) live here too.
+
+File layout (little-endian):
+    header     magic b"WFS1", version (u16), flags (u16), point count (u64),
+               column count (u32), reserved (u32)
+    columns    per column: name (16 bytes, NUL-padded), dtype (8 bytes,
+               e.g. "<f4"), offset (u64), stored size in bytes (u64)
+    data       column payloads, each starting on an 8-byte boundary
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+import logging
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("session_format")
+
+MAGIC = b"WFS1"
+VERSION = 1
+FLAG_ZLIB = 0x1
+FLAG_DELTA_TIMESTAMPS = 0x2
+EXTENSION = ".wfs"
+
+HEADER = struct.Struct("<4sHHQII")
+COLUMN = struct.Struct("<16s8sQQ")
+ALIGN = 8
+
+COLUMNS = ("timestamp", "upload", "download")
+PRECISIONS = {"float32": "<f4", "float64": "<f8"}
+
+Session = namedtuple("Session", ["timestamps", "upload", "download"])
+Session.__doc__ = """
+Column arrays of a session: int64 epoch microseconds, then upload and
+download speeds in MB/s. Arrays of an uncompressed file are read-only
+views of the memory-mapped file.
+"""
+
+
+class SessionFormatError(Exception):
+    """Exception raised when a file is not a readable session file."""
+    pass
+
+
+def to_epoch_us(timestamp: datetime) -> int:
+    """
+    Convert a (naive, local) datetime to epoch microseconds.
+
+    Args:
+        timestamp: Datetime object to convert
+
+    Returns:
+        int: Microseconds since the Unix epoch
+    """
+    return round(timestamp.timestamp() * 1_000_000)
+
+
+_hour_cache: Dict[bytes, int] = {}
+
+
+def parse_timestamp_us(text: bytes) -> int:
+    """
+    Parse a "YYYY-MM-DD HH:MM:SS" local timestamp into epoch microseconds.
+
+    Equivalent to strptime + timestamp(), but only the first timestamp of
+    each hour goes through `time.mktime`; the rest add minutes and seconds
+    to the cached start of the hour.
+
+    Args:
+        text: Timestamp as bytes (exactly 19 characters)
+
+    Returns:
+        int: Microseconds since the Unix epoch
+
+    Raises:
+        ValueError: If the timestamp is not in the expected format
+    """
+    if len(text) != 19 or text[4] != 45 or text[10] != 32 or text[13] != 58:
+        raise ValueError(f"Bad timestamp {text!r}")
+    hour = text[:13]
+    base = _hour_cache.get(hour)
+    if base is None:
+        fields = (int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]))
+        if not (1 <= fields[1] <= 12 and 1 <= fields[2] <= 31 and fields[3] <= 23):
+            raise ValueError(f"Bad timestamp {text!r}")
+        base = int(time.mktime(fields + (0, 0, 0, 0, -1))) * 1_000_000
+        if len(_hour_cache) > 100_000:
+            _hour_cache.clear()
+        _hour_cache[hour] = base
+    minutes, seconds = int(text[14:16]), int(text[17:19])
+    if minutes > 59 or seconds > 59 or text[16] != 58:
+        raise ValueError(f"Bad timestamp {text!r}")
+    return base + (minutes * 60 + seconds) * 1_000_000
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_session(path: str, timestamps: Sequence[int], upload: Sequence[float],
+                  download: Sequence[float], precision: str = "float32",
+                  compress: bool = False) -> int:
+    """
+    Write a session file atomically (temporary file, then rename).
+
+    Args:
+        path: Destination file path
+        timestamps: Epoch microseconds, one per point
+        upload: Upload speeds in MB/s
+        download: Download speeds in MB/s
+        precision: "float32" (default, half the size) or "float64"
+        compress: zlib-compress each column (the file can then no longer
+            be memory-mapped)
+
+    Returns:
+        int: Number of points written
+
+    Raises:
+        ValueError: If the columns differ in length or precision is unknown
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'")
+    dtype = PRECISIONS[precision]
+    arrays = [np.ascontiguousarray(timestamps, dtype="<i8"),
+              np.ascontiguousarray(upload, dtype=dtype),
+              np.ascontiguousarray(download, dtype=dtype)]
+    count = len(arrays[0])
+    if any(len(a) != count for a in arrays):
+        raise ValueError("Session columns must all have the same length")
+
+    payloads = []
+    for name, array in zip(COLUMNS, arrays):
+        if compress:
+            if name == "timestamp":
+                array = np.diff(array, prepend=np.int64(0))
+            payloads.append(zlib.compress(array.tobytes(), 6))
+        else:
+            payloads.append(array.tobytes())
+
+    offset = _aligned(HEADER.size + COLUMN.size * len(arrays))
+    table, offsets = [], []
+    for name, array, payload in zip(COLUMNS, arrays, payloads):
+        table.append(COLUMN.pack(name.encode(), array.dtype.str.encode(), offset, len(payload)))
+        offsets.append(offset)
+        offset = _aligned(offset + len(payload))
+
+    flags = FLAG_ZLIB | FLAG_DELTA_TIMESTAMPS if compress else 0
+    # Unique per writer, so two processes or threads saving one session can't
+    # replace each other's half-written file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, count, len(arrays), 0))
+        f.write(b"".join(table))
+        for col_offset, payload in zip(offsets, payloads):
+            f.write(b"\0" * (col_offset - f.tell()))
+            f.write(payload)
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_header(path: str) -> Tuple[int, int, list]:
+    """
+    Parse the header and column table of a session file.
+
+    Args:
+        path: Session file path
+
+    Returns:
+        tuple: (flags, point count, [(name, dtype, offset, size), ...])
+
+    Raises:
+        SessionFormatError: If the file is not a supported session file
+    """
+    with open(path, "rb") as f:
+        head = f.read(HEADER.size)
+        if len(head) < HEADER.size:
+            raise SessionFormatError(f"{path} is too short to be a session file")
+        magic, version, flags, count, ncols, _ = HEADER.unpack(head)
+        if magic != MAGIC:
+            raise SessionFormatError(f"{path} is not a session file")
+        if version > VERSION:
+            raise SessionFormatError(f"{path} uses unsupported format version {version}")
+        table = f.read(COLUMN.size * ncols)
+    if len(table) < COLUMN.size * ncols:
+        raise SessionFormatError(f"{path} has a truncated column table")
+    columns = []
+    for i in range(ncols):
+        name, dtype, offset, size = COLUMN.unpack_from(table, i * COLUMN.size)
+        columns.append((name.rstrip(b"\0").decode(), dtype.rstrip(b"\0").decode(), offset, size))
+    return flags, count, columns
+
+
+def read_session(path: str, mmap: bool = True) -> Session:
+    """
+    Load a session file as column arrays.
+
+    Args:
+        path: Session file path
+        mmap: Map uncompressed files instead of reading them (zero-copy)
+
+    Returns:
+        Session of numpy arrays
+
+    Raises:
+        SessionFormatError: If the file is not a readable session file
+    """
+    flags, count, columns = read_header(path)
+    by_name = {name: (dtype, offset, size) for name, dtype, offset, size in columns}
+    missing = [name for name in COLUMNS if name not in by_name]
+    if missing:
+        raise SessionFormatError(f"{path} lacks column(s): {', '.join(missing)}")
+
+    if count == 0:
+        return Session(*(np.empty(0, dtype=by_name[name][0]) for name in COLUMNS))
+
+    if flags & FLAG_ZLIB:
+        arrays = []
+        with open(path, "rb") as f:
+            for name in COLUMNS:
+                dtype, offset, size = by_name[name]
+                f.seek(offset)
+                try:
+                    data = zlib.decompress(f.read(size))
+                except zlib.error as e:
+                    raise SessionFormatError(f"{path}: column '{name}' is corrupt: {e}")
+                array = _column(path, name, np.frombuffer(data, dtype=dtype), count)
+                if name == "timestamp" and flags & FLAG_DELTA_TIMESTAMPS:
+                    array = np.cumsum(array)
+                arrays.append(array)
+        return Session(*arrays)
+
+    if mmap:
+        try:
+            buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        except ValueError as e:
+            raise SessionFormatError(f"{path} could not be mapped: {e}")
+    else:
+        with open(path, "rb") as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+    arrays = []
+    for name in COLUMNS:
+        dtype, offset, size = by_name[name]
+        if offset + size > len(buffer):
+            raise SessionFormatError(f"{path}: column '{name}' is truncated")
+        arrays.append(_column(path, name, buffer[offset:offset + size].view(dtype), count))
+    return Session(*arrays)
+
+
+def _column(path: str, name: str, array: np.ndarray, count: int) -> np.ndarray:
+    if len(array) != count:
+        raise SessionFormatError(
+            f"{path}: column '{name}' holds {len(array)} values, expected {count}")
+    return array
+
@@ -0,0 +1,318 @@
+"""
+WiFi Session Log - Append-Only Streaming Storage Module
+
+This module streams samples to disk as they arrive so that a crash loses at
+most one unflushed batch. A session is a series of segment files
+(wifi_session_<start>.<seq>.wfl), each made of:
+
+    header     magic b"WFL1", version (u16), reserved (u16)
+    frames     per batch: point count (u32), CRC32 of the payload (u32),
+               then count records of epoch microseconds (i64), upload and
+               download speed (f64)
+
+Frames are only ever appended. A crash can leave a torn frame at the end of
+the last segment; `recover_segment` finds the last frame whose length and
+checksum are intact and truncates the rest. Finished sessions are compacted
+into a columnar .wfs file (see session_format).
+"""
+
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from session_format import Session, write_session
+
+logger = logging.getLogger("session_log")
+
+MAGIC = b"WFL1"
+VERSION = 1
+EXTENSION = ".wfl"
+
+HEADER = struct.Struct("<4sHH")
+FRAME = struct.Struct("<II")
+RECORD = np.dtype([("timestamp", "<i8"), ("upload", "<f8"), ("download", "<f8")])
+
+FSYNC_POLICIES = ("always", "interval", "never")
+SEGMENT_PATTERN = re.compile(r"^(?P<name>.+)\.(?P<seq>\d{5})" + re.escape(EXTENSION) + "$")
+
+
+def segment_path(directory: str, name: str, seq: int) -> str:
+    """Path of segment `seq` of session `name`."""
+    return os.path.join(directory, f"{name}.{seq:05d}{EXTENSION}")
+
+
+def find_segments(directory: str, name: Optional[str] = None) -> dict:
+    """
+    Find segment files in a directory.
+
+    Args:
+        directory: Directory to scan
+        name: Only return segments of this session (default: all sessions)
+
+    Returns:
+        dict: session name -> list of segment paths in sequence order
+    """
+    sessions = {}
+    try:
+        entries = os.listdir(directory)
+    except FileNotFoundError:
+        return sessions
+    for entry in entries:
+        match = SEGMENT_PATTERN.match(entry)
+        if match and (name is None or match.group("name") == name):
+            sessions.setdefault(match.group("name"), []).append(
+                (int(match.group("seq")), os.path.join(directory, entry)))
+    return {key: [path for _, path in sorted(paths)] for key, paths in sessions.items()}
+
+
+def _scan_frames(data: bytes) -> Tuple[List[memoryview], int]:
+    """Intact frame payloads and the offset just past the last of them."""
+    view = memoryview(data)
+    payloads = []
+    offset = HEADER.size
+    while offset + FRAME.size <= len(data):
+        count, crc = FRAME.unpack_from(data, offset)
+        end = offset + FRAME.size + count * RECORD.itemsize
+        if count == 0 or end > len(data):
+            break
+        payload = view[offset + FRAME.size:end]
+        if zlib.crc32(payload) != crc:
+            break
+        payloads.append(payload)
+        offset = end
+    return payloads, offset
+
+
+def _read_segment_data(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        return b""
+    magic, version, _ = HEADER.unpack_from(data)
+    if magic != MAGIC or version > VERSION:
+        raise ValueError(f"{path} is not a session log segment")
+    return data
+
+
+def recover_segment(path: str) -> int:
+    """
+    Truncate a torn tail left by a crash.
+
+    Args:
+        path: Segment file path
+
+    Returns:
+        int: Number of bytes removed (0 if the segment was intact)
+
+    Raises:
+        ValueError: If the file is not a session log segment
+    """
+    data = _read_segment_data(path)
+    good = _scan_frames(data)[1] if data else 0
+    if good == len(data):
+        return 0
+    with open(path, "r+b") as f:
+        f.truncate(good)
+        os.fsync(f.fileno())
+    removed = len(data) - good
+    logger.warning(f"Recovered {path}: dropped {removed} bytes of a partially written batch")
+    return removed
+
+
+def read_segments(paths: List[str]) -> Session:
+    """
+    Read the intact frames of one or more segments as column arrays.
+
+    Args:
+        paths: Segment paths in sequence order
+
+    Returns:
+        Session of (epoch microseconds, upload, download) arrays
+    """
+    chunks = []
+    for path in paths:
+        data = _read_segment_data(path)
+        if data:
+            chunks.extend(np.frombuffer(p, dtype=RECORD) for p in _scan_frames(data)[0])
+    records = np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD)
+    return Session(records["timestamp"], records["upload"], records["download"])
+
+
+def compact_session(directory: str, name: str, output_path: str,
+                    precision: str = "float32", compress: bool = False) -> int:
+    """
+    Merge a session's segments into one .wfs file and remove them.
+
+    Torn tails are recovered first. The segments are only deleted after the
+    .wfs file has been written (atomically) in full.
+
+    Args:
+        directory: Directory holding the segment files
+        name: Session name
+        output_path: Path of the .wfs file to write
+        precision: "float32" or "float64" for the speed columns
+        compress: zlib-compress the .wfs columns
+
+    Returns:
+        int: Number of points in the compacted session
+    """
+    paths = find_segments(directory, name).get(name, [])
+    for path in paths:
+        recover_segment(path)
+    session = read_segments(paths)
+    count = write_session(output_path, *session, precision=precision, compress=compress)
+    for path in paths:
+        os.remove(path)
+    return count
+
+
+class SessionWriter:
+    """
+    Append-only, batched writer for one session's segment files.
+
+    Samples are buffered and written as one checksummed frame once
+    `batch_size` samples are pending or `flush_interval` seconds have passed
+    since the last write. `fsync` decides durability: "always" syncs every
+    frame, "interval" at most every `fsync_interval` seconds, "never" leaves
+    it to the OS. Segments rotate after `segment_points` samples, and are
+    always synced when rotated or closed.
+    """
+
+    def __init__(self, directory: str, name: str, batch_size: int = 16,
+                 flush_interval: float = 2.0, fsync: str = "interval",
+                 fsync_interval: float = 10.0, segment_points: int = 3600):
+        """
+        Open (or continue) the segment log of a session.
+
+        Args:
+            directory: Directory holding the segment files
+            name: Session name, e.g. "wifi_session_20250402_114819"
+            batch_size: Samples per written frame
+            flush_interval: Seconds after which the next append writes the batch
+            fsync: "always", "interval" or "never"
+            fsync_interval: Seconds between syncs with fsync="interval"
+            segment_points: Samples per segment before rotating
+
+        Raises:
+            ValueError: If the fsync policy is unknown
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}'")
+        self.directory = directory
+        self.name = name
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_points = max(1, segment_points)
+
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[int, float, float]] = []
+        self._file = None
+        self._seq = 0
+        self._segment_count = 0
+        self._last_flush = time.monotonic()
+        self._last_sync = time.monotonic()
+        self.points_written = 0
+
+        existing = find_segments(directory, name).get(name, [])
+        if existing:
+            # Continue after the last segment of an interrupted run.
+            recover_segment(existing[-1])
+            self._seq = int(SEGMENT_PATTERN.match(os.path.basename(existing[-1])).group("seq")) + 1
+
+    @property
+    def segments(self) -> List[str]:
+        """Paths of this session's segments in sequence order."""
+        return find_segments(self.directory, self.name).get(self.name, [])
+
+    def append(self, timestamp_us: int, upload_speed: float, download_speed: float) -> None:
+        """
+        Queue one sample, writing a frame when the batch is due.
+
+        Args:
+            timestamp_us: Sample time in epoch microseconds
+            upload_speed: Upload speed in MB/s
+            download_speed: Download speed in MB/s
+        """
+        with self._lock:
+            self._pending.append((timestamp_us, upload_speed, download_speed))
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._write_locked()
+
+    def flush(self, sync: bool = False) -> None:
+        """
+        Write pending samples now.
+
+        Args:
+            sync: Also fsync the current segment regardless of the policy
+        """
+        with self._lock:
+            self._write_locked()
+            if sync and self._file is not None:
+                self._sync_locked()
+
+    def close(self) -> None:
+        """Write pending samples, sync and close the current segment."""
+        with self._lock:
+            self._write_locked()
+            self._close_segment_locked()
+
+    def _write_locked(self) -> None:
+        self._last_flush = time.monotonic()
+        while self._pending:
+            if self._file is None:
+                self._open_segment_locked()
+            room = self.segment_points - self._segment_count
+            batch, self._pending = self._pending[:room], self._pending[room:]
+            payload = np.array(batch, dtype=RECORD).tobytes()
+            self._file.write(FRAME.pack(len(batch), zlib.crc32(payload)) + payload)
+            self._file.flush()
+            self._segment_count += len(batch)
+            self.points_written += len(batch)
+
+            if self.fsync == "always" or (
+                    self.fsync == "interval"
+                    and time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync_locked()
+            if self._segment_count >= self.segment_points:
+                self._close_segment_locked()
+
+    def _open_segment_locked(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = segment_path(self.directory, self.name, self._seq)
+        self._file = open(path, "xb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0))
+        self._file.flush()
+        self._segment_count = 0
+        self._seq += 1
+        # Make the new directory entry itself durable.
+        self._sync_directory()
+
+    def _close_segment_locked(self) -> None:
+        if self._file is None:
+            return
+        self._sync_locked()
+        self._file.close()
+        self._file = None
+
+    def _sync_locked(self) -> None:
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def _sync_directory(self) -> None:
+        if self.fsync == "never" or not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -8,8 +8,13 @@ calculate upload and download speeds, and validate network interfaces.
 
 import psutil
 import time
-from collections import deque
 import logging
+from collections import namedtuple
+
+import numpy as np
+
+from procnet import counter_source
+from ring_buffer import RingBuffer
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +27,28 @@ class InterfaceNotFoundError(Exception):
     """Exception raised when the specified network interface is not found."""
     pass
 
+# Counter fields in psutil's snetio order; every counter source returns them in this order
+COUNTER_FIELDS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv",
+                  "errin", "errout", "dropin", "dropout")
+
+InterfaceRates = namedtuple("InterfaceRates", [
+    "upload_mb", "download_mb", "upload_mbits", "download_mbits",
+    "packets_sent", "packets_recv", "errin", "errout", "dropin", "dropout",
+])
+InterfaceRates.__doc__ = """
+Per-second rates of one interface over one sampling interval: speeds in
+MB/s and Mbps, packets, errors and drops per second.
+"""
+
+def psutil_counters():
+    """
+    Read the counters of every interface with psutil.
+    
+    Returns:
+        dict: Interface name -> tuple of the COUNTER_FIELDS values
+    """
+    return {name: tuple(c) for name, c in psutil.net_io_counters(pernic=True).items()}
+
 def validate_interface(interface_name):
     """
     Validates if a network interface exists and is up.
@@ -47,13 +74,17 @@ class SpeedCalculator:
     Class for calculating network upload and download speeds for a specified interface.
     """
     
-    def __init__(self, interface_name, history_size=60):
+    def __init__(self, interface_name, history_size=60, fast=False, read_counters=None):
         """
         Initialize the SpeedCalculator with a network interface.
         
         Args:
             interface_name (str): Name of the network interface to monitor
             history_size (int): Number of historical data points to keep
+            fast (bool): Read the counters from a kept-open /proc/net/dev
+                (Linux; falls back to psutil elsewhere) for high-frequency sampling
+            read_counters (callable): Counter source returning {name: COUNTER_FIELDS
+                tuple}; overrides `fast`
         
         Raises:
             InterfaceNotFoundError: If the interface does not exist
@@ -61,26 +92,30 @@ class SpeedCalculator:
         self.interface_name = interface_name
         self.last_bytes_sent = 0
         self.last_bytes_recv = 0
-        self.last_time = time.time()
+        self.last_time = time.monotonic()   # elapsed time is immune to clock changes
         
         # Validate that the interface exists
         if not validate_interface(interface_name):
             logger.warning(f"Interface {interface_name} is down")
         
+        if read_counters is None:
+            read_counters = (counter_source([interface_name], fallback=psutil_counters)
+                             if fast else psutil_counters)
+        self.read_counters = read_counters
+        
         # Get initial counter values
         try:
-            counters = psutil.net_io_counters(pernic=True)
+            counters = self.read_counters()
             if self.interface_name not in counters:
                 raise InterfaceNotFoundError(f"Interface '{interface_name}' not found")
                 
-            self.last_bytes_sent = counters[self.interface_name].bytes_sent
-            self.last_bytes_recv = counters[self.interface_name].bytes_recv
+            self.last_bytes_sent, self.last_bytes_recv = counters[self.interface_name][:2]
         except (KeyError, AttributeError) as e:
             logger.error(f"Error initializing counters: {e}")
             raise InterfaceNotFoundError(f"Error accessing interface '{interface_name}'")
         
-        # Initialize history storage
-        self.history = deque(maxlen=history_size)
+        # Initialize history storage (typed-array ring buffer)
+        self.history = RingBuffer(history_size)
     
     @staticmethod
     def bytes_to_mb(bytes_count):
@@ -108,6 +143,19 @@ class SpeedCalculator:
         """
         return bytes_count * 8 / (1024 * 1024)
     
+    @staticmethod
+    def mb_to_mbps(mb_per_second):
+        """
+        Convert a speed in megabytes per second to megabits per second.
+        
+        Args:
+            mb_per_second (float): Speed in MB/s
+            
+        Returns:
+            float: Equivalent speed in Mbps
+        """
+        return mb_per_second * 8
+    
     def get_speeds(self):
         """
         Calculate current upload and download speeds.
@@ -120,17 +168,16 @@ class SpeedCalculator:
             InterfaceNotFoundError: If the interface is no longer available
             ValueError: If there's an issue calculating speeds
         """
-        current_time = time.time()
+        current_time = time.monotonic()
         elapsed_time = current_time - self.last_time
         
         try:
-            counters = psutil.net_io_counters(pernic=True)
+            counters = self.read_counters()
             
             if self.interface_name not in counters:
                 raise InterfaceNotFoundError(f"Interface '{self.interface_name}' not found or disconnected")
             
-            current_bytes_sent = counters[self.interface_name].bytes_sent
-            current_bytes_recv = counters[self.interface_name].bytes_recv
+            current_bytes_sent, current_bytes_recv = counters[self.interface_name][:2]
             
             # Avoid division by zero or negative time intervals
             if elapsed_time <= 0:
@@ -155,7 +202,7 @@ class SpeedCalculator:
             
             # Add to history
             timestamp = time.time()
-            self.history.append((timestamp, upload_speed_mb, download_speed_mb))
+            self.history.append(timestamp, upload_speed_mb, download_speed_mb)
             
             return (upload_speed_mb, download_speed_mb, upload_speed_mbits, 
                     download_speed_mbits, elapsed_time)
@@ -169,11 +216,152 @@ class SpeedCalculator:
         Get the history of speed measurements.
         
         Returns:
-            deque: Collection of (timestamp, upload_speed_mb, download_speed_mb) tuples
+            RingBuffer: Iterable, indexable collection of (timestamp, upload_speed_mb,
+            download_speed_mb) tuples; `arrays()` gives zero-copy numpy views
         """
         return self.history
 
 
+class MultiInterfaceSampler:
+    """
+    Samples many network interfaces from a single counter snapshot per tick.
+    
+    All counters go into one (interfaces x counters) array and every
+    interface is a column of one shared history buffer, so a tick is one
+    read of the system's counter table plus a few vectorised operations,
+    whatever the number of monitored interfaces. Interfaces that appear or
+    disappear between ticks are picked up or dropped; a counter that goes
+    backwards (interface reset) counts as zero for that interval.
+    """
+    
+    def __init__(self, interfaces=None, history_size=60, read_counters=psutil_counters):
+        """
+        Initialize the sampler and take the baseline snapshot.
+        
+        Args:
+            interfaces (list): Interface names to monitor, or None for all of them
+            history_size (int): Number of historical data points to keep per interface
+            read_counters (callable): Counter source returning {name: COUNTER_FIELDS tuple},
+                e.g. procnet.counter_source(interfaces) for the Linux fast path
+            
+        Raises:
+            InterfaceNotFoundError: If a requested interface does not exist
+        """
+        self.interfaces = list(interfaces) if interfaces is not None else None
+        self.history_size = history_size
+        self.read_counters = read_counters
+        self.latest = {}
+        
+        self._columns = {}      # interface name -> column in the history and totals
+        self._history = RingBuffer(history_size, width=0)
+        self._totals = np.zeros((0, len(COUNTER_FIELDS) - 2), dtype=np.int64)
+        
+        self._names, self._last = self._snapshot()
+        if self.interfaces is not None:
+            missing = [name for name in self.interfaces if name not in self._names]
+            if missing:
+                raise InterfaceNotFoundError(f"Interface(s) not found: {', '.join(missing)}")
+        self._cols = self._column_indices(self._names)
+        self._last_time = time.monotonic()
+    
+    def _snapshot(self):
+        counters = self.read_counters()
+        names = [name for name in (self.interfaces or sorted(counters)) if name in counters]
+        values = np.array([counters[name] for name in names], dtype=np.int64).reshape(
+            len(names), len(COUNTER_FIELDS))
+        return names, values
+    
+    def _column_indices(self, names):
+        new = [name for name in names if name not in self._columns]
+        if new:
+            for name in new:
+                self._columns[name] = len(self._columns)
+            self._grow(len(self._columns))
+        return np.array([self._columns[name] for name in names], dtype=np.intp)
+    
+    def _grow(self, needed):
+        # Rare (interfaces appearing): rebuild the history with room for more columns
+        width = self._history.width
+        if needed > width:
+            history = RingBuffer(self.history_size, width=max(4, 2 * needed))
+            timestamps, upload, download = self._history.arrays()
+            padding = np.full((len(timestamps), history.width - width), np.nan, dtype=np.float32)
+            history.extend(timestamps, np.hstack([upload, padding]), np.hstack([download, padding]))
+            self._history = history
+        totals = np.zeros((needed, self._totals.shape[1]), dtype=np.int64)
+        totals[:len(self._totals)] = self._totals
+        self._totals = totals
+    
+    def sample(self):
+        """
+        Take one snapshot and compute rates for every monitored interface.
+        
+        Returns:
+            dict: Interface name -> InterfaceRates for the interval since the previous sample
+        """
+        now = time.monotonic()
+        timestamp = time.time()
+        names, values = self._snapshot()
+        elapsed = max(now - self._last_time, 0.001)
+        
+        if names == self._names:
+            cols = self._cols
+            deltas = values - self._last
+        else:
+            # Interfaces came or went: align the previous snapshot by name
+            for name in set(self._names) - set(names):
+                logger.warning(f"Interface {name} disappeared")
+            cols = self._column_indices(names)
+            previous = dict(zip(self._names, self._last))
+            deltas = values - np.array([previous.get(name, row) for name, row in zip(names, values)],
+                                       dtype=np.int64).reshape(values.shape)
+        np.maximum(deltas, 0, out=deltas)
+        
+        per_second = deltas / elapsed
+        megabytes = per_second[:, :2] / (1024 * 1024)
+        rates = np.hstack([megabytes, megabytes * 8, per_second[:, 2:]])
+        self._totals[cols] += deltas[:, 2:]
+        
+        # Interfaces not present in this snapshot get NaN (a gap) in the history
+        upload = np.full(self._history.width, np.nan, dtype=np.float32)
+        download = upload.copy()
+        upload[cols] = megabytes[:, 0]
+        download[cols] = megabytes[:, 1]
+        self._history.append(timestamp, upload, download)
+        
+        self.latest = dict(zip(names, map(InterfaceRates._make, rates.tolist())))
+        self._names, self._last, self._cols, self._last_time = names, values, cols, now
+        return self.latest
+    
+    @property
+    def totals(self):
+        """Packets, errors and drops per interface since the sampler started."""
+        return {name: dict(zip(COUNTER_FIELDS[2:], self._totals[col].tolist()))
+                for name, col in self._columns.items()}
+    
+    def get_history(self, interface_name):
+        """
+        Get the speed history of one interface.
+        
+        Args:
+            interface_name (str): Interface to return the history for
+            
+        Returns:
+            RingBuffer: (timestamp, upload_speed_mb, download_speed_mb) samples
+            (a copy, skipping ticks in which the interface was missing)
+            
+        Raises:
+            InterfaceNotFoundError: If the interface has not been sampled
+        """
+        col = self._columns.get(interface_name)
+        if col is None:
+            raise InterfaceNotFoundError(f"Interface '{interface_name}' has no history")
+        timestamps, upload, download = self._history.arrays()
+        present = ~np.isnan(upload[:, col])
+        history = RingBuffer(self.history_size)
+        history.extend(timestamps[present], upload[present, col], download[present, col])
+        return history
+
 if __name__ == "__main__":
     # Simple test to demonstrate usage
     try: